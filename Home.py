@@ -26,7 +26,10 @@ st.markdown( """
         
     - #### Visão Entregador:
         - Acompanhamento dos indicadores semanais de crescimento.
-        
+
+    - #### Perfil do Entregador:
+        - Histórico de pedidos, evolução das avaliações, tempo médio por tráfego e clima e condição do veículo de cada entregador.
+
     - #### Visão Restaurantes:
         - Indicadores semanais de crescimento dos restaurantes.
         
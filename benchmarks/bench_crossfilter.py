@@ -0,0 +1,75 @@
+"""
+Micro-benchmark dos filtros cruzados (cidade, clima, veículo, festival, entregador).
+
+Simula um detalhamento: os filtros são acrescentados um de cada vez e, a cada
+passo, todas as linhas selecionadas são recalculadas. Compara as máscaras
+booleanas refeitas do zero (uma passada no Dataframe por filtro) com o
+utils.crossfilter.BitmapIndex, que reaproveita o prefixo do passo anterior.
+
+Uso:
+    python -m benchmarks.bench_crossfilter [--sizes 10000 100000 1000000]
+"""
+# LIBRARIES
+import argparse
+import time
+import timeit
+
+import numpy as np
+
+from benchmarks.synthetic import clean_orders
+from utils.crossfilter import BitmapIndex
+from utils.filters import category_mask, normalize_filters
+
+
+def drill_down( df1 ):
+    # filtros acrescentados a cada passo, com valores que existem no dataset
+    entregador = df1['delivery_person_id'].iloc[ len( df1 ) // 2 ]
+    linha = df1.loc[ df1['delivery_person_id'] == entregador ].iloc[0]
+
+    passos = [ ( 'city', [ linha['city'] ] ),
+               ( 'weatherconditions', [ linha['weatherconditions'], 'conditions Sunny' ] ),
+               ( 'type_of_vehicle', [ linha['type_of_vehicle'] ] ),
+               ( 'festival', [ linha['festival'] ] ),
+               ( 'delivery_person_id', [ entregador ] ) ]
+
+    return [ dict( passos[ :i + 1 ] ) for i in range( len( passos ) ) ]
+
+
+def mask_filter( df1, filtros ):
+    # uma máscara por coluna, combinadas com AND (o caminho sem índice)
+    mascara = np.ones( len( df1 ), dtype= bool )
+    for col, valores in normalize_filters( filtros ):
+        mascara &= category_mask( df1[col], valores )
+    return np.flatnonzero( mascara )
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--sizes', nargs= '+', type= int, default= [10_000, 100_000, 1_000_000] )
+    parser.add_argument( '--repeat', type= int, default= 5 )
+    args = parser.parse_args( argv )
+
+    print( f"{'linhas':>10} {'filtros':>8} {'linhas sel.':>12} {'máscaras (ms)':>14} {'bitmaps (ms)':>13} {'ganho':>7}" )
+    for n in args.sizes:
+        df1 = clean_orders( n )
+
+        inicio = time.perf_counter()
+        index = BitmapIndex( df1 )
+        print( f'{n:>10} índice montado em {( time.perf_counter() - inicio ) * 1000:.1f} ms' )
+
+        for filtros in drill_down( df1 ):
+            normalizados = normalize_filters( filtros )
+            esperado = mask_filter( df1, filtros )
+
+            # primeira seleção: só o último filtro é novo (o prefixo veio do passo anterior)
+            inicio = time.perf_counter()
+            linhas = index.rows( normalizados )
+            novo = ( time.perf_counter() - inicio ) * 1000
+            assert np.array_equal( linhas, esperado )
+
+            antigo = min( timeit.repeat( lambda: mask_filter( df1, filtros ), number= 1, repeat= args.repeat ) ) * 1000
+            print( f'{n:>10} {len( filtros ):>8} {len( linhas ):>12} {antigo:>14.2f} {novo:>13.2f} {antigo / novo:>6.1f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark do filtro da sidebar (data limite + tráfego).
+
+Compara o filtro antigo das páginas (comparação booleana + isin de strings)
+com utils.filters.filter_orders (busca binária + códigos de categoria).
+
+Uso:
+    python -m benchmarks.bench_filters [--sizes 10000 100000 1000000]
+"""
+# LIBRARIES
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import sort_by_date
+from utils.filters import filter_orders
+
+
+TRAFFIC = ['High', 'Jam', 'Low', 'Medium']
+
+
+def synthetic_orders( n, seed= 0 ):
+    # dataset limpo mínimo: só as colunas usadas pelo filtro e uma métrica
+    rng = np.random.default_rng( seed )
+    df1 = pd.DataFrame( {
+        'order_date': pd.Timestamp( 2022, 2, 11 ) + pd.to_timedelta( rng.integers( 0, 55, n ), unit= 'D' ),
+        'road_traffic_density': pd.Categorical.from_codes( rng.integers( 0, 4, n ), TRAFFIC ),
+        'time_taken(min)': rng.integers( 10, 55, n ).astype( 'int8' ) } )
+    return sort_by_date( df1 )
+
+
+def legacy_filter( df1, data_limite, traffic_options ):
+    # como era nas páginas, com road_traffic_density em strings
+    df1 = df1.loc[ df1['order_date'] < data_limite, : ]
+    return df1.loc[ df1['road_traffic_density'].isin( traffic_options ), : ]
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--sizes', nargs= '+', type= int, default= [10_000, 100_000, 1_000_000] )
+    parser.add_argument( '--repeat', type= int, default= 5 )
+    args = parser.parse_args( argv )
+
+    data_limite = pd.Timestamp( 2022, 3, 1 )
+    cenarios = { 'todos os tráfegos': TRAFFIC, 'Low + Jam': ['Low', 'Jam'] }
+
+    print( f"{'linhas':>10} {'tráfego':>18} {'antigo (ms)':>12} {'novo (ms)':>10} {'ganho':>7}" )
+    for n in args.sizes:
+        df1 = synthetic_orders( n )
+        df_legacy = df1.astype( { 'road_traffic_density': object } )
+        for nome, traffic_options in cenarios.items():
+            antigo = min( timeit.repeat( lambda: legacy_filter( df_legacy, data_limite, traffic_options ),
+                                         number= 1, repeat= args.repeat ) ) * 1000
+            novo = min( timeit.repeat( lambda: filter_orders( df1, data_limite, traffic_options ),
+                                       number= 1, repeat= args.repeat ) ) * 1000
+            print( f'{n:>10} {nome:>18} {antigo:>12.2f} {novo:>10.2f} {antigo / novo:>6.1f}x' )
+
+
+if __name__ == '__main__':
+    main()
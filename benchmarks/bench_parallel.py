@@ -0,0 +1,57 @@
+"""
+Benchmark de escala da limpeza + agregação em paralelo (utils.parallel).
+
+Gera um CSV sintético no formato do train.csv (benchmarks.synthetic), monta
+o dataset e o cubo com build_dataset + build_cube (um processo) e com
+parallel_build para cada quantidade de processos, e mostra o speedup. Também confere que o resultado
+paralelo é idêntico ao sequencial.
+
+Uso:
+    python -m benchmarks.bench_parallel [--rows 1000000] [--workers 1 2 4 8]
+"""
+# LIBRARIES
+import argparse
+import os
+import tempfile
+import time
+
+from pandas.testing import assert_frame_equal
+
+from benchmarks.synthetic import write_csv
+from utils.cube import build_cube
+from utils.dataset import build_dataset
+from utils.parallel import parallel_build
+
+
+def sequential_build( path ):
+    df1 = build_dataset( path, workers= 1 )
+    return df1, build_cube( df1 )
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--rows', type= int, default= 1_000_000 )
+    parser.add_argument( '--workers', nargs= '+', type= int, default= [1, 2, 4, 8] )
+    args = parser.parse_args( argv )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_csv( os.path.join( tmp, 'train.csv' ), args.rows )
+        print( f'{args.rows} linhas ({os.path.getsize( path ) / 2**20:.0f} MB), {os.cpu_count()} CPUs' )
+
+        inicio = time.perf_counter()
+        df_seq, cube_seq = sequential_build( path )
+        base = time.perf_counter() - inicio
+        print( f"{'sequencial':>12} {base:8.2f} s" )
+
+        for workers in args.workers:
+            inicio = time.perf_counter()
+            df1, cube = parallel_build( path, workers )
+            tempo = time.perf_counter() - inicio
+
+            assert_frame_equal( df1, df_seq )
+            assert_frame_equal( cube, cube_seq, check_exact= False )
+            print( f"{f'{workers} proc.':>12} {tempo:8.2f} s   speedup {base / tempo:5.2f}x" )
+
+
+if __name__ == '__main__':
+    main()
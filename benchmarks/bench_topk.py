@@ -0,0 +1,84 @@
+"""
+Benchmark do ranking de entregadores por cidade (Top Deliverers).
+
+Compara o top_deliverers antigo da Visão Entregadores (groupby + ordenação
+completa + um filtro por cidade fixa, chamado uma vez para cada ponta) com
+utils.topk.top_k_means (bincount + seleção parcial, as duas pontas de uma vez).
+
+Uso:
+    python -m benchmarks.bench_topk [--deliverers 500000] [--rows 2500000] [--k 10]
+"""
+# LIBRARIES
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.topk import top_k_means
+
+
+CITIES = ['Metropolitian', 'Semi-Urban', 'Urban']
+
+
+def synthetic_deliveries( n_rows, n_deliverers, seed= 0 ):
+    # cidade, entregador e tempo de entrega; os pares cidade x entregador passam de 1M
+    rng = np.random.default_rng( seed )
+    ids = np.array( [ f'DEL{i:07d}' for i in range( n_deliverers ) ], dtype= object )
+    return pd.DataFrame( {
+        'city': pd.Categorical.from_codes( rng.integers( 0, len( CITIES ), n_rows ), CITIES ),
+        'delivery_person_id': pd.Categorical.from_codes( rng.integers( 0, n_deliverers, n_rows ), ids ),
+        'time_taken(min)': rng.integers( 10, 55, n_rows ).astype( 'int16' ) } )
+
+
+def legacy_top_deliverers( df1, top_asc ):
+    # como era na página
+    df_aux = ( df1.loc[:, ['delivery_person_id', 'city', 'time_taken(min)']]
+                          .groupby( ['city', 'delivery_person_id'], observed= True).mean()
+                          .sort_values(['city','time_taken(min)'], ascending= top_asc).reset_index() )
+
+    df_aux01 = df_aux.loc[ df_aux['city'] == 'Metropolitian', :].head(10)
+    df_aux02 = df_aux.loc[ df_aux['city'] == 'Urban', :].head(10)
+    df_aux03 = df_aux.loc[ df_aux['city'] == 'Semi-Urban', :].head(10)
+
+    return pd.concat( [df_aux01, df_aux02, df_aux03] )
+
+
+def legacy_both( df1 ):
+    return legacy_top_deliverers( df1, True ), legacy_top_deliverers( df1, False )
+
+
+def same_values( legacy, novo ):
+    # os tempos de cada cidade batem (empates podem trazer entregadores diferentes)
+    chave = lambda df: sorted( zip( df['city'].astype( str ), df['time_taken(min)'].round( 9 ) ) )
+    return chave( legacy ) == chave( novo )
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--deliverers', type= int, default= 500_000 )
+    parser.add_argument( '--rows', type= int, default= 2_500_000 )
+    parser.add_argument( '--k', type= int, default= 10 )
+    parser.add_argument( '--repeat', type= int, default= 3 )
+    args = parser.parse_args( argv )
+
+    df1 = synthetic_deliveries( args.rows, args.deliverers )
+    pares = df1.groupby( ['city', 'delivery_person_id'], observed= True ).ngroups
+    print( f'{len( df1 )} linhas, {pares} pares cidade x entregador, k={args.k}' )
+
+    fastest, slowest = top_k_means( df1, 'city', 'delivery_person_id', 'time_taken(min)', args.k )
+    legacy_fastest, legacy_slowest = legacy_both( df1 )
+    if args.k == 10:
+        print( 'mesmos tempos que a versão antiga:',
+               same_values( legacy_fastest, fastest ) and same_values( legacy_slowest, slowest ) )
+
+    antigo = min( timeit.repeat( lambda: legacy_both( df1 ), number= 1, repeat= args.repeat ) )
+    novo = min( timeit.repeat( lambda: top_k_means( df1, 'city', 'delivery_person_id', 'time_taken(min)', args.k ),
+                               number= 1, repeat= args.repeat ) )
+
+    print( f'antigo (2 chamadas): {antigo * 1000:10.1f} ms' )
+    print( f'top_k_means:         {novo * 1000:10.1f} ms   ({antigo / novo:.1f}x)' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark de todas as etapas e consultas do dashboard em vários tamanhos de dataset.
+
+Para cada tamanho, gera pedidos sintéticos (benchmarks.synthetic) e mede:
+    - as etapas do pipeline: read_csv, clean_code, feature_engineering,
+      optimize_dtypes, build_dataset, filter_orders, build_cube, build_sketches,
+      build_spatial_indexes, build_timeseries, restaurant_metrics
+    - cada consulta de utils.service.QUERIES (os KPIs que as páginas exibem)
+
+O resultado é um JSON com o tempo (melhor de --repeat execuções), a vazão em
+linhas por segundo e o pico de memória alocada (tracemalloc) de cada medida,
+mais a versão do código e das bibliotecas, para comparar versões.
+
+Uso:
+    python -m benchmarks.harness [--sizes 10000 100000] [--repeat 3] [--output resultados.json]
+"""
+# LIBRARIES
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import read_raw, write_csv
+from utils.crossfilter import build_bitmap_index
+from utils.cube import build_cube, filter_cube
+from utils.dataset import build_dataset, clean_code, feature_engineering, optimize_dtypes, sort_by_date
+from utils.deliverers import build_deliverer_index
+from utils.distinct import build_sketches, filter_sketches
+from utils.filters import filter_orders
+from utils.metrics import restaurant_metrics
+from utils.service import QUERIES, TRAFFIC_OPTIONS
+from utils.spatial import build_spatial_indexes
+from utils.timeseries import build_timeseries, range_totals
+
+
+# filtros usados nas medidas (os padrões da sidebar)
+DATA_LIMITE = pd.Timestamp( 2022, 3, 1 )
+
+# parâmetros das consultas que precisam de algum
+QUERY_PARAMS = { 'deliveries_near': { 'restaurant': 0, 'radius': 10 },
+                 'nearest_restaurants': { 'restaurant': 0, 'k': 5 },
+                 'deliverer_time_by': { 'by': 'weatherconditions' } }
+
+# consultas do perfil do entregador: recebem o entregador com mais pedidos do dataset sintético
+DELIVERER_QUERIES = ['deliverer_history', 'deliverer_ratings_trend', 'deliverer_summary', 'deliverer_time_by']
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def measure( name, rows, func, setup= None, repeat= 3 ):
+    """
+    Mede func( *setup() ): melhor tempo de `repeat` execuções e pico de memória.
+
+    O setup roda fora da medida (ex.: cópia da entrada de funções que alteram
+    o Dataframe recebido). O pico de memória vem de uma execução extra com
+    tracemalloc, para o rastreamento não pesar no tempo.
+
+    Output: dict com function, rows, seconds, rows_per_second e peak_mb
+    """
+    setup = setup or ( lambda: () )
+
+    tempos = []
+    for _ in range( repeat ):
+        args = setup()
+        inicio = time.perf_counter()
+        func( *args )
+        tempos.append( time.perf_counter() - inicio )
+
+    args = setup()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func( *args )
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+    segundos = min( tempos )
+    return { 'function': name,
+             'rows': rows,
+             'seconds': segundos,
+             'mean_seconds': sum( tempos ) / len( tempos ),
+             'rows_per_second': rows / segundos if segundos > 0 else None,
+             'peak_mb': pico / 2**20 }
+
+
+def run_size( n, repeat= 3, seed= 0 ):
+    """
+    Todas as medidas para um dataset sintético de n pedidos.
+
+    Output: lista de dicts (ver measure)
+    """
+    resultados = []
+    add = lambda name, func, setup= None: resultados.append( measure( name, n, func, setup, repeat ) )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_csv( os.path.join( tmp, 'train.csv' ), n, seed )
+
+        # pipeline, etapa por etapa (as etapas alteram a entrada: cada execução recebe uma cópia)
+        raw = read_raw( n, seed )
+        limpo = clean_code( raw.copy() )
+        com_features = feature_engineering( limpo.copy() )
+
+        add( 'read_csv', pd.read_csv, lambda: ( path, ) )
+        add( 'clean_code', clean_code, lambda: ( raw.copy(), ) )
+        add( 'feature_engineering', feature_engineering, lambda: ( limpo.copy(), ) )
+        add( 'optimize_dtypes', optimize_dtypes, lambda: ( com_features.copy(), ) )
+        add( 'build_dataset', build_dataset, lambda: ( path, 1 ) )
+
+    df1 = sort_by_date( optimize_dtypes( com_features.copy() ) )
+
+    # estruturas compartilhadas
+    add( 'filter_orders', lambda: filter_orders( df1, DATA_LIMITE, ['Low', 'Jam'] ) )
+    add( 'build_cube', lambda: build_cube( df1 ) )
+    add( 'build_sketches', lambda: build_sketches( df1 ) )
+    add( 'build_spatial_indexes', lambda: build_spatial_indexes( df1 ) )
+    add( 'build_timeseries', lambda: build_timeseries( df1 ) )
+    add( 'build_bitmap_index', lambda: build_bitmap_index( df1 ) )
+    add( 'build_deliverer_index', lambda: build_deliverer_index( df1 ) )
+
+    orders = filter_orders( df1, DATA_LIMITE, TRAFFIC_OPTIONS )
+    add( 'restaurant_metrics', lambda: restaurant_metrics( orders ) )
+
+    # consultas do serviço, com os dados já filtrados (como no QueryContext aquecido)
+    timeseries = build_timeseries( df1 )
+    add( 'range_totals', lambda: range_totals( timeseries, DATA_LIMITE, TRAFFIC_OPTIONS, pd.Timestamp( 2022, 2, 20 ) ) )
+
+    deliverers = build_deliverer_index( df1 )
+    deliverer = deliverers.ids[ deliverers.counts().argmax() ]
+
+    ctx = SimpleNamespace( data_limite= DATA_LIMITE,
+                           data_inicio= None,
+                           cross_filters= (),
+                           traffic_options= TRAFFIC_OPTIONS,
+                           orders= orders,
+                           cube= filter_cube( build_cube( df1 ), DATA_LIMITE, TRAFFIC_OPTIONS ),
+                           sketches= filter_sketches( build_sketches( df1 ), DATA_LIMITE, TRAFFIC_OPTIONS ),
+                           metrics= restaurant_metrics( orders ),
+                           spatial= build_spatial_indexes( df1 ),
+                           bitmaps= build_bitmap_index( df1 ),
+                           deliverers= deliverers,
+                           deliverer_orders= lambda d: filter_orders( df1, DATA_LIMITE, TRAFFIC_OPTIONS, None, deliverers.rows( d ) ),
+                           timeseries= timeseries,
+                           totals= range_totals( timeseries, DATA_LIMITE, TRAFFIC_OPTIONS ) )
+
+    for name, func in sorted( QUERIES.items() ):
+        params = QUERY_PARAMS.get( name, {} )
+        if name in DELIVERER_QUERIES:
+            params = dict( params, deliverer= deliverer )
+        add( f'query.{name}', lambda func= func, params= params: func( ctx, **params ) )
+
+    return resultados
+
+
+def environment():
+    # versão do código e das bibliotecas, para comparar resultados entre versões
+    try:
+        commit = subprocess.run( ['git', 'rev-parse', '--short', 'HEAD'], capture_output= True, text= True,
+                                 cwd= os.path.dirname( os.path.abspath( __file__ ) ) ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return { 'commit': commit,
+             'timestamp': pd.Timestamp.now().isoformat( timespec= 'seconds' ),
+             'python': platform.python_version(),
+             'pandas': pd.__version__,
+             'numpy': np.__version__,
+             'platform': platform.platform(),
+             'cpus': os.cpu_count() }
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--sizes', nargs= '+', type= int, default= [10_000, 100_000] )
+    parser.add_argument( '--repeat', type= int, default= 3 )
+    parser.add_argument( '--seed', type= int, default= 0 )
+    parser.add_argument( '--output', help= 'arquivo JSON de saída (padrão: stdout)' )
+    args = parser.parse_args( argv )
+
+    resultados = []
+    for n in args.sizes:
+        print( f'medindo {n} linhas...', file= sys.stderr )
+        resultados.extend( run_size( n, args.repeat, args.seed ) )
+
+    relatorio = json.dumps( { 'environment': environment(), 'results': resultados }, indent= 2 )
+    if args.output:
+        with open( args.output, 'w' ) as f:
+            f.write( relatorio + '\n' )
+
+        for r in resultados:
+            print( f"{r['rows']:>9} {r['function']:<36} {r['seconds'] * 1000:10.2f} ms {r['peak_mb']:9.1f} MB" )
+    else:
+        print( relatorio )
+
+
+if __name__ == '__main__':
+    main()
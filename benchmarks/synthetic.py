@@ -0,0 +1,166 @@
+"""
+Gerador de pedidos sintéticos no formato bruto do dataset/train.csv.
+
+Reproduz o schema e as sujeiras do arquivo original: espaços no fim dos
+textos, o marcador 'NaN ' (e 'conditions NaN') nos campos faltantes, o tempo
+no formato '(min) NN', datas 'DD-MM-YYYY' e horários 'HH:MM:SS' (o pedido pode
+ser retirado depois da meia-noite). Restaurantes ficam em volta do centro de
+cada cidade e cada entregador pertence a um restaurante, como nos IDs reais
+(ex.: 'INDORES13DEL02').
+
+Uso:
+    python -m benchmarks.synthetic [dataset/synthetic.csv] [--rows 45593] [--seed 0] [--force]
+
+O padrão não é o dataset/train.csv: gravar por cima do dataset real invalidaria
+o store Parquet e os snapshots. Um arquivo existente só é sobrescrito com --force.
+"""
+# LIBRARIES
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import clean_code, feature_engineering, optimize_dtypes, sort_by_date
+
+
+# código usado nos IDs dos entregadores e centro aproximado de cada cidade
+CITIES = { 'INDO': ( 22.72, 75.86 ), 'BANG': ( 12.97, 77.59 ), 'COIMB': ( 11.02, 76.96 ),
+           'CHEN': ( 13.08, 80.27 ), 'HYD': ( 17.39, 78.49 ), 'RANCHI': ( 23.34, 85.31 ),
+           'MYS': ( 12.30, 76.64 ), 'DEH': ( 30.32, 78.03 ), 'KOC': ( 9.93, 76.26 ),
+           'PUNE': ( 18.52, 73.86 ), 'LUDH': ( 30.90, 75.86 ), 'KNP': ( 26.45, 80.33 ),
+           'MUM': ( 19.08, 72.88 ), 'KOL': ( 22.57, 88.36 ), 'JAP': ( 26.91, 75.79 ),
+           'SUR': ( 21.17, 72.83 ), 'GOA': ( 15.50, 73.83 ), 'AURG': ( 19.88, 75.34 ),
+           'AGR': ( 27.18, 78.01 ), 'VAD': ( 22.31, 73.18 ), 'ALH': ( 25.44, 81.85 ),
+           'BHP': ( 23.26, 77.41 ) }
+
+COLUMNS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude',
+           'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date',
+           'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition',
+           'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+# tamanho do train.csv original
+ROWS = 45593
+
+# arquivo gravado pelo `python -m benchmarks.synthetic` sem argumentos
+SYNTHETIC_PATH = 'dataset/synthetic.csv'
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def raw_orders( n= ROWS, seed= 0, restaurants_per_city= 20, deliverers_per_restaurant= 3 ):
+    """
+    Dataframe com n pedidos no formato bruto (todas as colunas como no CSV).
+
+    Input: n, seed, restaurants_per_city, deliverers_per_restaurant
+    Output: Dataframe com as colunas COLUMNS
+    """
+    rng = np.random.default_rng( seed )
+
+    def escolha( valores, p= None ):
+        return np.asarray( valores, dtype= object )[ rng.choice( len( valores ), n, p= p ) ]
+
+    def faltando( valores, p, marcador= 'NaN ' ):
+        valores = np.asarray( valores, dtype= object )
+        return np.where( rng.random( n ) < p, marcador, valores )
+
+    # restaurantes fixos em volta do centro de cada cidade
+    codigos = list( CITIES )
+    centros = np.array( list( CITIES.values() ) )
+    n_rest = len( codigos ) * restaurants_per_city
+    rest_city = np.repeat( np.arange( len( codigos ) ), restaurants_per_city )
+    rest_lat = centros[rest_city, 0] + rng.uniform( -0.1, 0.1, n_rest )
+    rest_lon = centros[rest_city, 1] + rng.uniform( -0.1, 0.1, n_rest )
+
+    # cada pedido: um restaurante e um dos entregadores dele
+    rest = rng.integers( 0, n_rest, n )
+    entregador = rng.integers( 1, deliverers_per_restaurant + 1, n )
+    ids_entregador = np.array( [ f'{codigos[c]}RES{r % restaurants_per_city:02d}DEL{d:02d} '
+                                 for c, r, d in zip( rest_city[rest], rest, entregador ) ], dtype= object )
+
+    # idade e avaliação fixas por entregador
+    chave_entregador = rest * deliverers_per_restaurant + entregador - 1
+    idades = rng.integers( 20, 40, n_rest * deliverers_per_restaurant )
+    notas = np.round( rng.uniform( 3.5, 5.0, n_rest * deliverers_per_restaurant ), 1 )
+
+    # horários de 5 em 5 minutos; a retirada vem 5, 10 ou 15 minutos depois (pode passar da meia-noite)
+    pedido = rng.integers( 8 * 12, 24 * 12, n ) * 5
+    retirada = ( pedido + rng.choice( [5, 10, 15], n ) ) % ( 24 * 60 )
+    hora = lambda minutos: np.array( [ f'{m // 60:02d}:{m % 60:02d}:00' for m in minutos ], dtype= object )
+
+    trafego = escolha( ['Low ', 'Medium ', 'High ', 'Jam '], p= [0.34, 0.24, 0.10, 0.32] )
+    cidade = escolha( ['Metropolitian ', 'Urban ', 'Semi-Urban '], p= [0.75, 0.22, 0.03] )
+    tempo = ( 15 + 5 * ( trafego == 'Jam ' ) + 3 * ( trafego == 'High ' ) + rng.integers( 0, 25, n ) ).clip( 10, 54 )
+
+    # no arquivo original a avaliação falta nas mesmas linhas em que falta a idade
+    sem_idade = rng.random( n ) < 0.04
+
+    return pd.DataFrame( {
+        'ID': np.array( [ f'0x{i:04x} ' for i in range( n ) ], dtype= object ),
+        'Delivery_person_ID': ids_entregador,
+        'Delivery_person_Age': np.where( sem_idade, 'NaN ', idades[chave_entregador].astype( str ) ).astype( object ),
+        'Delivery_person_Ratings': np.where( sem_idade, 'NaN ', notas[chave_entregador].astype( str ) ).astype( object ),
+        'Restaurant_latitude': np.round( rest_lat[rest], 6 ),
+        'Restaurant_longitude': np.round( rest_lon[rest], 6 ),
+        'Delivery_location_latitude': np.round( rest_lat[rest] + rng.uniform( -0.15, 0.15, n ), 6 ),
+        'Delivery_location_longitude': np.round( rest_lon[rest] + rng.uniform( -0.15, 0.15, n ), 6 ),
+        'Order_Date': ( pd.Timestamp( 2022, 2, 11 ) + pd.to_timedelta( rng.integers( 0, 55, n ), unit= 'D' ) ).strftime( '%d-%m-%Y' ),
+        'Time_Orderd': faltando( hora( pedido ), 0.04 ),
+        'Time_Order_picked': hora( retirada ),
+        'Weatherconditions': faltando( escolha( [ 'conditions ' + w for w in
+                                                  ['Sunny', 'Stormy', 'Sandstorms', 'Cloudy', 'Fog', 'Windy'] ] ),
+                                       0.01, 'conditions NaN' ),
+        'Road_traffic_density': faltando( trafego, 0.01 ),
+        'Vehicle_condition': rng.integers( 0, 3, n ),
+        'Type_of_order': escolha( ['Snack ', 'Meal ', 'Drinks ', 'Buffet '] ),
+        'Type_of_vehicle': escolha( ['motorcycle ', 'scooter ', 'electric_scooter '], p= [0.58, 0.33, 0.09] ),
+        'multiple_deliveries': faltando( rng.choice( ['0', '1', '2', '3'], n, p= [0.31, 0.62, 0.05, 0.02] ), 0.02 ),
+        'Festival': faltando( escolha( ['No ', 'Yes '], p= [0.98, 0.02] ), 0.005 ),
+        'City': faltando( cidade, 0.03 ),
+        'Time_taken(min)': np.array( [ f'(min) {t}' for t in tempo ], dtype= object ) } )[COLUMNS]
+
+
+def write_csv( path, n= ROWS, seed= 0 ):
+    # grava o CSV bruto (sem índice), como o train.csv
+    os.makedirs( os.path.dirname( path ) or '.', exist_ok= True )
+    raw_orders( n, seed ).to_csv( path, index= False )
+    return path
+
+
+def read_raw( n= ROWS, seed= 0 ):
+    # o Dataframe como o pd.read_csv devolve (mesmos tipos inferidos do arquivo)
+    buffer = io.StringIO()
+    raw_orders( n, seed ).to_csv( buffer, index= False )
+    buffer.seek( 0 )
+    return pd.read_csv( buffer )
+
+
+def clean_orders( n= ROWS, seed= 0 ):
+    # dataset limpo, igual ao que o load_dataset monta a partir do CSV sintético
+    df1 = clean_code( read_raw( n, seed ) )
+
+    df1 = feature_engineering( df1 )
+
+    return sort_by_date( optimize_dtypes( df1 ) )
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= __doc__, formatter_class= argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( 'csv', nargs= '?', default= SYNTHETIC_PATH )
+    parser.add_argument( '--rows', type= int, default= ROWS )
+    parser.add_argument( '--seed', type= int, default= 0 )
+    parser.add_argument( '--force', action= 'store_true', help= 'sobrescreve o arquivo se ele já existir' )
+    args = parser.parse_args( argv )
+
+    if os.path.exists( args.csv ) and not args.force:
+        parser.error( f'{args.csv} já existe (use --force para sobrescrever)' )
+
+    write_csv( args.csv, args.rows, args.seed )
+    print( f'{args.rows} pedidos sintéticos gravados em {args.csv}' )
+
+
+if __name__ == '__main__':
+    main()
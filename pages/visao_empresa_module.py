@@ -4,132 +4,99 @@ import pandas as pd
 import numpy as np
 import folium
 import plotly.express as px
+import streamlit.components.v1 as components
 
 from haversine import haversine
 from streamlit_folium import folium_static
 from PIL import Image
 
+from utils.crossfilter import cross_filter_sidebar
+from utils.figure_cache import cached_figure, filter_key
+from utils.geo import delivery_map
+from utils.instrument import begin_rerun, diagnostics_enabled, diagnostics_panel, end_rerun, span
+from utils.service import connect
+
 
 #----------------------------------
 # FUNCTIONS
 #----------------------------------
 
-def country_maps( df1 ):
-    df_aux = ( df1.loc[:, ['city', 'road_traffic_density', 'delivery_location_latitude', 
-                           'delivery_location_longitude']]
-                            .groupby(['city', 'road_traffic_density']).median().reset_index() )
+# As funções recebem o serviço de consultas e os filtros: os dados só são
+# pedidos quando a figura não está no cache.
+
+def country_maps( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'city_traffic_centers', periodo, traffic_options, cross_filters )
 
     map = folium.Map()
 
-    for i, loc_info in df_aux.iterrows():
-        folium.Marker( [loc_info['delivery_location_latitude'], 
-                        loc_info['delivery_location_longitude']],
-                        popup= loc_info[['city', 'road_traffic_density']]).add_to( map )
+    for lat, lon, city, traffic in zip( df_aux['delivery_location_latitude'].tolist(),
+                                        df_aux['delivery_location_longitude'].tolist(),
+                                        df_aux['city'].tolist(), df_aux['road_traffic_density'].tolist() ):
+        folium.Marker( [lat, lon], popup= f'{city} - {traffic}' ).add_to( map )
+
+    # HTML pronto do mapa (o mesmo que o folium_static gera), que pode ir para o cache
+    return folium.Figure().add_child( map ).render()
 
-    folium_static( map, width=1400 ,height=680 )
-    return None
 
+def delivery_points_map( service, periodo, traffic_options, cross_filters, mode ):
+    # mapa de todas as entregas, já agregado pelo serviço quando há pontos demais
+    df_aux = service.query( 'delivery_points', periodo, traffic_options, cross_filters )
+    map = delivery_map( df_aux['lat'].values, df_aux['lon'].values, mode= mode, count= df_aux['count'].values )
 
-def order_delivered_by_week( df1 ):
-    # quantidade de pedidos por semana
-    df_aux = df1.loc[:, ['id', 'week_of_year']].groupby('week_of_year').count().reset_index()
+    return folium.Figure().add_child( map ).render()
 
-    # quantidade de entregadores unicos por semana
-    df_aux2 = (df1.loc[:, ['delivery_person_id', 'week_of_year']]
-               .groupby('week_of_year').nunique().reset_index() )
 
-    # merge df_aux + df_aux2
-    df_aux = pd.merge( df_aux, df_aux2, how= 'inner' )
-    df_aux['order_by_delivery'] = df_aux['id'] / df_aux['delivery_person_id']   
+def order_delivered_by_week( service, periodo, traffic_options, cross_filters ):
+    # pedidos por semana / entregadores unicos por semana
+    df_aux = service.query( 'orders_per_deliverer_by_week', periodo, traffic_options, cross_filters )
     fig = px.line( df_aux, x='week_of_year', y='order_by_delivery')
     return fig
 
 
-def order_by_week( df1 ):
-    df_aux = df1[['id', 'week_of_year']].groupby('week_of_year').count().reset_index()
-    fig = px.line( df_aux, x='week_of_year', y='id')
+def order_by_week( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'orders_by_week', periodo, traffic_options, cross_filters )
+    fig = px.line( df_aux, x='week_of_year', y='orders')
     return fig
             
-def traffic_order_share( df1 ):
-    df_aux = ( df1[['id','road_traffic_density','city']]
-                    .groupby(['city','road_traffic_density']).count().reset_index() )
-    fig = px.scatter( df_aux, x='city', y='road_traffic_density', size='id')
+def traffic_order_share( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'orders_by_city_traffic', periodo, traffic_options, cross_filters )
+    fig = px.scatter( df_aux, x='city', y='road_traffic_density', size='orders')
     return fig
         
             
-def order_by_traffic( df1 ):
-    df_aux = df1[['id', 'road_traffic_density']].groupby('road_traffic_density').count().reset_index()
-    df_aux['percent'] = df_aux['id'] / df_aux['id'].sum()
+def order_by_traffic( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'orders_by_traffic', periodo, traffic_options, cross_filters )
     fig = px.pie( df_aux, names='road_traffic_density', values='percent' )
     return fig
 
 
-def order_by_day( df1 ):
-    df_aux = df1[['id', 'order_date']].groupby('order_date').count().reset_index()
-    fig = px.bar( data_frame= df_aux, x='order_date', y='id')
+def rolling_by_city( service, periodo, traffic_options, cross_filters, window, metric ):
+    # janela móvel de `window` dias por cidade
+    df_aux = service.query( 'rolling_by_city', periodo, traffic_options, cross_filters, window= window )
+    fig = px.line( df_aux, x='order_date', y=metric, color='city' )
     return fig
 
 
-def clean_code( df1 ):
-    # rename
-    old_col = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
-
-    snakecase = lambda x: x.lower()
-
-    new_cols = list( map( snakecase, old_col ))
-
-    df1.columns = new_cols
-
-    # remove spaces in the strings
-    df1 = df1.applymap( lambda x: x.strip() if isinstance(x, str) else x )
-
-    # convertendo a coluna age para int
-    df1 = df1[ df1['delivery_person_age'] != 'NaN' ]
-    df1['delivery_person_age'] = df1['delivery_person_age'].astype('int64')
-
-    # convertendo a coluna ratings para float
-    df1['delivery_person_ratings'] = df1['delivery_person_ratings'].astype(float)
-
-    # convertendo a coluna order_datew para data
-    df1['order_date'] = pd.to_datetime( df1['order_date'], format= '%d-%m-%Y')
-
-    # convertendo a coluna multiples deliveries para int
-    df1 = df1[ df1['multiple_deliveries'] != 'NaN' ]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype('int64')
-
-    # limpando e convertendo para int a coluna time_taken
-    df1['time_taken(min)'] = df1['time_taken(min)'].apply( lambda x: x.split('(min) ')[1] )
-    df1['time_taken(min)'] = df1['time_taken(min)'].astype( 'int64' )
-
-    # filtrando NA road_traffic_density
-    df1 = df1[ df1['road_traffic_density'] != 'NaN']
-
-    # filtrando NA city
-    df1 = df1[ df1['city'] != 'NaN']
-
-    # filtrando NA festival
-    df1 = df1[ df1['festival'] != 'NaN']
-    
-    return df1
+def growth_by_week( service, periodo, traffic_options, cross_filters ):
+    # crescimento dos pedidos em relação à semana anterior, por cidade
+    df_aux = service.query( 'growth_by_week', periodo, traffic_options, cross_filters ).dropna( subset= ['growth'] )
+    fig = px.bar( df_aux, x='week_start', y='growth', color='city', barmode='group' )
+    fig.update_yaxes( tickformat= '.0%' )
+    return fig
 
 
-def feature_engineering( df1 ):
-    # criando semana do ano
-    df1['week_of_year'] = df1['order_date'].dt.strftime( '%U' )
-    
-    return df1
+def order_by_day( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'orders_by_day', periodo, traffic_options, cross_filters )
+    fig = px.bar( data_frame= df_aux, x='order_date', y='orders')
+    return fig
 
 
 #----------------------------------
 # ESTRUTURA LÓGICA DO CÓDIGO
 #----------------------------------
 
-# IMPORT DATASET
-df1 = pd.read_csv( 'dataset/train.csv' )
-
-df1 = clean_code( df1 )
-
-df1 = feature_engineering( df1 )
+# SERVIÇO DE CONSULTAS (em processo, ou o processo HTTP de CURRY_QUERY_URL)
+service = connect()
 
 
 #----------------------------------
@@ -140,6 +107,9 @@ st.set_page_config(
     page_title= 'Visao Empresa',
     layout= 'wide' )
 
+# INSTRUMENTAÇÃO DA RERUN (painel de diagnóstico com ?diagnostics=1 na URL)
+begin_rerun( 'visao_empresa', memory= diagnostics_enabled() )
+
 
 # 1. SIDEBAR
 
@@ -150,13 +120,14 @@ st.sidebar.markdown( '# Cury Company' )
 st.sidebar.markdown( '### Fastest delivery in Town' )
 st.sidebar.markdown( '''___''' )
 
-st.sidebar.markdown( '## Selecione uma data limite' )
+st.sidebar.markdown( '## Selecione um período' )
 
-data_slider = st.sidebar.slider( 'Data limite', 
-                                  value= pd.datetime( 2022, 3, 1 ),
-                                  min_value= pd.datetime( 2022, 2, 11) ,
-                                  max_value= pd.datetime( 2022, 4, 6),
-                                  format = 'DD-MM-YYYY')
+# ( inicio, fim ): pedidos com inicio <= order_date < fim
+periodo = st.sidebar.slider( 'Período', 
+                             value= ( pd.datetime( 2022, 2, 11 ), pd.datetime( 2022, 3, 1 ) ),
+                             min_value= pd.datetime( 2022, 2, 11) ,
+                             max_value= pd.datetime( 2022, 4, 6),
+                             format = 'DD-MM-YYYY')
 
 st.sidebar.markdown( '''___''' )
 
@@ -171,29 +142,40 @@ traffic_options = st.sidebar.multiselect( 'Quais as condições de trânsito? ',
                                           ['Low', 'Medium', 'High', 'Jam'],
                                           default= ['Low', 'Medium', 'High', 'Jam'] )
 
+st.sidebar.markdown( '''___''' )
+
+# filtros cruzados: cidade, clima, veículo, festival e entregador (ver utils.crossfilter)
+cross_filters = cross_filter_sidebar( service, periodo, traffic_options )
+
 st.sidebar.markdown( '''___''' )
 st.sidebar.markdown( '# Powered by ComunidadeDS')
 
-# Filtros
-df1 = df1.loc[ df1['order_date'] < data_slider, : ]
+# Filtros: aplicados pelo serviço em cada consulta
+consulta = ( service, periodo, traffic_options, cross_filters )
 
-df1 = df1.loc[ df1['road_traffic_density'].isin( traffic_options ), :]
+# chave das figuras em cache: versão do dataset + filtros
+version = service.version()
+filtros = filter_key( periodo, traffic_options, cross_filters )
 
 
 
-# Separando em páginas
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica '])
+# Separando em páginas: o st.tabs executa o conteúdo de todas as abas em toda
+# rerun (inclusive os mapas), então a visão é escolhida em um radio e só a
+# visão selecionada monta os dados e as figuras
+views = ['Visão Gerencial', 'Visão Tática', 'Visão Geográfica']
+view = st.radio( 'Visão', views, horizontal= True )
 
 # ---------------------------------
 # 2. VISÃO EMPRESA
 # ---------------------------------
 
-with tab1:
+if view == 'Visão Gerencial':
     # Order day
     with st.container():
         st.markdown( '#### Order by day' )
-        fig = order_by_day( df1 )
-        st.plotly_chart( fig, use_container_width= True )
+        fig = cached_figure( order_by_day, *consulta, version= version, filters= filtros )
+        with span( 'render.order_by_day' ):
+            st.plotly_chart( fig, use_container_width= True )
                           
     
     with st.container():
@@ -201,29 +183,66 @@ with tab1:
         
         with col1:
             st.markdown( '### Order by traffic' )
-            fig = order_by_traffic( df1 )
-            st.plotly_chart( fig, use_container_width= True )
+            fig = cached_figure( order_by_traffic, *consulta, version= version, filters= filtros )
+            with span( 'render.order_by_traffic' ):
+                st.plotly_chart( fig, use_container_width= True )
             
         with col2:
             st.markdown( '### Traffic Order Share' )
-            fig = traffic_order_share( df1 )
-            st.plotly_chart( fig, use_container_width= True )
+            fig = cached_figure( traffic_order_share, *consulta, version= version, filters= filtros )
+            with span( 'render.traffic_order_share' ):
+                st.plotly_chart( fig, use_container_width= True )
 
 # ---------------------------------------------------------------------------------------------------            
             
-with tab2:
+elif view == 'Visão Tática':
     with st.container():
         st.markdown( '### Order by week' )
-        fig = order_by_week( df1 )
-        st.plotly_chart( fig, use_container_width= True )
+        fig = cached_figure( order_by_week, *consulta, version= version, filters= filtros )
+        with span( 'render.order_by_week' ):
+            st.plotly_chart( fig, use_container_width= True )
 
         
     with st.container():
         st.markdown( '### Order delivered by week' )
-        fig = order_delivered_by_week( df1 )
-        st.plotly_chart( fig, use_container_width= True )
+        fig = cached_figure( order_delivered_by_week, *consulta, version= version, filters= filtros )
+        with span( 'render.order_delivered_by_week' ):
+            st.plotly_chart( fig, use_container_width= True )
+
+    with st.container():
+        st.markdown( '### Rolling window by city' )
+        col1, col2 = st.columns( 2 )
+        with col1:
+            window = st.radio( 'Janela (dias)', [7, 28], horizontal= True )
+        with col2:
+            metric = st.radio( 'Indicador', ['orders', 'mean_time', 'mean_rating'], horizontal= True )
+
+        fig = cached_figure( rolling_by_city, *consulta, window, metric, version= version, filters= filtros + ( window, metric ) )
+        with span( 'render.rolling_by_city' ):
+            st.plotly_chart( fig, use_container_width= True )
+
+    with st.container():
+        st.markdown( '### Week over week growth' )
+        fig = cached_figure( growth_by_week, *consulta, version= version, filters= filtros )
+        with span( 'render.growth_by_week' ):
+            st.plotly_chart( fig, use_container_width= True )
             
 # ---------------------------------------------------------------------------------------------------               
-with tab3:
+elif view == 'Visão Geográfica':
     st.markdown( '### Country Maps' )
-    country_maps( df1 )
+    html = cached_figure( country_maps, *consulta, version= version, filters= filtros )
+    with span( 'render.country_maps' ):
+        components.html( html, width= 1400, height= 680 + 10 )
+
+    st.markdown( '### Delivery points' )
+    mode = st.radio( 'Tipo de mapa', ['cluster', 'heatmap', 'grid'], horizontal= True )
+    html = cached_figure( delivery_points_map, *consulta, mode, version= version, filters= filtros + ( mode, ) )
+    with span( 'render.delivery_points_map' ):
+        components.html( html, width= 1400, height= 680 + 10 )
+
+
+# ---------------------------------
+# DIAGNÓSTICO
+# ---------------------------------
+
+diagnostics_panel( end_rerun() )
@@ -9,73 +9,22 @@ from haversine import haversine
 from streamlit_folium import folium_static
 from PIL import Image
 
+from utils.crossfilter import cross_filter_sidebar
+from utils.instrument import begin_rerun, diagnostics_enabled, diagnostics_panel, end_rerun
+from utils.service import connect
+
 
 
 #----------------------------------
 # FUNCTIONS
 #----------------------------------
 
-def top_deliverers( df1, top_asc ):
-    df_aux = ( df1.loc[:, ['delivery_person_id', 'city', 'time_taken(min)']]
-                          .groupby( ['city', 'delivery_person_id']).mean()
-                          .sort_values(['city','time_taken(min)'], ascending= top_asc).reset_index() )
-
-    df_aux01 = df_aux.loc[ df_aux['city'] == 'Metropolitian', :].head(10)
-    df_aux02 = df_aux.loc[ df_aux['city'] == 'Urban', :].head(10)
-    df_aux03 = df_aux.loc[ df_aux['city'] == 'Semi-Urban', :].head(10)
-
-    df_aux04 = pd.concat( [df_aux01, df_aux02, df_aux03] )
-    return df_aux04
-
-
-
-def clean_code( df1 ):
-    # rename
-    old_col = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
-
-    snakecase = lambda x: x.lower()
-
-    new_cols = list( map( snakecase, old_col ))
-
-    df1.columns = new_cols
-
-    # remove spaces in the strings
-    df1 = df1.applymap( lambda x: x.strip() if isinstance(x, str) else x )
+def top_deliverers( service, periodo, traffic_options, cross_filters, k= 10 ):
+    # k entregadores mais rápidos e k mais lentos de cada cidade
+    fastest = service.query( 'fastest_deliverers', periodo, traffic_options, cross_filters, k= k )
+    slowest = service.query( 'slowest_deliverers', periodo, traffic_options, cross_filters, k= k )
+    return fastest, slowest
 
-    # convertendo a coluna age para int
-    df1 = df1[ df1['delivery_person_age'] != 'NaN' ]
-    df1['delivery_person_age'] = df1['delivery_person_age'].astype('int64')
-
-    # convertendo a coluna ratings para float
-    df1['delivery_person_ratings'] = df1['delivery_person_ratings'].astype(float)
-
-    # convertendo a coluna order_datew para data
-    df1['order_date'] = pd.to_datetime( df1['order_date'], format= '%d-%m-%Y')
-
-    # convertendo a coluna multiples deliveries para int
-    df1 = df1[ df1['multiple_deliveries'] != 'NaN' ]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype('int64')
-
-    # limpando e convertendo para int a coluna time_taken
-    df1['time_taken(min)'] = df1['time_taken(min)'].apply( lambda x: x.split('(min) ')[1] )
-    df1['time_taken(min)'] = df1['time_taken(min)'].astype( 'int64' )
-
-    # filtrando NA road_traffic_density
-    df1 = df1[ df1['road_traffic_density'] != 'NaN']
-
-    # filtrando NA city
-    df1 = df1[ df1['city'] != 'NaN']
-
-    # filtrando NA festival
-    df1 = df1[ df1['festival'] != 'NaN']
-    
-    return df1
-
-
-def feature_engineering( df1 ):
-    df1['week_of_year'] = df1['order_date'].dt.strftime( '%U' )
-    
-    return df1
 
 
 #----------------------------------
@@ -86,13 +35,12 @@ st.set_page_config(
     page_title= 'Visao Entregadores',
     layout= 'wide' )
 
+# INSTRUMENTAÇÃO DA RERUN (painel de diagnóstico com ?diagnostics=1 na URL)
+begin_rerun( 'visao_entregadores', memory= diagnostics_enabled() )
 
-# IMPORT DATASET
-df1 = pd.read_csv('dataset/train.csv')
-
-df1 = clean_code( df1 )
 
-df1 = feature_engineering( df1 )
+# SERVIÇO DE CONSULTAS (em processo, ou o processo HTTP de CURRY_QUERY_URL)
+service = connect()
 
 
 # ---------------------------------
@@ -105,13 +53,14 @@ st.sidebar.markdown( '# Cury Company' )
 st.sidebar.markdown( '### Fastest delivery in Town' )
 st.sidebar.markdown( '''___''' )
 
-st.sidebar.markdown( '## Selecione uma data limite' )
+st.sidebar.markdown( '## Selecione um período' )
 
-data_slider = st.sidebar.slider( 'Data limite', 
-                                  value= pd.datetime( 2022, 3, 1 ),
-                                  min_value= pd.datetime( 2022, 2, 11) ,
-                                  max_value= pd.datetime( 2022, 4, 6),
-                                  format = 'DD-MM-YYYY')
+# ( inicio, fim ): pedidos com inicio <= order_date < fim
+periodo = st.sidebar.slider( 'Período', 
+                             value= ( pd.datetime( 2022, 2, 11 ), pd.datetime( 2022, 3, 1 ) ),
+                             min_value= pd.datetime( 2022, 2, 11) ,
+                             max_value= pd.datetime( 2022, 4, 6),
+                             format = 'DD-MM-YYYY')
 
 st.sidebar.markdown( '''___''' )
 
@@ -127,12 +76,15 @@ traffic_options = st.sidebar.multiselect( 'Quais as condições de trânsito? ',
                                           default= ['Low', 'Medium', 'High', 'Jam'] )
 
 st.sidebar.markdown( '''___''' )
-st.sidebar.markdown( '# Powered by ComunidadeDS')
 
-# Filtros
-df1 = df1.loc[ df1['order_date'] < data_slider, : ]
+# filtros cruzados: cidade, clima, veículo, festival e entregador (ver utils.crossfilter)
+cross_filters = cross_filter_sidebar( service, periodo, traffic_options )
 
-df1 = df1.loc[ df1['road_traffic_density'].isin( traffic_options ), :]
+st.sidebar.markdown( '''___''' )
+st.sidebar.markdown( '# Powered by ComunidadeDS')
+
+# Filtros: aplicados pelo serviço em cada consulta
+overview = service.query( 'deliverer_overview', periodo, traffic_options, cross_filters ).iloc[0]
 
 
 
@@ -146,19 +98,19 @@ with st.container():
     col1, col2, col3, col4 = st.columns(4, gap= 'large')
       
     with col1:
-        maior_idade = df1.loc[ :, "delivery_person_age"].max()
+        maior_idade = overview['max_age']
         st.metric( 'Biggest age', maior_idade )
 
     with col2:
-        menor_idade = df1.loc[ :, "delivery_person_age" ].min() 
+        menor_idade = overview['min_age']
         st.metric( 'Lowest age', menor_idade )
 
     with col3:
-        melhor_cond = df1.loc[ :, "vehicle_condition" ].max() 
+        melhor_cond = overview['best_condition']
         st.metric( 'Better condition', menor_idade )
 
     with col4:
-        pior_cond = df1.loc[ :, "vehicle_condition" ].min() 
+        pior_cond = overview['worst_condition']
         st.metric( 'Worst condition', menor_idade )
 
 
@@ -173,9 +125,7 @@ with st.container():
     
     with col1:
         st.markdown( '### Mean rating by deliverer')
-        df_aux = ( df1[['delivery_person_id', 'delivery_person_ratings']]
-                    .groupby('delivery_person_id').mean()
-                    .sort_values('delivery_person_id', ascending= False).reset_index() )
+        df_aux = service.query( 'ratings_by_deliverer', periodo, traffic_options, cross_filters )
     
         st.dataframe( df_aux )
         
@@ -183,22 +133,14 @@ with st.container():
     with col2:
         # 1st table
         st.markdown( '### Mean rating by traffic')
-        df_aux= ( df1[['delivery_person_ratings', 'road_traffic_density']]
-                     .groupby('road_traffic_density').agg( {'delivery_person_ratings': ['mean', 'std']} ) )
-
-        df_aux.columns = ['delivery_mean', 'delivery_std']
-        df_aux.reset_index()
-        st.dataframe( df_aux )
+        df_aux = service.query( 'ratings_by_traffic', periodo, traffic_options, cross_filters )
+        st.dataframe( df_aux.set_index( 'road_traffic_density' ) )
         
         
         # 2nd table
         st.markdown( '### Mean rating by weather conditions')
-        df_aux = ( df1[['delivery_person_ratings', 'weatherconditions']]
-                        .groupby('weatherconditions').agg( {'delivery_person_ratings': ['mean', 'std'] } ) )
-
-        df_aux.columns = ['delivery_mean', 'delivery_std']
-        df_aux.reset_index()
-        st.dataframe( df_aux )
+        df_aux = service.query( 'ratings_by_weather', periodo, traffic_options, cross_filters )
+        st.dataframe( df_aux.set_index( 'weatherconditions' ) )
     
     
 # -----------------------------------------------------------------------      
@@ -206,19 +148,26 @@ with st.container():
 st.markdown( '''___''' )       
 st.markdown( '## Top Deliverers' )
 
+fastest, slowest = top_deliverers( service, periodo, traffic_options, cross_filters, k= 10 )
+
 with st.container():
     col1, col2 = st.columns(2)
     
     with col1:
         st.markdown( '### Top fastest deliverers')
-        df_aux04 = top_deliverers( df1, top_asc= True)
-        st.dataframe( df_aux04 )
+        st.dataframe( fastest )
     
     
     with col2:        
         st.markdown( '### Top lowest deliverers')
-        df_aux04 = top_deliverers( df1, top_asc= False)
-        st.dataframe( df_aux04 )
+        st.dataframe( slowest )
 
     
-    
\ No newline at end of file
+    
+
+
+# ---------------------------------
+# DIAGNÓSTICO
+# ---------------------------------
+
+diagnostics_panel( end_rerun() )
@@ -0,0 +1,190 @@
+# LIBRARIES
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+
+from PIL import Image
+
+from utils.figure_cache import cached_figure, filter_key
+from utils.instrument import begin_rerun, diagnostics_enabled, diagnostics_panel, end_rerun, span
+from utils.service import connect
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+# As funções de figura recebem o serviço de consultas, os filtros e o
+# entregador: os dados só são pedidos quando a figura não está no cache.
+
+def ratings_trend_figure( service, periodo, traffic_options, deliverer ):
+    # avaliação média por dia e a média acumulada
+    df_aux = service.query( 'deliverer_ratings_trend', periodo, traffic_options, deliverer= deliverer )
+    fig = px.line( df_aux, x= 'order_date', y= ['mean_rating', 'cumulative_rating'], markers= True )
+    return fig
+
+
+def vehicle_condition_figure( service, periodo, traffic_options, deliverer ):
+    # condição do veículo em cada pedido
+    df_aux = service.query( 'deliverer_history', periodo, traffic_options, deliverer= deliverer )
+    fig = px.scatter( df_aux, x= 'order_date', y= 'vehicle_condition', color= 'type_of_vehicle' )
+    return fig
+
+
+def time_by_figure( service, periodo, traffic_options, deliverer, by ):
+    # tempo médio de entrega do entregador por tráfego ou clima
+    df_aux = service.query( 'deliverer_time_by', periodo, traffic_options, deliverer= deliverer, by= by )
+    fig = px.bar( df_aux, x= by, y= 'mean_time', error_y= 'std_time', hover_data= ['orders'] )
+    return fig
+
+
+#----------------------------------
+# ESTRUTURA LÓGICA DO CÓDIGO
+#----------------------------------
+
+st.set_page_config(
+    page_title= 'Perfil do Entregador',
+    layout= 'wide' )
+
+# INSTRUMENTAÇÃO DA RERUN (painel de diagnóstico com ?diagnostics=1 na URL)
+begin_rerun( 'visao_perfil_entregador', memory= diagnostics_enabled() )
+
+
+# SERVIÇO DE CONSULTAS (em processo, ou o processo HTTP de CURRY_QUERY_URL)
+service = connect()
+
+
+# ---------------------------------
+# 1. SIDEBAR
+# ---------------------------------
+image = Image.open( 'logo.png' )
+st.sidebar.image( image, width= 150 )
+
+st.sidebar.markdown( '# Cury Company' )
+st.sidebar.markdown( '### Fastest delivery in Town' )
+st.sidebar.markdown( '''___''' )
+
+st.sidebar.markdown( '## Selecione um período' )
+
+# ( inicio, fim ): pedidos com inicio <= order_date < fim
+periodo = st.sidebar.slider( 'Período',
+                             value= ( pd.datetime( 2022, 2, 11 ), pd.datetime( 2022, 4, 6 ) ),
+                             min_value= pd.datetime( 2022, 2, 11) ,
+                             max_value= pd.datetime( 2022, 4, 6),
+                             format = 'DD-MM-YYYY')
+
+st.sidebar.markdown( '''___''' )
+
+traffic_options = st.sidebar.multiselect( 'Quais as condições de trânsito? ',
+                                          ['Low', 'Medium', 'High', 'Jam'],
+                                          default= ['Low', 'Medium', 'High', 'Jam'] )
+
+st.sidebar.markdown( '''___''' )
+st.sidebar.markdown( '# Powered by ComunidadeDS')
+
+# entregadores com a quantidade total de pedidos (a lista vem do índice, sem passar pelo dataset)
+deliverers = service.query( 'deliverer_list', periodo, traffic_options )
+orders_by_deliverer = dict( zip( deliverers['delivery_person_id'], deliverers['orders'] ) )
+
+
+# ---------------------------------
+# 2. PERFIL DO ENTREGADOR
+# ---------------------------------
+
+st.markdown( '# Deliverer profile' )
+
+# o selectbox aceita digitação: a busca filtra os ids
+deliverer = st.selectbox( 'Entregador', deliverers['delivery_person_id'].tolist(),
+                          format_func= lambda d: f'{d} ({orders_by_deliverer[d]} pedidos)' )
+
+version = service.version()
+filtros = filter_key( periodo, traffic_options ) + ( deliverer, )
+
+summary = service.query( 'deliverer_summary', periodo, traffic_options, deliverer= deliverer )
+
+if summary.empty:
+    st.info( 'Nenhum pedido do entregador com os filtros selecionados.' )
+
+else:
+    summary = summary.iloc[0]
+
+    with st.container():
+        col1, col2, col3, col4, col5, col6 = st.columns( 6, gap= 'large' )
+
+        with col1:
+            st.metric( 'Orders', int( summary['orders'] ) )
+
+        with col2:
+            st.metric( 'Mean time', round( summary['mean_time'], 2 ) )
+
+        with col3:
+            st.metric( 'Mean rating', round( summary['mean_rating'], 2 ) )
+
+        with col4:
+            st.metric( 'Age', int( summary['age'] ) )
+
+        with col5:
+            st.metric( 'Vehicle', summary['vehicle'] )
+
+        with col6:
+            # condição no último pedido, com a pior e a melhor do período
+            st.metric( 'Vehicle condition', '{} ({}-{})'.format( int( summary['vehicle_condition'] ),
+                                                                 int( summary['worst_condition'] ),
+                                                                 int( summary['best_condition'] ) ) )
+
+    # -----------------------------------------------------------------------
+
+    st.markdown( '''___''' )
+
+    with st.container():
+        col1, col2 = st.columns( 2 )
+
+        with col1:
+            st.markdown( '### Ratings trend' )
+            fig = cached_figure( ratings_trend_figure, service, periodo, traffic_options, deliverer,
+                                 version= version, filters= filtros )
+            with span( 'render.ratings_trend_figure' ):
+                st.plotly_chart( fig, use_container_width= True )
+
+        with col2:
+            st.markdown( '### Vehicle condition' )
+            fig = cached_figure( vehicle_condition_figure, service, periodo, traffic_options, deliverer,
+                                 version= version, filters= filtros )
+            with span( 'render.vehicle_condition_figure' ):
+                st.plotly_chart( fig, use_container_width= True )
+
+    # -----------------------------------------------------------------------
+
+    st.markdown( '''___''' )
+
+    with st.container():
+        col1, col2 = st.columns( 2 )
+
+        with col1:
+            st.markdown( '### Mean time by traffic' )
+            fig = cached_figure( time_by_figure, service, periodo, traffic_options, deliverer, 'road_traffic_density',
+                                 version= version, filters= filtros + ( 'road_traffic_density', ) )
+            with span( 'render.time_by_traffic' ):
+                st.plotly_chart( fig, use_container_width= True )
+
+        with col2:
+            st.markdown( '### Mean time by weather' )
+            fig = cached_figure( time_by_figure, service, periodo, traffic_options, deliverer, 'weatherconditions',
+                                 version= version, filters= filtros + ( 'weatherconditions', ) )
+            with span( 'render.time_by_weather' ):
+                st.plotly_chart( fig, use_container_width= True )
+
+    # -----------------------------------------------------------------------
+
+    st.markdown( '''___''' )
+
+    st.markdown( '### Order history' )
+    df_aux = service.query( 'deliverer_history', periodo, traffic_options, deliverer= deliverer )
+    st.dataframe( df_aux )
+
+
+# ---------------------------------
+# DIAGNÓSTICO
+# ---------------------------------
+
+diagnostics_panel( end_rerun() )
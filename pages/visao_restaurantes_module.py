@@ -4,21 +4,27 @@ import pandas as pd
 import numpy as np
 import folium
 import plotly.express as px
+import streamlit.components.v1 as components
 
-from haversine import haversine
 from streamlit_folium import folium_static
 from PIL import Image
 
+from utils.crossfilter import cross_filter_sidebar
+from utils.figure_cache import cached_figure, filter_key
+from utils.geo import delivery_map
+from utils.instrument import begin_rerun, diagnostics_enabled, diagnostics_panel, end_rerun, span
+from utils.service import connect
+
 
 #----------------------------------
 # FUNCTIONS
 #----------------------------------
 
-def mean_time_by_city( df1 ):
-    df_aux = df1[['city', 'time_taken(min)', 'road_traffic_density']].groupby(['city', 'road_traffic_density']).agg({'time_taken(min)': ['mean', 'std']} )
+# As funções de figura recebem o serviço de consultas e os filtros: os dados
+# só são pedidos quando a figura não está no cache.
 
-    df_aux.columns = ['mean_time', 'std_time']
-    df_aux = df_aux.reset_index()
+def mean_time_by_city( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'time_by_city_traffic', periodo, traffic_options, cross_filters )
 
     fig = ( px.sunburst( data_frame= df_aux, 
                         path= ['city', 'road_traffic_density'], 
@@ -27,119 +33,83 @@ def mean_time_by_city( df1 ):
     return fig
 
 
-def mean_distance_city( df1 ):
-    cols = ['restaurant_latitude', 'restaurant_longitude', 
-            'delivery_location_latitude', 'delivery_location_longitude']
-
-    df1['distance'] = ( df1.loc[: , cols].apply( lambda x: 
-                    haversine( ( x['restaurant_latitude'], x['restaurant_longitude'] ),
-                    ( x['delivery_location_latitude'], x['delivery_location_longitude'] )), axis=1 ))
-
-    avg_distance = df1[['city' , 'distance']].groupby('city').mean().reset_index()
+def mean_distance_city( service, periodo, traffic_options, cross_filters ):
+    avg_distance = service.query( 'time_by_city', periodo, traffic_options, cross_filters )[['city', 'distance']]
 
     fig = px.pie( data_frame = avg_distance, names= 'city', values= 'distance')
     return fig
 
 
-def mean_delivered_time_by_city_traffic( df1 ):
-    df_aux = ( df1[['city', 'time_taken(min)', 'type_of_order']]
-            .groupby(['city', 'type_of_order']).agg({'time_taken(min)': ['mean', 'std']} ) )
-
-    df_aux.columns = ['mean_time', 'std_time']
-    df_aux = df_aux.reset_index()
+def mean_delivered_time_by_city_traffic( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'time_by_city_order', periodo, traffic_options, cross_filters )
     return df_aux
 
 
-def mean_delivered_time_by_city( df1 ):
-    df_aux = ( df1[['city', 'time_taken(min)']]
-                  .groupby('city').agg( {'time_taken(min)': ['mean', 'std'] } ) )
-
-    df_aux.columns = ['mean_time', 'std_time' ]
-    df_aux = df_aux.reset_index()
+def mean_delivered_time_by_city( service, periodo, traffic_options, cross_filters ):
+    df_aux = service.query( 'time_by_city', periodo, traffic_options, cross_filters )[['city', 'mean_time', 'std_time']]
     fig = px.bar( df_aux, x='city', y='mean_time', width= 600 )
     return fig
 
-def mean_time_std_festival( df1, festival, operation ):
+def mean_time_std_festival( df_festival, festival, operation ):
     """
-    Essa funcão calcula a média e desvio padrão do tempo de entrega, seja com ou sem festival.
+    Essa funcão retorna a média ou o desvio padrão do tempo de entrega, seja com ou sem festival.
     
-    Input = Dataframe, festival, operation:
-        - df: dataframe com os dados a serem calculados
+    Input = df_festival, festival, operation:
+        - df_festival: resultado da consulta time_by_festival
         - festival - 'Yes' se houver festival e 'No' se não houver
         - operation: Tipo de operação a ser calculada
-            'mean_time': Calcula o tempo médio
-            'std_time': Calcula o desvio padrão do tempo
+            'mean_time': Tempo médio
+            'std_time': Desvio padrão do tempo
     
-    Output: Dataframe
+    Output: float (NaN se não houver pedidos para o festival pedido)
     """
-    df_aux = df1[['festival', 'time_taken(min)']].groupby('festival').agg( ['mean', 'std'] )
-    df_aux.columns = ['mean_time', 'std_time' ]
-    df_aux = df_aux.reset_index()
-    
-    df_aux = df_aux.loc[ df_aux['festival'] == festival , operation ]
-    return df_aux
-
-
-def mean_distance( df1 ):
-    cols = ['restaurant_latitude', 'restaurant_longitude', 
-            'delivery_location_latitude', 'delivery_location_longitude']
-
-    df1['distance'] = ( df1.loc[: , cols]
-                       .apply( lambda x: haversine( ( x['restaurant_latitude'],
-                        x['restaurant_longitude'] ), ( x['delivery_location_latitude'], 
-                        x['delivery_location_longitude'] )), axis=1 ) )
-
-    mean_distance = round( df1['distance'].mean(), 2)
-    return mean_distance
-
-
-def clean_code( df1 ):
-    # rename
-    old_col = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
-
-    snakecase = lambda x: x.lower()
-
-    new_cols = list( map( snakecase, old_col ))
-
-    df1.columns = new_cols
+    df_aux = df_festival.loc[ df_festival['festival'] == festival , operation ]
+    return float( df_aux.iloc[0] ) if len( df_aux ) else float( 'nan' )
 
-    # remove spaces in the strings
-    df1 = df1.applymap( lambda x: x.strip() if isinstance(x, str) else x )
 
-    # convertendo a coluna age para int
-    df1 = df1[ df1['delivery_person_age'] != 'NaN' ]
-    df1['delivery_person_age'] = df1['delivery_person_age'].astype('int64')
+def mean_distance( overview ):
+    return float( overview['mean_distance'] )
 
-    # convertendo a coluna ratings para float
-    df1['delivery_person_ratings'] = df1['delivery_person_ratings'].astype(float)
 
-    # convertendo a coluna order_datew para data
-    df1['order_date'] = pd.to_datetime( df1['order_date'], format= '%d-%m-%Y')
+def prep_time_figure( service, periodo, traffic_options, cross_filters, by ):
+    # distribuição do tempo de preparo (pedido -> retirada) por grupo
+    df_aux = service.query( 'prep_time_counts', periodo, traffic_options, cross_filters, by= by )
+    fig = px.bar( df_aux, x= 'prep_time(min)', y= 'orders', color= by, barmode= 'group' )
+    return fig
 
-    # convertendo a coluna multiples deliveries para int
-    df1 = df1[ df1['multiple_deliveries'] != 'NaN' ]
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype('int64')
 
-    # limpando e convertendo para int a coluna time_taken
-    df1['time_taken(min)'] = df1['time_taken(min)'].apply( lambda x: x.split('(min) ')[1] )
-    df1['time_taken(min)'] = df1['time_taken(min)'].astype( 'int64' )
+def restaurant_coverage( service, periodo, traffic_options, cross_filters, restaurante, raio, k ):
+    """
+    Entregas a até raio km de um restaurante e os k restaurantes mais próximos dele.
+
+    Input:
+        - service, periodo, traffic_options, cross_filters: serviço de consultas e filtros da sidebar
+        - restaurante: posição do restaurante na consulta restaurants
+        - raio: raio em km
+        - k: quantidade de restaurantes vizinhos
+    Output: (HTML do mapa, Dataframe dos vizinhos, quantidade de entregas, tempo médio)
+    """
+    restaurants = service.query( 'restaurants', periodo, traffic_options, cross_filters )
+    lat, lon = restaurants.loc[ restaurante, ['restaurant_latitude', 'restaurant_longitude'] ]
 
-    # filtrando NA road_traffic_density
-    df1 = df1[ df1['road_traffic_density'] != 'NaN']
+    entregas = service.query( 'deliveries_near', periodo, traffic_options, cross_filters, restaurant= restaurante, radius= raio )
+    df_aux = service.query( 'nearest_restaurants', periodo, traffic_options, cross_filters, restaurant= restaurante, k= k )
 
-    # filtrando NA city
-    df1 = df1[ df1['city'] != 'NaN']
+    map = delivery_map( entregas['delivery_location_latitude'].values,
+                        entregas['delivery_location_longitude'].values )
 
-    # filtrando NA festival
-    df1 = df1[ df1['festival'] != 'NaN']
-    
-    return df1
+    folium.Circle( [lat, lon], radius= raio * 1000, fill= True, fill_opacity= 0.05 ).add_to( map )
+    folium.Marker( [lat, lon], popup= 'Restaurante selecionado', icon= folium.Icon( color= 'red' ) ).add_to( map )
+    for vlat, vlon, d in zip( df_aux['restaurant_latitude'].tolist(), df_aux['restaurant_longitude'].tolist(),
+                              df_aux['distance'].tolist() ):
+        folium.Marker( [vlat, vlon], popup= f'{d:.2f} km', icon= folium.Icon( color= 'green' ) ).add_to( map )
 
+    dlat = raio / 111.2
+    dlon = dlat / max( np.cos( np.radians( lat ) ), 0.01 )
+    map.fit_bounds( [[lat - dlat, lon - dlon], [lat + dlat, lon + dlon]] )
 
-def feature_engineering( df1 ):
-# criando semana do ano
-    df1['week_of_year'] = df1['order_date'].dt.strftime( '%U' )
-    return df1
+    mean_time = float( entregas['time_taken(min)'].mean() ) if len( entregas ) else float( 'nan' )
+    return folium.Figure().add_child( map ).render(), df_aux, len( entregas ), mean_time
 
 
 #----------------------------------
@@ -150,15 +120,12 @@ st.set_page_config(
     page_title= 'Visao Entregadores',
     layout= 'wide' )
 
+# INSTRUMENTAÇÃO DA RERUN (painel de diagnóstico com ?diagnostics=1 na URL)
+begin_rerun( 'visao_restaurantes', memory= diagnostics_enabled() )
 
-# IMPORT DATASET
-df1 = pd.read_csv('dataset/train.csv')
-print( df1.head() )
 
-
-df1 = clean_code( df1 )
-
-df1 = feature_engineering( df1 )
+# SERVIÇO DE CONSULTAS (em processo, ou o processo HTTP de CURRY_QUERY_URL)
+service = connect()
 
 
 # ---------------------------------
@@ -171,13 +138,14 @@ st.sidebar.markdown( '# Cury Company' )
 st.sidebar.markdown( '### Fastest delivery in Town' )
 st.sidebar.markdown( '''___''' )
 
-st.sidebar.markdown( '## Selecione uma data limite' )
+st.sidebar.markdown( '## Selecione um período' )
 
-data_slider = st.sidebar.slider( 'Data limite', 
-                                  value= pd.datetime( 2022, 3, 1 ),
-                                  min_value= pd.datetime( 2022, 2, 11) ,
-                                  max_value= pd.datetime( 2022, 4, 6),
-                                  format = 'DD-MM-YYYY')
+# ( inicio, fim ): pedidos com inicio <= order_date < fim
+periodo = st.sidebar.slider( 'Período', 
+                             value= ( pd.datetime( 2022, 2, 11 ), pd.datetime( 2022, 3, 1 ) ),
+                             min_value= pd.datetime( 2022, 2, 11) ,
+                             max_value= pd.datetime( 2022, 4, 6),
+                             format = 'DD-MM-YYYY')
 
 st.sidebar.markdown( '''___''' )
 
@@ -192,13 +160,23 @@ traffic_options = st.sidebar.multiselect( 'Quais as condições de trânsito? ',
                                           ['Low', 'Medium', 'High', 'Jam'],
                                           default= ['Low', 'Medium', 'High', 'Jam'] )
 
+st.sidebar.markdown( '''___''' )
+
+# filtros cruzados: cidade, clima, veículo, festival e entregador (ver utils.crossfilter)
+cross_filters = cross_filter_sidebar( service, periodo, traffic_options )
+
 st.sidebar.markdown( '''___''' )
 st.sidebar.markdown( '# Powered by ComunidadeDS')
 
-# Filtros
-df1 = df1.loc[ df1['order_date'] < data_slider, : ]
+# Filtros: aplicados pelo serviço em cada consulta
+consulta = ( service, periodo, traffic_options, cross_filters )
+
+overview = service.query( 'restaurant_overview', periodo, traffic_options, cross_filters ).iloc[0]
+df_festival = service.query( 'time_by_festival', periodo, traffic_options, cross_filters )
 
-df1 = df1.loc[ df1['road_traffic_density'].isin( traffic_options ), :]
+# chave das figuras em cache: versão do dataset + filtros
+version = service.version()
+filtros = filter_key( periodo, traffic_options, cross_filters )
 
 
 # ---------------------------------
@@ -212,32 +190,32 @@ with st.container():
    
     # Entregadores únicos
     with col1:
-        delivery_unique = len( df1.loc[:, 'delivery_person_id'].unique() )
+        delivery_unique = int( overview['unique_deliverers'] )
         st.metric( 'Unique deliverers', delivery_unique )
 
     # Distancia média
     with col2:
-        mean_distance = mean_distance( df1 )
+        mean_distance = mean_distance( overview )
         st.metric( 'Mean distance', mean_distance )
         
     # Tempo médio de entrega com festival
     with col3:
-        df_aux = mean_time_std_festival( df1, festival= 'Yes', operation= 'mean_time' )
+        df_aux = mean_time_std_festival( df_festival, festival= 'Yes', operation= 'mean_time' )
         st.metric( 'Mean time with festival', round(df_aux, 2) )
         
     # Desvio padrao de entrega com festival
     with col4:
-        df_aux = mean_time_std_festival( df1, festival= 'Yes', operation= 'std_time')
+        df_aux = mean_time_std_festival( df_festival, festival= 'Yes', operation= 'std_time')
         st.metric( 'Std with festival', round(df_aux, 2) )
         
     # Tempo médio de entrega sem festival    
     with col5:
-        df_aux = mean_time_std_festival( df1, festival= 'No', operation= 'mean_time')
+        df_aux = mean_time_std_festival( df_festival, festival= 'No', operation= 'mean_time')
         st.metric( 'Mean time without festival', round(df_aux, 2) )
         
     # Desvio padrao de entrega sem festival    
     with col6:
-        df_aux = mean_time_std_festival( df1, festival= 'No', operation= 'std_time')
+        df_aux = mean_time_std_festival( df_festival, festival= 'No', operation= 'std_time')
         st.metric( 'Std without festival', round(df_aux, 2) )
 
 # -----------------------------------------------------------------------      
@@ -249,12 +227,13 @@ with st.container():
     
     with col1:
         st.markdown( '### Mean delivered time by city')
-        fig = mean_delivered_time_by_city( df1 )
-        st.plotly_chart( fig )
+        fig = cached_figure( mean_delivered_time_by_city, *consulta, version= version, filters= filtros )
+        with span( 'render.mean_delivered_time_by_city' ):
+            st.plotly_chart( fig )
         
     with col2:
         st.markdown( '### Mean time by city and traffic')
-        df_aux = mean_delivered_time_by_city_traffic( df1 )
+        df_aux = mean_delivered_time_by_city_traffic( *consulta )
         st.dataframe( df_aux )
     
 # ------------------------------------------------------------------------
@@ -266,10 +245,79 @@ with st.container():
     
     with col1:
         st.markdown( '### Mean distance by city')
-        fig = mean_distance_city( df1 )
-        st.plotly_chart( fig, use_container_width= True )
+        fig = cached_figure( mean_distance_city, *consulta, version= version, filters= filtros )
+        with span( 'render.mean_distance_city' ):
+            st.plotly_chart( fig, use_container_width= True )
     
     with col2:
         st.markdown( '### Mean time by city')
-        fig = mean_time_by_city( df1 )
-        st.plotly_chart( fig )
\ No newline at end of file
+        fig = cached_figure( mean_time_by_city, *consulta, version= version, filters= filtros )
+        with span( 'render.mean_time_by_city' ):
+            st.plotly_chart( fig )
+
+# ------------------------------------------------------------------------
+
+st.markdown( '''___''' )
+
+st.markdown( '### Preparation time' )
+
+with st.container():
+    prep_by = st.radio( 'Agrupar por', ['city', 'road_traffic_density', 'type_of_order'], horizontal= True )
+
+    col1, col2 = st.columns( 2 )
+
+    with col1:
+        fig = cached_figure( prep_time_figure, *consulta, prep_by, version= version, filters= filtros + ( prep_by, ) )
+        with span( 'render.prep_time_figure' ):
+            st.plotly_chart( fig, use_container_width= True )
+
+    with col2:
+        df_aux = service.query( 'prep_time_summary', periodo, traffic_options, cross_filters, by= prep_by )
+        st.dataframe( df_aux.set_index( prep_by ) )
+
+# ------------------------------------------------------------------------
+
+st.markdown( '''___''' )
+
+st.markdown( '### Restaurant coverage' )
+
+# restaurantes do índice espacial do serviço
+restaurants = service.query( 'restaurants', periodo, traffic_options, cross_filters )
+
+with st.container():
+    col1, col2, col3 = st.columns( 3 )
+
+    with col1:
+        restaurante = st.selectbox( 'Restaurante', restaurants.sort_values( 'orders', ascending= False, kind= 'stable' ).index.tolist(),
+                                    format_func= lambda i: '{:.6f}, {:.6f} ({} pedidos)'.format(
+                                        restaurants.at[i, 'restaurant_latitude'],
+                                        restaurants.at[i, 'restaurant_longitude'],
+                                        restaurants.at[i, 'orders'] ) )
+
+    with col2:
+        raio = st.slider( 'Raio (km)', min_value= 1, max_value= 30, value= 10 )
+
+    with col3:
+        k = st.slider( 'Restaurantes mais próximos', min_value= 1, max_value= 10, value= 5 )
+
+html, df_aux, entregas, mean_time = cached_figure( restaurant_coverage, *consulta, restaurante, raio, k,
+                                                   version= version, filters= filtros + ( restaurante, raio, k ) )
+
+with st.container():
+    col1, col2 = st.columns( [2, 1] )
+
+    with col1:
+        with span( 'render.restaurant_coverage' ):
+            components.html( html, width= 900, height= 500 + 10 )
+
+    with col2:
+        st.metric( 'Deliveries in radius', entregas )
+        st.metric( 'Mean time in radius', round( mean_time, 2 ) )
+        st.dataframe( df_aux )
+
+
+# ---------------------------------
+# DIAGNÓSTICO
+# ---------------------------------
+
+diagnostics_panel( end_rerun() )
@@ -0,0 +1,31 @@
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import clean_orders
+
+
+#----------------------------------
+# FIXTURES
+#----------------------------------
+
+@pytest.fixture( scope= 'session' )
+def orders():
+    # dataset limpo sintético, ordenado por order_date (como o load_dataset devolve)
+    return clean_orders( 5_000, seed= 7 ).reset_index( drop= True )
+
+
+@pytest.fixture( scope= 'session' )
+def orders_nan( orders ):
+    # o mesmo dataset com avaliações faltando em linhas que têm idade (o clean_code não as remove)
+    df1 = orders.copy()
+    linhas = np.random.default_rng( 7 ).choice( len( df1 ), 60, replace= False )
+    df1.loc[ linhas, 'delivery_person_ratings' ] = np.nan
+    return df1
+
+
+def assert_close( result, expected, **kwargs ):
+    # compara métricas calculadas por somas (arredondamento de ponto flutuante) com o pandas
+    pd.testing.assert_frame_equal( result.reset_index( drop= True ), expected.reset_index( drop= True ),
+                                   check_dtype= False, check_categorical= False, rtol= 1e-6, **kwargs )
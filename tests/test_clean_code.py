@@ -0,0 +1,105 @@
+"""
+Regressão do clean_code vetorizado (utils.dataset) contra o clean_code original
+das páginas, que limpava as strings célula a célula com applymap.
+
+Uso:
+    python -m pytest -q tests
+"""
+# LIBRARIES
+import warnings
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import raw_orders, read_raw
+from utils.dataset import clean_code
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def legacy_clean_code( df1 ):
+    # clean_code como estava nas páginas antes da vetorização (applymap em todas as células)
+    old_col = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+    snakecase = lambda x: x.lower()
+
+    new_cols = list( map( snakecase, old_col ))
+
+    df1.columns = new_cols
+
+    # remove spaces in the strings
+    df1 = df1.applymap( lambda x: x.strip() if isinstance(x, str) else x )
+
+    # convertendo a coluna age para int
+    df1 = df1[ df1['delivery_person_age'] != 'NaN' ]
+    df1['delivery_person_age'] = df1['delivery_person_age'].astype('int64')
+
+    # convertendo a coluna ratings para float
+    df1['delivery_person_ratings'] = df1['delivery_person_ratings'].astype(float)
+
+    # convertendo a coluna order_datew para data
+    df1['order_date'] = pd.to_datetime( df1['order_date'], format= '%d-%m-%Y')
+
+    # convertendo a coluna multiples deliveries para int
+    df1 = df1[ df1['multiple_deliveries'] != 'NaN' ]
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype('int64')
+
+    # limpando e convertendo para int a coluna time_taken
+    df1['time_taken(min)'] = df1['time_taken(min)'].apply( lambda x: x.split('(min) ')[1] )
+    df1['time_taken(min)'] = df1['time_taken(min)'].astype( 'int64' )
+
+    # filtrando NA road_traffic_density
+    df1 = df1[ df1['road_traffic_density'] != 'NaN']
+
+    # filtrando NA city
+    df1 = df1[ df1['city'] != 'NaN']
+
+    # filtrando NA festival
+    df1 = df1[ df1['festival'] != 'NaN']
+
+    return df1
+
+
+def compare( raw ):
+    # o clean_code renomeia as colunas do Dataframe recebido: cada versão limpa a sua cópia
+    with warnings.catch_warnings():
+        warnings.simplefilter( 'ignore' )
+        esperado = legacy_clean_code( raw.copy() )
+
+    pd.testing.assert_frame_equal( clean_code( raw.copy() ), esperado )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'n, seed', [ ( 2_000, 0 ), ( 5_000, 1 ), ( 20_000, 2 ) ] )
+def test_clean_code_matches_legacy( n, seed ):
+    # o CSV sintético lido pelo pd.read_csv, com os marcadores 'NaN ' e os espaços no fim
+    compare( read_raw( n, seed ) )
+
+
+def test_clean_code_matches_legacy_with_sentinels():
+    # mais faltantes que no arquivo original: todos os filtros de 'NaN' removem linhas
+    raw = read_raw( 5_000, 3 )
+    amostra = raw.sample( frac= 0.3, random_state= 3 ).index
+    for col in ['Delivery_person_Age', 'multiple_deliveries', 'Road_traffic_density', 'Festival', 'City']:
+        raw[col] = raw[col].astype( object )
+        raw.loc[ amostra[ raw.columns.get_loc( col )::7 ], col ] = 'NaN '
+
+    assert ( raw['City'] == 'NaN ' ).any()
+    compare( raw )
+
+
+def test_clean_code_strips_trailing_spaces():
+    # as linhas brutas (sem passar pelo CSV) têm espaços no fim de todos os textos
+    raw = raw_orders( 1_000, 4 )
+    assert raw['City'].str.endswith( ' ' ).any()
+
+    df1 = clean_code( raw.copy() )
+    for col in df1.select_dtypes( include= 'object' ).columns:
+        assert not df1[col].str.endswith( ' ' ).any(), col
+
+    compare( raw )
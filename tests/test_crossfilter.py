@@ -0,0 +1,87 @@
+"""
+Índice de bitmaps dos filtros cruzados (utils.crossfilter) contra as máscaras
+booleanas do pandas (isin combinados com &).
+"""
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.crossfilter import BitmapIndex
+from utils.filters import FILTER_COLS, filter_orders, normalize_filters
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def pandas_rows( df1, filtros ):
+    # baseline: AND das máscaras isin de cada coluna
+    mascara = np.ones( len( df1 ), dtype= bool )
+    for col, valores in filtros:
+        mascara &= df1[col].astype( str ).isin( valores ).values
+    return np.flatnonzero( mascara )
+
+
+def random_filters( df1, rng ):
+    # de 1 a 3 colunas, cada uma com alguns valores presentes (e às vezes um desconhecido)
+    filtros = {}
+    for col in rng.choice( FILTER_COLS, rng.integers( 1, 4 ), replace= False ):
+        valores = df1[col].cat.categories.astype( str )
+        filtros[col] = list( rng.choice( valores, min( len( valores ), rng.integers( 1, 4 ) ), replace= False ) )
+        if rng.random() < 0.2:
+            filtros[col].append( 'desconhecido' )
+    return normalize_filters( filtros )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.fixture( scope= 'module' )
+def index( orders ):
+    return BitmapIndex( orders )
+
+
+def test_counts_match_value_counts( index, orders ):
+    for col in FILTER_COLS:
+        expected = orders[col].astype( str ).value_counts()
+        assert { v: c for v, c in index.counts( col ).items() if c } == expected.to_dict()
+
+
+def test_rows_match_boolean_masks( index, orders ):
+    rng = np.random.default_rng( 0 )
+    for _ in range( 200 ):
+        filtros = random_filters( orders, rng )
+        esperado = pandas_rows( orders, filtros )
+
+        np.testing.assert_array_equal( index.rows( filtros ), esperado )
+        assert index.count( filtros ) == len( esperado )
+
+
+def test_no_filters_and_empty_selection( index, orders ):
+    assert index.rows( () ) is None
+    assert index.count( () ) == len( orders )
+
+    # só valores desconhecidos, ou colunas sem linha em comum
+    filtros = normalize_filters( { 'city': ['desconhecido'] } )
+    assert len( index.rows( filtros ) ) == 0 and index.count( filtros ) == 0
+
+    # um entregador com uma cidade em que ele não entregou: os conjuntos não se cruzam
+    pares = orders.groupby( ['delivery_person_id', 'city'], observed= False ).size()
+    entregador, cidade = pares[ pares == 0 ].index[0]
+    filtros = normalize_filters( { 'city': [cidade], 'delivery_person_id': [entregador] } )
+    assert len( index.rows( filtros ) ) == 0 and index.count( filtros ) == 0
+
+
+def test_filter_orders_with_rows( index, orders ):
+    filtros = normalize_filters( { 'city': ['Urban'], 'festival': ['No'] } )
+    data_inicio, data_limite = pd.Timestamp( '2022-02-20' ), pd.Timestamp( '2022-03-20' )
+
+    result = filter_orders( orders, data_limite, ['Low', 'Jam'], data_inicio, rows= index.rows( filtros ) )
+
+    linhas = orders.iloc[ pandas_rows( orders, filtros ) ]
+    expected = linhas[ ( linhas['order_date'] >= data_inicio ) & ( linhas['order_date'] < data_limite ) &
+                       linhas['road_traffic_density'].isin( ['Low', 'Jam'] ) ]
+    assert len( expected )
+    pd.testing.assert_frame_equal( result, expected )
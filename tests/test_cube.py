@@ -0,0 +1,42 @@
+"""
+Cubo pré-agregado (utils.cube) contra o groupby do pandas nas linhas.
+"""
+# LIBRARIES
+import pytest
+
+from tests.conftest import assert_close
+from utils.cube import build_cube, combine_cubes, summarize_cube
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'dataset', ['orders', 'orders_nan'] )
+@pytest.mark.parametrize( 'by', [ ['weatherconditions'], ['city', 'road_traffic_density'], ['festival'] ] )
+def test_summarize_cube_matches_groupby( request, dataset, by ):
+    df1 = request.getfixturevalue( dataset )
+
+    result = summarize_cube( build_cube( df1 ), by )
+
+    grupos = df1.groupby( by, observed= True )
+    expected = grupos['time_taken(min)'].agg( ['size', 'mean', 'std'] ).set_axis(
+        ['orders', 'mean_time', 'std_time'], axis= 1 )
+    expected[['mean_rating', 'std_rating']] = grupos['delivery_person_ratings'].agg( ['mean', 'std'] ).values
+
+    assert_close( result, expected.sort_index().reset_index() )
+
+
+def test_nan_ratings_are_not_counted( orders_nan ):
+    cube = build_cube( orders_nan )
+
+    assert cube['orders'].sum() == len( orders_nan )
+    assert cube['rating_count'].sum() == orders_nan['delivery_person_ratings'].notna().sum()
+
+
+def test_combine_cubes_matches_whole_cube( orders_nan ):
+    metade = len( orders_nan ) // 2
+    partes = [ build_cube( orders_nan.iloc[:metade] ), build_cube( orders_nan.iloc[metade:] ) ]
+
+    assert_close( summarize_cube( combine_cubes( partes ), ['weatherconditions'] ),
+                  summarize_cube( build_cube( orders_nan ), ['weatherconditions'] ) )
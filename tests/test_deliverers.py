@@ -0,0 +1,89 @@
+"""
+Índice e perfil dos entregadores (utils.deliverers) contra o filtro e o groupby
+do pandas, com e sem avaliações faltando.
+"""
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import assert_close
+from utils.deliverers import DelivererIndex, profile_summary, ratings_trend, time_by
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def sample_deliverers( df1, n= 3 ):
+    # os entregadores com mais pedidos e, no orders_nan, alguns com avaliações faltando
+    ids = df1['delivery_person_id'].astype( str )
+    sem_avaliacao = ids[ df1['delivery_person_ratings'].isna() ].unique()[:n]
+    return list( ids.value_counts().index[:n] ) + list( sem_avaliacao )
+
+
+def pandas_trend( orders ):
+    # baseline: groupby por dia; a média acumulada é soma acumulada / avaliações acumuladas
+    rating = orders['delivery_person_ratings'].astype( 'float64' )
+    df_aux = pd.DataFrame( { 'order_date': orders['order_date'], 'rating': rating, 'avaliado': rating.notna() } )
+    df_aux = df_aux.groupby( 'order_date' ).agg( orders= ( 'rating', 'size' ), mean_rating= ( 'rating', 'mean' ),
+                                                  soma= ( 'rating', 'sum' ), avaliados= ( 'avaliado', 'sum' ) )
+    df_aux['cumulative_rating'] = df_aux['soma'].cumsum() / df_aux['avaliados'].cumsum()
+    return df_aux.drop( columns= ['soma', 'avaliados'] ).reset_index()
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'dataset', [ 'orders', 'orders_nan' ] )
+def test_index_rows_match_filter( dataset, request ):
+    df1 = request.getfixturevalue( dataset )
+    index = DelivererIndex( df1 )
+
+    esperado = df1['delivery_person_id'].astype( str ).value_counts()
+    assert dict( zip( index.ids, index.counts() ) ) == esperado.to_dict()
+
+    for deliverer in sample_deliverers( df1 ):
+        np.testing.assert_array_equal( index.rows( deliverer ),
+                                       np.flatnonzero( df1['delivery_person_id'] == deliverer ) )
+
+    with pytest.raises( KeyError ):
+        index.rows( 'desconhecido' )
+
+
+@pytest.mark.parametrize( 'dataset', [ 'orders', 'orders_nan' ] )
+def test_profile_matches_pandas( dataset, request ):
+    df1 = request.getfixturevalue( dataset )
+    index = DelivererIndex( df1 )
+
+    for deliverer in sample_deliverers( df1 ):
+        pedidos = df1.iloc[ index.rows( deliverer ) ]
+
+        assert_close( ratings_trend( pedidos ), pandas_trend( pedidos ) )
+
+        resumo = profile_summary( pedidos ).iloc[0]
+        assert resumo['orders'] == len( pedidos )
+        assert resumo['mean_rating'] == pytest.approx( pedidos['delivery_person_ratings'].astype( 'float64' ).mean() )
+        assert resumo['mean_time'] == pytest.approx( pedidos['time_taken(min)'].mean() )
+
+        for by in ['road_traffic_density', 'weatherconditions']:
+            expected = ( pedidos.groupby( by, observed= True )['time_taken(min)']
+                                .agg( orders= 'size', mean_time= 'mean', std_time= 'std' )
+                                .sort_index().reset_index() )
+            assert_close( time_by( pedidos, by ), expected )
+
+
+def test_profile_without_orders_or_ratings( orders ):
+    pedidos = orders.iloc[:0]
+    assert ratings_trend( pedidos ).empty
+    assert profile_summary( pedidos ).empty
+    assert time_by( pedidos, 'road_traffic_density' ).empty
+
+    # um dia sem nenhuma avaliação: média NaN no dia, a acumulada segue com os outros dias
+    pedidos = orders.iloc[::250].copy()
+    primeiro = pedidos['order_date'] == pedidos['order_date'].iloc[0]
+    pedidos.loc[ primeiro, 'delivery_person_ratings' ] = np.nan
+
+    assert_close( ratings_trend( pedidos ), pandas_trend( pedidos ) )
+    assert np.isnan( ratings_trend( pedidos )['mean_rating'].iloc[0] )
@@ -0,0 +1,55 @@
+"""
+Contagens de valores distintos (utils.distinct): exatas contra o nunique do
+pandas e estimativas HyperLogLog dentro do erro esperado.
+"""
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.distinct import (approx_distinct_by, build_sketches, exact_distinct, exact_distinct_by, filter_sketches,
+                            hll_count, hll_update, value_hashes)
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+def test_exact_distinct_matches_nunique( orders ):
+    assert exact_distinct( orders['delivery_person_id'] ) == orders['delivery_person_id'].nunique()
+
+
+def test_exact_distinct_by_matches_groupby( orders ):
+    semanas = orders['week_of_year'].cat.remove_unused_categories()
+    result = exact_distinct_by( semanas.cat.codes.values, orders['delivery_person_id'] )
+
+    expected = orders.groupby( semanas, observed= True )['delivery_person_id'].nunique()
+    np.testing.assert_array_equal( result, expected.values )
+
+
+def test_exact_distinct_ignores_nan_and_empty():
+    serie = pd.Series( ['a', None, 'b', 'a'], dtype= 'category' )
+    assert exact_distinct( serie ) == 2
+    assert exact_distinct_by( [], serie.iloc[:0] ).tolist() == []
+
+
+@pytest.mark.parametrize( 'n', [ 100, 5_000, 200_000 ] )
+def test_hll_count_within_error( n ):
+    serie = pd.Series( [ f'DEL{i:07d}' for i in range( n ) ] * 2, dtype= 'category' )
+    registers = np.zeros( ( 1, 1 << 14 ), dtype= np.uint8 )
+    hll_update( registers, np.zeros( len( serie ), dtype= np.int64 ), value_hashes( serie ) )
+
+    # erro padrão de ~0,8%: 4 desvios
+    assert abs( hll_count( registers )[0] / n - 1 ) < 0.035
+
+
+def test_approx_distinct_by_close_to_nunique( orders ):
+    result = approx_distinct_by( build_sketches( orders ), ['week_of_year'] )
+    expected = orders.groupby( orders['week_of_year'].astype( str ) )['delivery_person_id'].nunique()
+
+    np.testing.assert_allclose( result['distinct'].values, expected.loc[ result['week_of_year'] ].values, rtol= 0.035 )
+
+
+def test_approx_distinct_by_empty_selection( orders ):
+    vazio = filter_sketches( build_sketches( orders ), pd.Timestamp( 2022, 3, 1 ), [] )
+    assert approx_distinct_by( vazio, ['week_of_year'] ).empty
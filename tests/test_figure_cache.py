@@ -0,0 +1,66 @@
+"""
+Cache de figuras (utils.figure_cache): LRU com TTL e figuras Plotly guardadas
+como JSON, reconstruídas por sessão.
+"""
+# LIBRARIES
+import time
+
+import pytest
+
+from utils.figure_cache import FigureCache, PlotlySpec, figure_cache
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def session_script():
+    # cada AppTest é uma sessão: altera a própria figura e mostra o título da figura do cache
+    import plotly.express as px
+    import streamlit as st
+
+    from utils.figure_cache import cached_figure
+
+    def figura():
+        return px.bar( x= ['a', 'b'], y= [1, 2], title= 'original' )
+
+    fig = cached_figure( figura, version= 'test', filters= () )
+    st.text( fig.layout.title.text )
+    fig.update_layout( title= 'alterada' )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+def test_lru_and_ttl():
+    cache = FigureCache( maxsize= 2, ttl= 0.05 )
+    cache.set( 'a', 1 )
+    cache.set( 'b', 2 )
+    cache.get( 'a' )
+    cache.set( 'c', 3 )
+
+    assert cache.get( 'b' ) is None and cache.get( 'a' ) == 1
+    time.sleep( 0.06 )
+    assert cache.get( 'a' ) is None
+
+
+def test_plotly_figures_are_cached_as_json_per_session():
+    # o AppTest só existe a partir do streamlit 1.28 (o requirements fixa a 1.11)
+    AppTest = pytest.importorskip( 'streamlit.testing.v1' ).AppTest
+    figure_cache.clear()
+
+    primeira = AppTest.from_function( session_script ).run()
+    assert not primeira.exception
+    assert primeira.text[0].value == 'original'
+
+    # a mesma sessão reaproveita a própria figura (alterada por ela)
+    primeira.run()
+    assert primeira.text[0].value == 'alterada'
+
+    # outra sessão reconstrói a figura do JSON compartilhado, sem a alteração
+    segunda = AppTest.from_function( session_script ).run()
+    assert segunda.text[0].value == 'original'
+
+    specs = [ valor for _, valor in figure_cache._itens.values() ]
+    assert specs and all( isinstance( spec, PlotlySpec ) for spec in specs )
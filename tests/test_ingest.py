@@ -0,0 +1,128 @@
+"""
+Store Parquet (utils.ingest) e limpeza em paralelo (utils.parallel) contra o
+build_dataset/build_cube do CSV inteiro, inclusive com linhas anexadas ao CSV
+em mais de uma vez e uma linha ainda sendo escrita.
+"""
+# LIBRARIES
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_csv
+from tests.conftest import assert_close
+from utils.cube import build_cube, combine_cubes
+from utils.dataset import build_dataset, read_store, sort_by_date
+from utils.ingest import append, ingest
+from utils.parallel import parallel_build, split_csv
+from utils.store import csv_status, read_manifest, store_path_for
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def store_contents( path ):
+    # dataset (ordenado por data, como o load_dataset) e cubo gravados no store
+    store_path = store_path_for( path )
+    manifest = read_manifest( store_path )
+
+    df1 = sort_by_date( read_store( store_path, manifest['parts'] ) )
+    cube = pd.read_parquet( os.path.join( store_path, manifest['cube'] ), engine= 'pyarrow' )
+    return df1, combine_cubes( [cube] ), manifest
+
+
+def assert_matches_csv( path, df1, cube ):
+    # mesmo resultado que montar o dataset e o cubo do CSV inteiro de uma vez
+    expected = build_dataset( path, workers= 1 )
+    pd.testing.assert_frame_equal( df1, expected, check_categorical= False )
+    assert_close( cube, combine_cubes( [ build_cube( expected ) ] ) )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.fixture( scope= 'module' )
+def csv_lines( tmp_path_factory ):
+    # linhas do CSV sintético (com o '\n' de cada uma)
+    path = write_csv( str( tmp_path_factory.mktemp( 'csv' ) / 'train.csv' ), 3_000, seed= 5 )
+    with open( path, 'rb' ) as f:
+        return f.readlines()
+
+
+@pytest.fixture
+def csv_path( tmp_path ):
+    return str( tmp_path / 'train.csv' )
+
+
+@pytest.mark.parametrize( 'workers', [ 1, 2 ] )
+def test_ingest_matches_build_dataset( csv_lines, csv_path, workers ):
+    with open( csv_path, 'wb' ) as f:
+        f.writelines( csv_lines )
+
+    linhas = ingest( csv_path, chunksize= 700, workers= workers )
+
+    df1, cube, manifest = store_contents( csv_path )
+    assert linhas == manifest['rows'] == len( df1 )
+    assert manifest['offset'] == os.stat( csv_path ).st_size
+    assert_matches_csv( csv_path, df1, cube )
+
+
+def test_append_only_complete_lines( csv_lines, csv_path ):
+    with open( csv_path, 'wb' ) as f:
+        f.writelines( csv_lines[:1_001] )
+    ingest( csv_path, chunksize= 400 )
+    assert append( csv_path ) == 0
+
+    # linhas novas e a última ainda sendo escrita (sem o '\n')
+    parcial = csv_lines[2_000]
+    with open( csv_path, 'ab' ) as f:
+        f.writelines( csv_lines[1_001:2_000] )
+        f.write( parcial[:len( parcial ) // 2] )
+
+    assert csv_status( csv_path, read_manifest( store_path_for( csv_path ) ) ) == 'appended'
+    assert append( csv_path ) > 0
+
+    # a marca d'água fica no fim da última linha completa
+    manifest = read_manifest( store_path_for( csv_path ) )
+    assert manifest['offset'] == sum( len( linha ) for linha in csv_lines[:2_000] )
+    assert len( manifest['parts'] ) == 2
+
+    # o resto da linha e as demais chegam depois
+    with open( csv_path, 'ab' ) as f:
+        f.write( parcial[len( parcial ) // 2:] )
+        f.writelines( csv_lines[2_001:] )
+    assert append( csv_path ) > 0
+
+    df1, cube, manifest = store_contents( csv_path )
+    assert manifest['offset'] == os.stat( csv_path ).st_size
+    assert len( manifest['parts'] ) == 3
+    assert_matches_csv( csv_path, df1, cube )
+
+
+def test_append_ignores_rewritten_csv( csv_lines, csv_path ):
+    with open( csv_path, 'wb' ) as f:
+        f.writelines( csv_lines[:1_000] )
+    ingest( csv_path )
+
+    # o CSV reescrito (outras linhas no lugar das antigas) não é tratado como anexado
+    with open( csv_path, 'wb' ) as f:
+        f.writelines( csv_lines[:1] + csv_lines[1_500:] )
+
+    assert csv_status( csv_path, read_manifest( store_path_for( csv_path ) ) ) == 'changed'
+    assert append( csv_path ) == 0
+
+
+@pytest.mark.parametrize( 'workers, partitions', [ ( 1, 5 ), ( 2, 3 ) ] )
+def test_parallel_build_matches_build_dataset( csv_lines, csv_path, workers, partitions ):
+    with open( csv_path, 'wb' ) as f:
+        f.writelines( csv_lines )
+
+    # as partições cobrem o arquivo inteiro e terminam em fim de linha
+    _, intervalos = split_csv( csv_path, partitions )
+    assert intervalos[-1][1] == os.stat( csv_path ).st_size
+    assert all( fim == proximo for ( _, fim ), ( proximo, _ ) in zip( intervalos[:-1], intervalos[1:] ) )
+
+    df1, cube = parallel_build( csv_path, workers, partitions )
+    assert_matches_csv( csv_path, df1, cube )
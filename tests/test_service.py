@@ -0,0 +1,131 @@
+"""
+Serviço de consultas (utils.service): em processo contra o pandas, e pelo HTTP
+(QueryClient + QueryHandler) contra o serviço em processo.
+"""
+# LIBRARIES
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_csv
+from utils.dataset import load_dataset
+from utils.filters import filter_orders
+from utils.service import QUERIES, TRAFFIC_OPTIONS, QueryClient, QueryHandler, QueryService, frame_from_json, frame_to_json
+
+
+PERIODO = ( pd.Timestamp( 2022, 2, 15 ), pd.Timestamp( 2022, 3, 25 ) )
+
+# parâmetros das consultas que têm parâmetros obrigatórios
+PARAMS = { 'deliverer_summary': { 'deliverer': None },
+           'deliverer_history': { 'deliverer': None },
+           'deliverer_ratings_trend': { 'deliverer': None },
+           'deliverer_time_by': { 'deliverer': None, 'by': 'weatherconditions' },
+           'deliveries_near': { 'restaurant': 0, 'radius': 5 },
+           'nearest_restaurants': { 'restaurant': 0, 'k': 3 } }
+
+# filtros da sidebar: padrão, seleção vazia de tráfego e um recorte com poucas linhas (desvios NaN)
+FILTERS = { 'default': ( TRAFFIC_OPTIONS, None ),
+            'no_traffic': ( [], None ),
+            'narrow': ( ['Low', 'Jam'], { 'city': ['Semi-Urban'], 'festival': ['Yes'] } ) }
+
+
+#----------------------------------
+# FIXTURES
+#----------------------------------
+
+@pytest.fixture( scope= 'module' )
+def service( tmp_path_factory ):
+    path = write_csv( str( tmp_path_factory.mktemp( 'service' ) / 'train.csv' ), 4_000, seed= 11 )
+    return QueryService( path )
+
+
+@pytest.fixture( scope= 'module' )
+def client( service ):
+    handler = type( 'Handler', ( QueryHandler, ), { 'service': service, 'log_message': lambda *args: None } )
+    server = ThreadingHTTPServer( ( '127.0.0.1', 0 ), handler )
+    threading.Thread( target= server.serve_forever, daemon= True ).start()
+
+    yield QueryClient( f'http://127.0.0.1:{server.server_port}' )
+
+    server.shutdown()
+    server.server_close()
+
+
+def params_for( service, name ):
+    params = dict( PARAMS.get( name, {} ) )
+    if 'deliverer' in params:
+        params['deliverer'] = service.query( 'deliverer_list', PERIODO, TRAFFIC_OPTIONS )['delivery_person_id'].iloc[0]
+    return params
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'filters', list( FILTERS ) )
+@pytest.mark.parametrize( 'name', sorted( QUERIES ) )
+def test_http_matches_in_process( service, client, name, filters ):
+    traffic_options, cross_filters = FILTERS[filters]
+    params = params_for( service, name )
+
+    local = service.query( name, PERIODO, traffic_options, cross_filters, **params )
+    remoto = client.query( name, PERIODO, traffic_options, cross_filters, **params )
+
+    # CategoricalDtype compara categorias e ordem; a largura dos códigos é detalhe do pandas
+    # (um category vazio pode sair com códigos int8 mesmo com milhares de categorias)
+    assert remoto.dtypes.to_dict() == local.dtypes.to_dict()
+    pd.testing.assert_frame_equal( remoto, local.reset_index( drop= True ), check_exact= False, rtol= 1e-9,
+                                   check_categorical= False )
+
+
+def test_json_round_trip_keeps_dtypes():
+    # colunas terminadas em _time não viram datas, mesmo só com NaN; float32 e int8 voltam iguais
+    df_aux = pd.DataFrame( { 'city': pd.Categorical( ['Urban', 'Semi-Urban'] ),
+                             'order_date': pd.to_datetime( ['2022-02-11', '2022-02-12'] ),
+                             'orders': pd.Series( [1, 2], dtype= 'int8' ),
+                             'mean_time': pd.Series( [20.5, 31.25], dtype= 'float32' ),
+                             'std_time': [ float( 'nan' ) ] * 2 } )
+
+    pd.testing.assert_frame_equal( frame_from_json( frame_to_json( df_aux ) ), df_aux )
+    pd.testing.assert_frame_equal( frame_from_json( frame_to_json( df_aux.iloc[:1] ) ), df_aux.iloc[:1] )
+
+
+def test_empty_traffic_selection_is_empty( service, client ):
+    for consulta in ['orders_by_traffic', 'ratings_by_traffic', 'orders_by_city_traffic']:
+        assert service.query( consulta, PERIODO, [] ).empty
+        assert client.query( consulta, PERIODO, [] ).empty
+
+
+def test_orders_by_traffic_matches_pandas( service ):
+    df1 = service.query( 'deliverer_list', PERIODO, TRAFFIC_OPTIONS )
+    assert df1['orders'].sum() > 0
+
+    result = service.query( 'orders_by_traffic', PERIODO, ['Low', 'Jam'] )
+    total = service.query( 'orders_by_day', PERIODO, ['Low', 'Jam'] )['orders'].sum()
+    assert result['orders'].sum() == total
+
+
+@pytest.mark.parametrize( 'query_string', [ 'data_limite=notadate', 'data_limite=2022-03-01&data_inicio=xx',
+                                            'data_limite=2022-03-01&window=abc' ] )
+def test_invalid_parameters_answer_400( client, query_string ):
+    nome = 'rolling_by_city' if 'window' in query_string else 'orders_by_day'
+    with pytest.raises( urllib.error.HTTPError ) as erro:
+        urllib.request.urlopen( f'{client.url}/query/{nome}?{query_string}' )
+
+    assert erro.value.code == 400
+    assert 'error' in json.loads( erro.value.read() )
+
+
+def test_orders_per_deliverer_by_week_is_exact( service ):
+    df1 = filter_orders( load_dataset( service.path ), PERIODO[1], ['Low', 'Jam'], PERIODO[0] )
+    expected = df1.groupby( df1['week_of_year'].astype( str ) )['delivery_person_id'].nunique()
+
+    result = service.query( 'orders_per_deliverer_by_week', PERIODO, ['Low', 'Jam'] )
+    assert result['distinct'].tolist() == expected.loc[ result['week_of_year'] ].tolist()
+    assert len( result ) == len( expected )
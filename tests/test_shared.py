@@ -0,0 +1,85 @@
+"""
+Snapshot compartilhado do dataset limpo (utils.shared): leitura idêntica ao
+dataset gravado e limpeza das versões antigas sem tirar a anterior de quem lê.
+"""
+# LIBRARIES
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import utils.shared as shared
+
+
+#----------------------------------
+# FIXTURES
+#----------------------------------
+
+@pytest.fixture
+def csv_path( tmp_path, monkeypatch ):
+    monkeypatch.setattr( shared, 'SHARED', True )
+    return str( tmp_path / 'train.csv' )
+
+
+def dead_pid():
+    # pid de um processo que já terminou
+    processo = subprocess.Popen( [ sys.executable, '-c', 'pass' ] )
+    processo.wait()
+    return processo.pid
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+def test_snapshot_round_trip( orders, orders_nan, tmp_path ):
+    for i, df1 in enumerate( [ orders, orders_nan, orders.iloc[:0] ] ):
+        result = shared.read_snapshot( shared.write_snapshot( df1, str( tmp_path / f'v{i}' ) ) )
+        pd.testing.assert_frame_equal( result, df1.reset_index( drop= True ) )
+
+
+def test_share_dataset_reads_existing_version( orders, csv_path ):
+    assert shared.share_dataset( csv_path, ( csv_path, 1, 1 ), None ) is None
+
+    df1 = shared.share_dataset( csv_path, ( csv_path, 1, 1 ), orders )
+    pd.testing.assert_frame_equal( shared.share_dataset( csv_path, ( csv_path, 1, 1 ), None ), df1 )
+
+
+def test_share_dataset_keeps_previous_version( orders, csv_path ):
+    base = shared.shared_path_for( csv_path )
+    for i in range( 4 ):
+        shared.share_dataset( csv_path, ( csv_path, i, i ), orders.iloc[ :100 * ( i + 1 ) ] )
+        # versões gravadas no mesmo instante teriam o mesmo mtime
+        os.utime( os.path.join( base, shared.snapshot_name( ( csv_path, i, i ) ), shared.COLUMNS_FILE ),
+                  ( 1_000 + i, 1_000 + i ) )
+
+    assert sorted( os.listdir( base ) ) == sorted( shared.snapshot_name( ( csv_path, i, i ) ) for i in ( 2, 3 ) )
+
+    # quem ainda monta a versão anterior continua lendo o snapshot dela
+    assert len( shared.share_dataset( csv_path, ( csv_path, 2, 2 ), None ) ) == 300
+
+
+def test_share_dataset_removes_tmp_of_dead_writers( orders, csv_path ):
+    base = shared.shared_path_for( csv_path )
+    morto = os.path.join( base, f'abc.tmp-{dead_pid()}' )
+    vivo = os.path.join( base, f'abc.tmp-{os.getpid()}' )
+    os.makedirs( morto )
+    os.makedirs( vivo )
+
+    shared.share_dataset( csv_path, ( csv_path, 1, 1 ), orders )
+    assert not os.path.exists( morto )
+    assert os.path.exists( vivo )
+
+
+def test_share_dataset_falls_back_when_snapshot_disappears( orders, csv_path ):
+    version = ( csv_path, 1, 1 )
+    shared.share_dataset( csv_path, version, orders )
+
+    # outro processo removendo a versão no meio da leitura
+    snapshot_path = os.path.join( shared.shared_path_for( csv_path ), shared.snapshot_name( version ) )
+    os.remove( os.path.join( snapshot_path, '00.npy' ) )
+
+    assert shared.share_dataset( csv_path, version, None ) is None
+    assert shared.share_dataset( csv_path, version, orders ) is orders
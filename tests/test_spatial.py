@@ -0,0 +1,60 @@
+"""
+Índice espacial em grade (utils.spatial) contra a busca completa com haversine.
+"""
+# LIBRARIES
+import numpy as np
+import pytest
+
+from utils.geo import haversine_np
+from utils.spatial import GridIndex, build_spatial_indexes
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def brute_force( index, lat, lon ):
+    # distância do ponto a todos os pontos do índice
+    return haversine_np( np.full( len( index ), lat ), np.full( len( index ), lon ), index.lat, index.lon )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.fixture( scope= 'module' )
+def delivery_index( orders ):
+    return build_spatial_indexes( orders ).delivery_index
+
+
+@pytest.mark.parametrize( 'raio', [ 0.5, 3, 25 ] )
+def test_query_radius_matches_brute_force( delivery_index, orders, raio ):
+    for lat, lon in orders[['restaurant_latitude', 'restaurant_longitude']].values[:20]:
+        pos, dist = delivery_index.query_radius( lat, lon, raio )
+
+        todas = brute_force( delivery_index, lat, lon )
+        assert sorted( pos ) == list( np.flatnonzero( todas <= raio ) )
+        np.testing.assert_allclose( dist, np.sort( todas[ todas <= raio ] ) )
+
+
+@pytest.mark.parametrize( 'k', [ 1, 7, 50 ] )
+def test_query_knn_matches_brute_force( delivery_index, orders, k ):
+    for lat, lon in orders[['restaurant_latitude', 'restaurant_longitude']].values[:20]:
+        pos, dist = delivery_index.query_knn( lat, lon, k )
+
+        todas = brute_force( delivery_index, lat, lon )
+        assert len( pos ) == k
+        np.testing.assert_allclose( dist, np.sort( todas )[:k] )
+        np.testing.assert_allclose( todas[pos], dist )
+
+
+def test_query_knn_far_point_and_small_index():
+    # ponto longe de tudo (cai na busca completa) e k maior que o índice
+    index = GridIndex( [ 10.0, 10.01, -30.0 ], [ 20.0, 20.02, 150.0 ] )
+
+    pos, dist = index.query_knn( 60.0, -100.0, 5 )
+    assert len( pos ) == 3
+    np.testing.assert_allclose( dist, np.sort( brute_force( index, 60.0, -100.0 ) ) )
+
+    pos, dist = GridIndex( [], [] ).query_knn( 0.0, 0.0, 3 )
+    assert len( pos ) == 0 and len( dist ) == 0
@@ -0,0 +1,112 @@
+"""
+Série diária com somas acumuladas (utils.timeseries) contra o pandas nas linhas.
+"""
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import assert_close
+from utils.cube import summarize_cube
+from utils.timeseries import build_timeseries, range_totals, rolling_window, update_timeseries, weekly_growth
+
+
+TRAFFIC = ['Low', 'Medium', 'High', 'Jam']
+
+INICIO, FIM = pd.Timestamp( 2022, 2, 20 ), pd.Timestamp( 2022, 3, 20 )
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def selecionar( df1, traffic_options, inicio= INICIO, fim= FIM ):
+    # as mesmas linhas que o filtro da sidebar seleciona
+    linhas = ( ( df1['order_date'] >= inicio ) & ( df1['order_date'] < fim ) &
+               df1['road_traffic_density'].isin( traffic_options ) )
+    return df1.loc[linhas]
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'dataset', ['orders', 'orders_nan'] )
+@pytest.mark.parametrize( 'traffic_options', [ TRAFFIC, ['Jam', 'Low'] ] )
+def test_range_totals_ratings_match_groupby( request, dataset, traffic_options ):
+    df1 = request.getfixturevalue( dataset )
+
+    totals = range_totals( build_timeseries( df1 ), FIM, traffic_options, INICIO )
+    result = summarize_cube( totals, ['road_traffic_density'] )[[ 'road_traffic_density', 'orders', 'mean_rating', 'std_rating' ]]
+
+    grupos = selecionar( df1, traffic_options ).groupby( 'road_traffic_density', observed= True )
+    expected = grupos['delivery_person_ratings'].agg( ['size', 'mean', 'std'] ).set_axis(
+        ['orders', 'mean_rating', 'std_rating'], axis= 1 ).sort_index().reset_index()
+
+    assert_close( result, expected )
+
+
+def test_range_totals_empty_selection( orders ):
+    assert range_totals( build_timeseries( orders ), FIM, [], INICIO ).empty
+
+
+@pytest.mark.parametrize( 'dataset', ['orders', 'orders_nan'] )
+def test_rolling_window_matches_pandas( request, dataset ):
+    df1 = request.getfixturevalue( dataset )
+    window = 7
+
+    result = rolling_window( build_timeseries( df1 ), window, FIM, TRAFFIC, INICIO )
+
+    linhas = []
+    for dia in pd.date_range( INICIO, FIM - pd.Timedelta( days= 1 ) ):
+        janela = selecionar( df1, TRAFFIC, max( INICIO, dia - pd.Timedelta( days= window - 1 ) ), dia + pd.Timedelta( days= 1 ) )
+        for city in sorted( df1['city'].unique() ):
+            pedidos = janela.loc[ janela['city'] == city ]
+            linhas.append( { 'order_date': dia, 'city': city, 'orders': len( pedidos ),
+                             'mean_time': pedidos['time_taken(min)'].mean(),
+                             'mean_rating': pedidos['delivery_person_ratings'].mean() } )
+
+    expected = pd.DataFrame( linhas )
+    assert not result['mean_rating'].isna().any()
+    assert_close( result, expected )
+
+
+def test_weekly_growth_orders_match_groupby( orders_nan ):
+    result = weekly_growth( build_timeseries( orders_nan ), FIM, TRAFFIC, INICIO )
+
+    df_aux = selecionar( orders_nan, TRAFFIC )
+    semana = df_aux['order_date'] - pd.to_timedelta( ( df_aux['order_date'].dt.dayofweek + 1 ) % 7, unit= 'D' )
+    expected = df_aux.groupby( [ semana.rename( 'week_start' ), 'city' ], observed= True ).agg(
+        orders= ( 'time_taken(min)', 'size' ), mean_rating= ( 'delivery_person_ratings', 'mean' ) ).reset_index()
+
+    result = result.loc[ result['orders'] > 0, ['week_start', 'city', 'orders', 'mean_rating'] ]
+    ordem = lambda df: df.astype( { 'city': str } ).sort_values( ['week_start', 'city'] )
+    assert_close( ordem( result ), ordem( expected ) )
+
+
+def test_update_timeseries_matches_full_build( orders_nan ):
+    metade = len( orders_nan ) * 2 // 3
+    parcial = update_timeseries( build_timeseries( orders_nan.iloc[:metade] ), orders_nan.iloc[metade:] )
+    completa = build_timeseries( orders_nan )
+
+    assert parcial.first_day == completa.first_day
+    assert list( parcial.cities ) == list( completa.cities )
+    np.testing.assert_allclose( parcial.sums, completa.sums )
+    np.testing.assert_allclose( parcial.prefix, completa.prefix )
+    assert np.isfinite( completa.prefix ).all()
+
+
+def test_update_timeseries_new_city_and_earlier_day( orders ):
+    # linhas novas com uma cidade nova e um dia antes do primeiro: os eixos são ampliados
+    novas = orders.iloc[:50].copy()
+    novas['city'] = novas['city'].cat.add_categories( ['Zeta'] ).cat.set_categories( ['Zeta'] ).fillna( 'Zeta' )
+    novas['order_date'] = orders['order_date'].min() - pd.Timedelta( days= 3 )
+
+    todas = pd.concat( [ orders.astype( { 'city': object } ), novas.astype( { 'city': object } ) ], ignore_index= True )
+    todas['city'] = todas['city'].astype( 'category' )
+
+    parcial = update_timeseries( build_timeseries( orders ), novas )
+    completa = build_timeseries( todas )
+
+    assert list( parcial.cities ) == list( completa.cities )
+    np.testing.assert_allclose( parcial.prefix, completa.prefix )
@@ -0,0 +1,70 @@
+"""
+Seleção dos k menores e maiores por grupo (utils.topk) contra o nsmallest e o
+nlargest do pandas, inclusive com muitos empates.
+"""
+# LIBRARIES
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.topk import group_means, top_k_means, top_k_per_group
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def pandas_top_k( grupos, valores, k ):
+    # baseline: nsmallest / nlargest por grupo, empates resolvidos pela primeira posição
+    serie = pd.Series( valores )
+    menores, maiores = [], []
+    for _, parte in serie.groupby( grupos, sort= True ):
+        menores.extend( parte.nsmallest( k, keep= 'first' ).index )
+        maiores.extend( parte.nlargest( k, keep= 'first' ).index )
+
+    return np.array( menores, dtype= np.int64 ), np.array( maiores, dtype= np.int64 )
+
+
+#----------------------------------
+# TESTS
+#----------------------------------
+
+@pytest.mark.parametrize( 'k', [ 1, 3, 10, 400 ] )
+@pytest.mark.parametrize( 'distintos', [ 4, 50, 100_000 ] )
+def test_top_k_per_group_matches_pandas( k, distintos ):
+    # poucos valores distintos: empates em volta do k-ésimo em quase todos os grupos
+    rng = np.random.default_rng( distintos + k )
+    grupos = rng.integers( 0, 6, 3_000 )
+    valores = rng.integers( 0, distintos, 3_000 ).astype( np.float64 )
+
+    menores, maiores = top_k_per_group( grupos, valores, k )
+    esperado_menores, esperado_maiores = pandas_top_k( grupos, valores, k )
+
+    np.testing.assert_array_equal( menores, esperado_menores )
+    np.testing.assert_array_equal( maiores, esperado_maiores )
+
+
+def test_top_k_per_group_empty():
+    menores, maiores = top_k_per_group( np.empty( 0, dtype= np.int64 ), np.empty( 0 ), 5 )
+    assert len( menores ) == 0 and len( maiores ) == 0
+
+
+def test_group_means_matches_groupby( orders ):
+    result = group_means( orders, ['city', 'delivery_person_id'], 'time_taken(min)' )
+
+    # com duas chaves category o groupby(observed=True) não devolve na ordem das categorias
+    expected = ( orders.groupby( ['city', 'delivery_person_id'], observed= True )['time_taken(min)']
+                       .mean().reset_index().sort_values( ['city', 'delivery_person_id'] ).reset_index( drop= True ) )
+    pd.testing.assert_frame_equal( result, expected, check_categorical= False )
+
+
+def test_top_k_means_matches_pandas( orders ):
+    menores, maiores = top_k_means( orders, 'city', 'delivery_person_id', 'time_taken(min)', 10 )
+
+    df_aux = ( orders.groupby( ['city', 'delivery_person_id'], observed= True )['time_taken(min)']
+                     .mean().reset_index().sort_values( ['city', 'delivery_person_id'] ).reset_index( drop= True ) )
+    for result, metodo in ( ( menores, 'nsmallest' ), ( maiores, 'nlargest' ) ):
+        expected = ( df_aux.groupby( 'city', observed= True, group_keys= False )
+                           .apply( lambda parte: getattr( parte, metodo )( 10, 'time_taken(min)' ) )
+                           .reset_index( drop= True ) )
+        pd.testing.assert_frame_equal( result, expected, check_categorical= False )
@@ -0,0 +1,207 @@
+# LIBRARIES
+import threading
+
+from functools import lru_cache
+
+import numpy as np
+
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.figure_cache import FigureCache
+from utils.filters import FILTER_COLS
+from utils.instrument import instrumented
+
+
+# quantidade de bits por valor da tabela de popcount (np.bitwise_count só existe no numpy 2)
+_POPCOUNT = np.array( [ bin( i ).count( '1' ) for i in range( 256 ) ], dtype= np.uint8 )
+
+_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+# Cada conjunto de linhas é guardado de uma de duas formas, como nos containers
+# do roaring bitmap:
+#     - denso: bitset empacotado (np.packbits, uint8), um bit por linha do dataset
+#     - esparso: posições das linhas, ordenadas (uint32)
+# O tipo do array diz qual é a forma. Valores raros (ex.: um entregador) ficam
+# esparsos e ocupam 4 bytes por linha em vez de n/8 bytes.
+
+def _is_sparse( linhas ):
+    return linhas.dtype == np.uint32
+
+
+def _dense( linhas, n ):
+    # forma densa de qualquer conjunto
+    if not _is_sparse( linhas ):
+        return linhas
+
+    mascara = np.zeros( n, dtype= bool )
+    mascara[linhas] = True
+    return np.packbits( mascara )
+
+
+def _contains( bits, posicoes ):
+    # bit de cada posição em um bitset denso
+    return ( ( bits[ posicoes >> 3 ] >> ( 7 - ( posicoes & 7 ) ).astype( np.uint8 ) ) & 1 ).astype( bool )
+
+
+def _and( a, b ):
+    # interseção; o resultado é esparso quando um dos lados é
+    if _is_sparse( a ) and _is_sparse( b ):
+        return np.intersect1d( a, b, assume_unique= True ).astype( np.uint32 )
+    if _is_sparse( a ):
+        return a[ _contains( b, a ) ]
+    if _is_sparse( b ):
+        return b[ _contains( a, b ) ]
+    return a & b
+
+
+def _or( conjuntos, n ):
+    # união; fica esparsa quando todos os conjuntos são esparsos
+    if all( _is_sparse( linhas ) for linhas in conjuntos ):
+        return np.unique( np.concatenate( conjuntos ) ).astype( np.uint32 )
+
+    bits = np.zeros( ( n + 7 ) // 8, dtype= np.uint8 )
+    for linhas in conjuntos:
+        bits |= _dense( linhas, n )
+    return bits
+
+
+def _count( linhas ):
+    return len( linhas ) if _is_sparse( linhas ) else int( _POPCOUNT[linhas].sum( dtype= np.int64 ) )
+
+
+def _positions( linhas, n ):
+    # posições ordenadas das linhas do conjunto
+    if _is_sparse( linhas ):
+        return linhas.astype( np.int64 )
+    return np.flatnonzero( np.unpackbits( linhas, count= n ) )
+
+
+class BitmapIndex:
+    """
+    Índice de bitmaps por valor das colunas de FILTER_COLS.
+
+    Um filtro cruzado é o OR dos conjuntos dos valores selecionados de cada
+    coluna, combinados entre colunas com AND. O resultado de cada prefixo dos
+    filtros (ex.: city, depois city + weatherconditions) fica em cache, então
+    acrescentar um filtro custa um AND sobre o prefixo já calculado.
+
+    Input: Dataframe limpo (as posições são posições de linha dele)
+    """
+
+    def __init__( self, df1, columns= FILTER_COLS, prefixes= 64 ):
+        self.n = len( df1 )
+        self.values = {}
+        self._prefixes = FigureCache( maxsize= prefixes, ttl= float( 'inf' ) )
+
+        for col in columns:
+            codes = df1[col].cat.codes.values
+            categorias = df1[col].cat.categories
+
+            # posições de cada código, agrupadas pela ordenação estável dos códigos
+            ordem = np.argsort( codes, kind= 'stable' ).astype( np.uint32 )
+            limites = np.searchsorted( codes[ordem], np.arange( len( categorias ) + 1 ) )
+
+            conjuntos = {}
+            for i, valor in enumerate( categorias ):
+                linhas = ordem[ limites[i]:limites[i + 1] ]
+
+                # denso quando o bitset (n/8 bytes) é menor que as posições (4 bytes por linha)
+                conjuntos[str( valor )] = _dense( linhas, self.n ) if len( linhas ) * 32 > self.n else linhas
+
+            self.values[col] = conjuntos
+
+    def __len__( self ):
+        return self.n
+
+    def counts( self, col ):
+        # quantidade de linhas de cada valor da coluna
+        return { valor: _count( linhas ) for valor, linhas in self.values[col].items() }
+
+    def column( self, col, valores ):
+        # OR dos conjuntos dos valores selecionados (valores desconhecidos não selecionam nada)
+        vazio = np.zeros( 0, dtype= np.uint32 )
+        return _or( [ self.values[col].get( valor, vazio ) for valor in valores ] or [vazio], self.n )
+
+    def select( self, filtros ):
+        """
+        Conjunto das linhas que passam por todos os filtros.
+
+        Input: filtros normalizados (normalize_filters)
+        Output: conjunto (denso ou esparso); None quando não há filtros
+        """
+        linhas = None
+        for i in range( len( filtros ) ):
+            prefixo = filtros[ :i + 1 ]
+            atual = self._prefixes.get( prefixo )
+            if atual is None:
+                col, valores = filtros[i]
+                atual = self.column( col, valores )
+                if linhas is not None:
+                    atual = _and( linhas, atual )
+                self._prefixes.set( prefixo, atual )
+
+            linhas = atual
+
+        return linhas
+
+    def rows( self, filtros ):
+        # posições ordenadas das linhas que passam pelos filtros (None: todas)
+        linhas = self.select( filtros )
+        return None if linhas is None else _positions( linhas, self.n )
+
+    def count( self, filtros ):
+        linhas = self.select( filtros )
+        return self.n if linhas is None else _count( linhas )
+
+
+@instrumented
+def build_bitmap_index( df1 ):
+    # conjuntos de linhas de cada valor das colunas de FILTER_COLS
+    return BitmapIndex( df1 )
+
+
+@lru_cache( maxsize= 1 )
+def _load_bitmap_index( path, version ):
+    # version faz parte da chave do cache
+    return build_bitmap_index( load_dataset( path ) )
+
+
+@instrumented
+def load_bitmap_index( path= DATASET_PATH ):
+    """
+    Índice de bitmaps do dataset compartilhado, montado uma vez por versão.
+    """
+    with _lock:
+        return _load_bitmap_index( path, source_version( path ) )
+
+
+def cross_filter_sidebar( service, periodo, traffic_options ):
+    """
+    Filtros cruzados na sidebar: cidade, clima, veículo, festival e entregador.
+
+    As opções vêm da consulta filter_values. No streamlit 1.11 os gráficos não
+    devolvem cliques, então o detalhamento é feito por estes seletores.
+
+    Output: dict coluna -> valores selecionados (pronto para normalize_filters)
+    """
+    # import local: o serviço HTTP e os scripts usam este módulo sem o Streamlit
+    import streamlit as st
+
+    opcoes = service.query( 'filter_values', periodo, traffic_options )
+    valores = { col: opcoes.loc[ opcoes['column'] == col, 'value' ].tolist() for col in FILTER_COLS }
+
+    filtros = {}
+    st.sidebar.markdown( '## Filtros' )
+    filtros['city'] = st.sidebar.multiselect( 'Cidade', valores['city'] )
+    filtros['weatherconditions'] = st.sidebar.multiselect( 'Clima', valores['weatherconditions'] )
+    filtros['type_of_vehicle'] = st.sidebar.multiselect( 'Veículo', valores['type_of_vehicle'] )
+    filtros['festival'] = st.sidebar.multiselect( 'Festival', valores['festival'] )
+
+    entregador = st.sidebar.selectbox( 'Entregador', ['Todos'] + valores['delivery_person_id'] )
+    filtros['delivery_person_id'] = [] if entregador == 'Todos' else [entregador]
+
+    return filtros
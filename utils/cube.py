@@ -0,0 +1,148 @@
+# LIBRARIES
+import os
+import threading
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.instrument import instrumented
+from utils.store import read_manifest, store_path_for
+
+
+CUBE_KEYS = ['order_date', 'city', 'road_traffic_density', 'festival', 'weatherconditions']
+
+CUBE_SUMS = ['orders', 'time_sum', 'time_sq_sum', 'rating_sum', 'rating_sq_sum', 'rating_count']
+
+_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+@instrumented
+def build_cube( df1 ):
+    """
+    Pré-agrega o dataset limpo por order_date x city x road_traffic_density x
+    festival x weatherconditions.
+
+    Cada célula guarda somas que podem ser combinadas depois (soma das somas):
+        - orders: quantidade de pedidos
+        - time_sum, time_sq_sum: soma e soma dos quadrados de time_taken(min)
+        - rating_sum, rating_sq_sum: soma e soma dos quadrados das avaliações
+        - rating_count: quantidade de pedidos com avaliação (a média e o desvio
+          das avaliações usam esta quantidade, não orders)
+
+    Input: Dataframe limpo
+    Output: Dataframe do cubo, com a coluna week_of_year derivada de order_date
+    """
+    time_taken = df1['time_taken(min)'].astype( 'float64' )
+    rating = df1['delivery_person_ratings'].astype( 'float64' )
+    avaliado = rating.notna()
+    rating = rating.fillna( 0 )
+
+    df_aux = pd.DataFrame( { 'orders': 1,
+                             'time_sum': time_taken,
+                             'time_sq_sum': time_taken ** 2,
+                             'rating_sum': rating,
+                             'rating_sq_sum': rating ** 2,
+                             'rating_count': avaliado.astype( 'int64' ) } )
+    df_aux[CUBE_KEYS] = df1[CUBE_KEYS]
+
+    cube = df_aux.groupby( CUBE_KEYS, observed= True ).sum().sort_index().reset_index()
+    cube['week_of_year'] = cube['order_date'].dt.strftime( '%U' )
+    return cube
+
+
+def combine_cubes( cubes ):
+    """
+    Junta cubos parciais (de pedaços ou partições do dataset) somando as células
+    com a mesma chave. O resultado é idêntico ao cubo do dataset inteiro.
+    """
+    cube = pd.concat( [ cube[ CUBE_KEYS + CUBE_SUMS ] for cube in cubes ], ignore_index= True )
+
+    # pedaços diferentes podem ter categorias diferentes: volta a chave para category
+    for col in CUBE_KEYS[1:]:
+        cube[col] = cube[col].astype( pd.CategoricalDtype( sorted( cube[col].dropna().unique() ) ) )
+
+    cube = cube.groupby( CUBE_KEYS, observed= True )[CUBE_SUMS].sum().sort_index().reset_index()
+    cube['week_of_year'] = cube['order_date'].dt.strftime( '%U' )
+    return cube
+
+
+@instrumented
+def filter_cube( cube, data_limite, traffic_options, data_inicio= None ):
+    # mesmos filtros da sidebar, aplicados às poucas linhas do cubo
+    linhas = ( ( cube['order_date'] < data_limite ) &
+               ( cube['road_traffic_density'].isin( traffic_options ) ) )
+    if data_inicio is not None:
+        linhas &= cube['order_date'] >= data_inicio
+    return cube.loc[ linhas, : ]
+
+
+def mean_std_from_sums( n, soma, soma_quadrados ):
+    """
+    Média e desvio padrão amostral (ddof=1, como o pandas) a partir das somas.
+
+    Input: arrays com a quantidade, a soma e a soma dos quadrados
+    Output: (media, desvio) - desvio é NaN quando há menos de duas observações
+    """
+    n = np.asarray( n, dtype= 'float64' )
+    soma = np.asarray( soma, dtype= 'float64' )
+    soma_quadrados = np.asarray( soma_quadrados, dtype= 'float64' )
+
+    with np.errstate( divide= 'ignore', invalid= 'ignore' ):
+        media = soma / n
+        variancia = ( soma_quadrados - soma * media ) / ( n - 1 )
+        desvio = np.sqrt( np.clip( variancia, 0, None ) )
+
+    desvio = np.where( n > 1, desvio, np.nan )
+    return media, desvio
+
+
+def summarize_cube( cube, by ):
+    """
+    Combina as células do cubo nas colunas `by` e calcula as métricas finais.
+
+    Input: cubo (já filtrado) e lista de colunas de agrupamento
+    Output: Dataframe com orders, mean_time, std_time, mean_rating e std_rating
+    """
+    df_aux = ( cube.groupby( by, observed= True )[CUBE_SUMS]
+                   .sum().sort_index().reset_index() )
+
+    df_aux['mean_time'], df_aux['std_time'] = mean_std_from_sums(
+        df_aux['orders'], df_aux['time_sum'], df_aux['time_sq_sum'] )
+
+    # pedidos sem avaliação não entram na média nem no desvio das avaliações
+    df_aux['mean_rating'], df_aux['std_rating'] = mean_std_from_sums(
+        df_aux['rating_count'], df_aux['rating_sum'], df_aux['rating_sq_sum'] )
+
+    return df_aux.drop( columns= CUBE_SUMS[1:] )
+
+
+@lru_cache( maxsize= 1 )
+def _load_cube( path, version ):
+    # version faz parte da chave do cache
+    store_path = store_path_for( path )
+
+    # o store guarda o cubo da versão atual, gravado pelo utils.ingest
+    if version[0] == os.path.abspath( store_path ):
+        manifest = read_manifest( store_path )
+        cube = pd.read_parquet( os.path.join( store_path, manifest['cube'] ), engine= 'pyarrow' )
+        return combine_cubes( [cube] )
+
+    return build_cube( load_dataset( path ) )
+
+
+@instrumented
+def load_cube( path= DATASET_PATH ):
+    """
+    Cubo pré-agregado do dataset, construído uma vez por versão do arquivo de
+    origem e compartilhado por todas as páginas e sessões. Quando o dataset vem
+    do store Parquet, o cubo é lido do store sem passar pelas linhas.
+    """
+    with _lock:
+        return _load_cube( path, source_version( path ) )
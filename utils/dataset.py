@@ -0,0 +1,336 @@
+# LIBRARIES
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.geo import haversine_np
+from utils.instrument import instrumented, span
+from utils.shared import share_dataset
+from utils.store import csv_status, read_manifest, store_path_for, store_version
+
+
+DATASET_PATH = 'dataset/train.csv'
+
+# id fica como texto: é único por linha, então como category ocuparia mais memória
+# (códigos + categorias) e as categorias cresceriam com o dataset
+CATEGORY_COLS = ['city', 'road_traffic_density', 'weatherconditions', 'type_of_order',
+                 'type_of_vehicle', 'festival', 'delivery_person_id', 'time_orderd',
+                 'time_order_picked', 'week_of_year']
+
+NUMERIC_DTYPES = { 'delivery_person_age': 'int8',
+                   'delivery_person_ratings': 'float32',
+                   'restaurant_latitude': 'float32',
+                   'restaurant_longitude': 'float32',
+                   'delivery_location_latitude': 'float32',
+                   'delivery_location_longitude': 'float32',
+                   'vehicle_condition': 'int8',
+                   'multiple_deliveries': 'int8',
+                   'time_taken(min)': 'int16',
+                   'distance': 'float32',
+                   'prep_time(min)': 'float32' }
+
+# processos usados para montar o dataset a partir do CSV (ver utils.parallel)
+WORKERS = int( os.environ.get( 'CURRY_WORKERS', '1' ) )
+
+_lock = threading.Lock()
+
+# dataset carregado: chave de versão, partes do store já lidas e o Dataframe
+_cache = { 'key': None, 'parts': (), 'df1': None }
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def map_unique( serie, func ):
+    """
+    Aplica uma função de string apenas aos valores distintos de uma coluna.
+
+    Os valores distintos vêm do pd.factorize e o resultado é redistribuído
+    pelos códigos, então colunas com poucos valores distintos (city, festival,
+    time_taken...) custam uma passada de hash em vez de uma chamada Python por linha.
+
+    Input: Series do tipo object, func aplicada a cada valor str
+    Output: Series com func aplicada; valores que não são str ficam iguais
+    """
+    codes, uniques = pd.factorize( serie )
+    valores = [ func( x ) if isinstance( x, str ) else x for x in uniques ]
+
+    # o código -1 (NaN) aponta para o último elemento
+    valores = np.array( valores + [np.nan], dtype= object )
+    return pd.Series( valores[codes], index= serie.index, name= serie.name )
+
+
+def parse_time_of_day( serie ):
+    """
+    Converte horários 'HH:MM:SS' em Timedelta desde a meia-noite.
+
+    Como em map_unique, só os valores distintos (poucas centenas de horários)
+    são convertidos, e o resultado é redistribuído pelos códigos.
+
+    Input: Series de texto (ou category) com horários; 'NaN' e valores inválidos viram NaT
+    Output: array timedelta64[ns]
+    """
+    codes, uniques = pd.factorize( serie )
+    valores = pd.to_timedelta( pd.Series( uniques, dtype= object ), errors= 'coerce' ).values
+
+    # o código -1 (NaN) aponta para o último elemento
+    valores = np.append( valores, np.timedelta64( 'NaT', 'ns' ) )
+    return valores[codes]
+
+
+@instrumented
+def clean_code( df1 ):
+    # rename
+    old_col = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude', 'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked', 'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order', 'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+    snakecase = lambda x: x.lower()
+
+    new_cols = list( map( snakecase, old_col ))
+
+    df1.columns = new_cols
+
+    # remove spaces in the strings (apenas colunas texto, montando o dataframe uma única vez)
+    text_cols = set( df1.select_dtypes( include= 'object' ).columns )
+    df1 = pd.DataFrame( { col: map_unique( df1[col], str.strip ) if col in text_cols else df1[col]
+                          for col in df1.columns } )
+
+    # filtrando NA de age, multiple_deliveries, road_traffic_density, city e festival
+    # em uma única máscara booleana
+    linhas_validas = ( ( df1['delivery_person_age'] != 'NaN' ) &
+                       ( df1['multiple_deliveries'] != 'NaN' ) &
+                       ( df1['road_traffic_density'] != 'NaN' ) &
+                       ( df1['city'] != 'NaN' ) &
+                       ( df1['festival'] != 'NaN' ) )
+    df1 = df1.loc[ linhas_validas, : ].copy()
+
+    # convertendo a coluna age para int
+    df1['delivery_person_age'] = df1['delivery_person_age'].astype('int64')
+
+    # convertendo a coluna ratings para float
+    df1['delivery_person_ratings'] = df1['delivery_person_ratings'].astype(float)
+
+    # convertendo a coluna order_datew para data
+    df1['order_date'] = pd.to_datetime( df1['order_date'], format= '%d-%m-%Y')
+
+    # convertendo a coluna multiples deliveries para int
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype('int64')
+
+    # limpando e convertendo para int a coluna time_taken ( '(min) NN' -> NN )
+    df1['time_taken(min)'] = map_unique( df1['time_taken(min)'], lambda x: x.split('(min) ')[1] ).astype( 'int64' )
+    
+    return df1
+
+
+@instrumented
+def feature_engineering( df1 ):
+    # criando semana do ano
+    df1['week_of_year'] = df1['order_date'].dt.strftime( '%U' )
+
+    # distância entre restaurante e local de entrega, calculada uma única vez
+    df1['distance'] = haversine_np( df1['restaurant_latitude'], df1['restaurant_longitude'],
+                                    df1['delivery_location_latitude'], df1['delivery_location_longitude'] )
+
+    # horário do pedido e da retirada ('NaN' vira NaT)
+    pedido = parse_time_of_day( df1['time_orderd'] )
+    retirada = parse_time_of_day( df1['time_order_picked'] )
+
+    # retirada antes do pedido: o pedido foi retirado depois da meia-noite
+    retirada = np.where( retirada < pedido, retirada + np.timedelta64( 1, 'D' ), retirada )
+
+    data = df1['order_date'].values
+    df1['order_datetime'] = data + pedido
+    df1['pickup_datetime'] = data + retirada
+
+    # tempo de preparo em minutos (NaN quando falta o horário do pedido)
+    df1['prep_time(min)'] = ( retirada - pedido ) / np.timedelta64( 1, 'm' )
+    
+    return df1
+
+
+@instrumented
+def optimize_dtypes( df1 ):
+    """
+    Converte as colunas de baixa cardinalidade em category e reduz os numéricos.
+
+    Input: Dataframe limpo (saída do feature_engineering)
+    Output: Dataframe com city, road_traffic_density, weatherconditions, type_of_order,
+            type_of_vehicle, festival e delivery_person_id como category (categorias
+            em ordem alfabética) e os numéricos nos tipos de NUMERIC_DTYPES
+
+    Os tipos são fixos (não dependem dos valores), então pedaços diferentes do
+    mesmo CSV saem com o mesmo schema. A função pode ser reaplicada sem efeito.
+    """
+    for col in CATEGORY_COLS:
+        categorias = sorted( df1[col].dropna().unique() )
+
+        # em colunas que já são category o astype não reordena (as mesmas categorias
+        # em outra ordem contam como o mesmo tipo), então a ordem é refeita aqui
+        if isinstance( df1[col].dtype, pd.CategoricalDtype ):
+            df1[col] = df1[col].cat.set_categories( categorias )
+        else:
+            df1[col] = df1[col].astype( pd.CategoricalDtype( categorias ) )
+
+    return df1.astype( NUMERIC_DTYPES )
+
+
+def sort_by_date( df1 ):
+    """
+    Ordena o dataset por order_date (ordenação estável) e refaz o índice.
+    Com as datas ordenadas, o filtro de data limite vira uma busca binária
+    (ver utils.filters.filter_orders).
+    """
+    if not df1['order_date'].is_monotonic_increasing:
+        df1 = df1.sort_values( 'order_date', kind= 'mergesort' )
+    elif isinstance( df1.index, pd.RangeIndex ) and df1.index.start == 0 and df1.index.step == 1:
+        # já ordenado e com índice 0..n-1: nada a fazer, sem cópia
+        return df1
+
+    return df1.reset_index( drop= True )
+
+
+@instrumented
+def build_dataset( path= DATASET_PATH, workers= WORKERS ):
+    if workers > 1:
+        # import local: utils.parallel depende deste módulo
+        from utils.parallel import parallel_build
+        return parallel_build( path, workers )[0]
+
+    # IMPORT DATASET
+    with span( 'read_csv' ) as registro:
+        df1 = pd.read_csv( path )
+        registro['rows'] = len( df1 )
+
+    df1 = clean_code( df1 )
+
+    df1 = feature_engineering( df1 )
+
+    df1 = optimize_dtypes( df1 )
+
+    return sort_by_date( df1 )
+
+
+@instrumented
+def concat_orders( frames ):
+    """
+    Concatena pedaços do dataset limpo mantendo as colunas category.
+
+    As categorias de cada pedaço são alinhadas com a união (em ordem alfabética)
+    antes do concat, que assim não precisa converter as colunas para texto.
+    """
+    frames = [ df for df in frames if len( df ) ]
+    if len( frames ) == 1:
+        return frames[0]
+
+    for col in CATEGORY_COLS:
+        categorias = sorted( set().union( *[ df[col].cat.categories for df in frames ] ) )
+
+        # só os pedaços com categorias diferentes são recodificados (em geral, o pedaço novo)
+        frames = [ df if list( df[col].cat.categories ) == categorias
+                   else df.assign( **{ col: df[col].cat.set_categories( categorias ) } )
+                   for df in frames ]
+
+    return pd.concat( frames, ignore_index= True )
+
+
+@instrumented
+def read_store( store_path, parts ):
+    """
+    Lê partes do store Parquet com memory map: as colunas vão direto do
+    arquivo para os blocos do pandas.
+
+    Input: diretório do store e nomes das partes (ver utils.store)
+    Output: Dataframe limpo com os tipos de optimize_dtypes
+    """
+    table = pa.concat_tables( [ pq.read_table( os.path.join( store_path, part ), memory_map= True )
+                                for part in parts ] )
+    df1 = table.to_pandas( split_blocks= True, self_destruct= True )
+
+    # partes diferentes trazem as categorias na ordem de aparição
+    return optimize_dtypes( df1 )
+
+
+def dataset_version( path= DATASET_PATH ):
+    """
+    Retorna a chave de versão do arquivo de dados: caminho absoluto, mtime e tamanho.
+    Qualquer alteração no CSV gera uma nova chave.
+    """
+    stat = os.stat( path )
+    return ( os.path.abspath( path ), stat.st_mtime_ns, stat.st_size )
+
+
+def source_version( path= DATASET_PATH ):
+    """
+    Versão do que o load_dataset vai ler de fato: o store Parquet, quando cobre
+    todo o CSV, ou o próprio CSV.
+    Serve de chave para tudo que é derivado do dataset limpo.
+    """
+    store_path = store_path_for( path )
+    manifest = read_manifest( store_path )
+
+    if manifest is not None and csv_status( path, manifest ) == 'fresh':
+        return store_version( store_path )
+
+    return dataset_version( path )
+
+
+def _load_dataset( path, mtime_ns, size ):
+    # mtime_ns e size fazem parte da chave do cache
+    version = ( path, mtime_ns, size )
+    if _cache['key'] == version:
+        return _cache['df1']
+
+    parts = ()
+    if path.endswith( '.parquet' ):
+        parts = tuple( read_manifest( path )['parts'] )
+
+    # outro processo (worker do Streamlit, serviço de consultas) já montou esta versão
+    df1 = share_dataset( path, version, None )
+
+    if df1 is None and path.endswith( '.parquet' ):
+        anteriores = _cache['parts']
+
+        if _cache['df1'] is not None and _cache['key'][0] == path and parts == anteriores:
+            # a ingestão não gerou linhas válidas novas
+            df1 = _cache['df1']
+        elif _cache['df1'] is not None and _cache['key'][0] == path and parts[ :len( anteriores ) ] == anteriores:
+            # mesmo store com partes novas: lê e junta só as partes novas
+            novas = read_store( path, parts[ len( anteriores ): ] )
+            df1 = share_dataset( path, version, sort_by_date( concat_orders( [ _cache['df1'], novas ] ) ) )
+        else:
+            df1 = share_dataset( path, version, sort_by_date( read_store( path, parts ) ) )
+    elif df1 is None:
+        df1 = share_dataset( path, version, build_dataset( path ) )
+
+    _cache.update( key= version, parts= parts, df1= df1 )
+    return df1
+
+
+def load_dataset( path= DATASET_PATH ):
+    """
+    Carrega o dataset limpo, construído uma única vez por processo.
+
+    Quando existe o store Parquet gerado pelo `python -m utils.ingest`, ele é lido
+    (memory-mapped) no lugar do CSV. Se o CSV só recebeu linhas novas desde a
+    última ingestão, apenas essas linhas são limpas e anexadas ao store antes da
+    leitura; se o CSV foi reescrito, o dataset volta a ser montado a partir do CSV.
+
+    O resultado fica em cache, compartilhado por todas as páginas e sessões, e só
+    é reconstruído quando a origem muda. Cada versão também é gravada como um
+    snapshot de colunas .npy (ver utils.shared), lido com memory map: os outros
+    processos (workers do Streamlit, serviço de consultas) leem o snapshot em
+    vez de montar o dataset de novo, e todos usam as mesmas páginas de memória.
+
+    Input: path - caminho do CSV bruto
+    Output: Dataframe limpo (não deve ser alterado in-place)
+    """
+    # import local: utils.ingest depende deste módulo
+    from utils.ingest import append
+
+    with _lock:
+        append( path )
+        return _load_dataset( *source_version( path ) )
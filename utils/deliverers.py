@@ -0,0 +1,159 @@
+# LIBRARIES
+import threading
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import mean_std_from_sums
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.instrument import instrumented
+
+
+# colunas do histórico de pedidos do perfil do entregador
+HISTORY_COLS = ['order_date', 'city', 'road_traffic_density', 'weatherconditions', 'type_of_order',
+                'type_of_vehicle', 'vehicle_condition', 'festival', 'distance', 'time_taken(min)',
+                'delivery_person_ratings']
+
+# agrupamentos do tempo médio de entrega do perfil
+PROFILE_KEYS = ['road_traffic_density', 'weatherconditions']
+
+_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+class DelivererIndex:
+    """
+    Índice das linhas de cada entregador, no formato CSR.
+
+    As posições das linhas do dataset são ordenadas por delivery_person_id
+    (ordenação estável): os pedidos de cada entregador viram um bloco contínuo
+    de `positions`, delimitado por `offsets`. Como o dataset está ordenado por
+    order_date, cada bloco também está em ordem cronológica. Buscar um
+    entregador custa uma busca no índice dos ids e uma fatia, sem passar pelo
+    dataset.
+
+    Input: Dataframe limpo (as posições são posições de linha dele)
+    """
+
+    def __init__( self, df1 ):
+        serie = df1['delivery_person_id']
+        codes = serie.cat.codes.values
+
+        self.ids = pd.Index( serie.cat.categories.astype( str ) )
+        self.positions = np.argsort( codes, kind= 'stable' )
+
+        # código -1 (sem entregador) fica antes do primeiro bloco
+        inicio = np.searchsorted( codes[ self.positions ], 0 )
+        self.positions = self.positions[inicio:]
+        self.offsets = np.concatenate( [ [0], np.cumsum( np.bincount( codes[ codes >= 0 ], minlength= len( self.ids ) ) ) ] )
+
+    def __len__( self ):
+        return len( self.ids )
+
+    def rows( self, deliverer ):
+        """
+        Posições (ordenadas) das linhas do entregador.
+
+        Output: array de posições; KeyError quando o entregador não existe
+        """
+        if deliverer not in self.ids:
+            raise KeyError( f'entregador desconhecido: {deliverer!r}' )
+
+        i = self.ids.get_loc( deliverer )
+        return self.positions[ self.offsets[i]:self.offsets[i + 1] ]
+
+    def counts( self ):
+        # quantidade de pedidos de cada entregador, na ordem de ids
+        return np.diff( self.offsets )
+
+
+@instrumented
+def build_deliverer_index( df1 ):
+    return DelivererIndex( df1 )
+
+
+@lru_cache( maxsize= 1 )
+def _load_deliverer_index( path, version ):
+    # version faz parte da chave do cache
+    return build_deliverer_index( load_dataset( path ) )
+
+
+@instrumented
+def load_deliverer_index( path= DATASET_PATH ):
+    """
+    Índice dos entregadores do dataset compartilhado, montado uma vez por versão.
+    """
+    with _lock:
+        return _load_deliverer_index( path, source_version( path ) )
+
+
+def ratings_trend( orders ):
+    """
+    Avaliação média por dia e a média acumulada até cada dia.
+
+    Input: pedidos de um entregador (em ordem cronológica)
+    Output: Dataframe order_date, orders, mean_rating, cumulative_rating
+    """
+    # poucas linhas: np.unique/np.bincount custam menos que um groupby
+    dias, dia = np.unique( orders['order_date'].values, return_inverse= True )
+    quantidade = np.bincount( dia, minlength= len( dias ) )
+
+    # pedidos sem avaliação contam em orders, mas não nas médias (como no mean do pandas)
+    rating = orders['delivery_person_ratings'].values.astype( 'float64' )
+    avaliados = np.bincount( dia, weights= ~np.isnan( rating ), minlength= len( dias ) )
+    soma = np.bincount( dia, weights= np.nan_to_num( rating ), minlength= len( dias ) )
+
+    with np.errstate( divide= 'ignore', invalid= 'ignore' ):
+        return pd.DataFrame( { 'order_date': dias,
+                               'orders': quantidade,
+                               'mean_rating': soma / avaliados,
+                               'cumulative_rating': np.cumsum( soma ) / np.cumsum( avaliados ) } )
+
+
+def time_by( orders, by ):
+    """
+    Tempo médio e desvio padrão de entrega por categoria de `by`.
+
+    Input: pedidos de um entregador, by - coluna de PROFILE_KEYS
+    Output: Dataframe by, orders, mean_time, std_time (só as categorias com pedidos)
+    """
+    codes = orders[by].cat.codes.values
+    validos = codes >= 0
+    categorias = orders[by].cat.categories
+
+    time_taken = orders['time_taken(min)'].values[validos].astype( 'float64' )
+    n = np.bincount( codes[validos], minlength= len( categorias ) )
+    soma = np.bincount( codes[validos], weights= time_taken, minlength= len( categorias ) )
+    soma_quadrados = np.bincount( codes[validos], weights= time_taken ** 2, minlength= len( categorias ) )
+
+    mean_time, std_time = mean_std_from_sums( n, soma, soma_quadrados )
+    df_aux = pd.DataFrame( { by: categorias, 'orders': n, 'mean_time': mean_time, 'std_time': std_time } )
+    return df_aux.loc[ n > 0 ].reset_index( drop= True )
+
+
+def profile_summary( orders ):
+    """
+    Resumo do perfil: pedidos, tempo e avaliação médios, idade e veículo.
+
+    Input: pedidos de um entregador (em ordem cronológica)
+    Output: Dataframe de uma linha (sem linhas quando não há pedidos)
+    """
+    if orders.empty:
+        return pd.DataFrame( columns= ['orders', 'mean_time', 'mean_rating', 'age', 'vehicle',
+                                       'vehicle_condition', 'best_condition', 'worst_condition'] )
+
+    # valores do último pedido lidos por coluna (uma linha de um Dataframe misto é cara de montar)
+    condicao = orders['vehicle_condition'].values
+    return pd.DataFrame( { 'orders': [ len( orders ) ],
+                           'mean_time': [ float( orders['time_taken(min)'].values.mean( dtype= 'float64' ) ) ],
+                           'mean_rating': [ float( orders['delivery_person_ratings'].astype( 'float64' ).mean() ) ],
+                           'age': [ int( orders['delivery_person_age'].values[-1] ) ],
+                           'vehicle': [ str( orders['type_of_vehicle'].values[-1] ) ],
+                           'vehicle_condition': [ int( condicao[-1] ) ],
+                           'best_condition': [ int( condicao.max() ) ],
+                           'worst_condition': [ int( condicao.min() ) ] } )
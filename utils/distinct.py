@@ -0,0 +1,206 @@
+# LIBRARIES
+import threading
+
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.instrument import instrumented
+
+
+# 2^14 registradores (16 KB por sketch): erro padrão de ~0,8%. Abaixo de ~40 mil
+# valores (2,5 x registradores) a estimativa usa linear counting, com erro menor,
+# mas continua sendo uma estimativa: para contagens exatas, exact_distinct_by
+HLL_PRECISION = 14
+
+# um sketch por célula: as mesmas chaves dos filtros da sidebar
+SKETCH_KEYS = ['order_date', 'road_traffic_density']
+
+_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def exact_distinct( serie ):
+    """
+    Quantidade exata de valores distintos de uma coluna category.
+
+    Marca os códigos presentes em um bitset do tamanho do dicionário, sem
+    comparar nem fazer hash das strings.
+    """
+    presentes = np.zeros( len( serie.cat.categories ) + 1, dtype= bool )
+    presentes[ serie.cat.codes.values ] = True
+
+    # o código -1 (NaN) cai na última posição, que não conta
+    return int( np.count_nonzero( presentes[:-1] ) )
+
+
+def exact_distinct_by( grupos, serie ):
+    """
+    Quantidade exata de valores distintos de serie (category) por grupo.
+
+    Input: grupos - códigos inteiros do grupo (0..n-1), serie - coluna category
+    Output: array com a contagem de cada grupo
+    """
+    grupos = np.asarray( grupos, dtype= np.int64 )
+    if not len( grupos ):
+        return np.zeros( 0, dtype= np.int64 )
+
+    n_grupos = int( grupos.max() ) + 1
+    codes = serie.cat.codes.values.astype( np.int64 )
+    validos = codes >= 0
+
+    # cada par (grupo, código) distinto vira um bit de uma matriz grupos x dicionário
+    presentes = np.zeros( n_grupos * len( serie.cat.categories ), dtype= bool )
+    presentes[ grupos[validos] * len( serie.cat.categories ) + codes[validos] ] = True
+
+    return presentes.reshape( n_grupos, -1 ).sum( axis= 1 )
+
+
+def value_hashes( serie ):
+    """
+    Hash de 64 bits de cada valor de uma coluna category.
+
+    O hash é calculado uma vez por categoria, a partir do texto (não do código),
+    então sketches de versões diferentes do dataset continuam combináveis.
+    """
+    hashes = pd.util.hash_array( np.asarray( serie.cat.categories, dtype= object ) )
+    return hashes[ serie.cat.codes.values[ serie.cat.codes.values >= 0 ] ]
+
+
+def _bit_length( valores ):
+    # quantidade de bits significativos de cada uint64 (busca binária nos deslocamentos)
+    valores = valores.copy()
+    bits = np.zeros( len( valores ), dtype= np.int64 )
+    for passo in ( 32, 16, 8, 4, 2, 1 ):
+        alto = valores >= ( np.uint64( 1 ) << np.uint64( passo ) )
+        bits[alto] += passo
+        valores[alto] >>= np.uint64( passo )
+
+    return bits + ( valores > 0 )
+
+
+def hll_update( registers, linhas, hashes, precision= HLL_PRECISION ):
+    """
+    Adiciona hashes aos sketches HyperLogLog, in-place.
+
+    Input:
+        - registers: array (sketches x 2^precision) de uint8
+        - linhas: sketch de cada hash
+        - hashes: array de uint64 (value_hashes)
+    """
+    resto_bits = 64 - precision
+    registrador = ( hashes >> np.uint64( resto_bits ) ).astype( np.int64 )
+    resto = hashes & np.uint64( ( 1 << resto_bits ) - 1 )
+
+    # posição do primeiro bit 1 nos bits restantes (resto_bits + 1 quando são todos zero)
+    rank = ( resto_bits + 1 - _bit_length( resto ) ).astype( np.uint8 )
+
+    np.maximum.at( registers, ( np.asarray( linhas, dtype= np.int64 ), registrador ), rank )
+
+
+def hll_count( registers ):
+    """
+    Estimativa de valores distintos de cada sketch HyperLogLog (uma linha por sketch).
+    Sketches combinados são o máximo, registrador a registrador, dos originais.
+    """
+    registers = np.atleast_2d( registers )
+    m = registers.shape[1]
+    alpha = 0.7213 / ( 1 + 1.079 / m )
+
+    estimativa = alpha * m * m / np.exp2( -registers.astype( np.float64 ) ).sum( axis= 1 )
+
+    # poucos valores: linear counting sobre os registradores vazios
+    zeros = ( registers == 0 ).sum( axis= 1 )
+    with np.errstate( divide= 'ignore' ):
+        linear = m * np.log( m / np.maximum( zeros, 1 ) )
+
+    return np.where( ( estimativa <= 2.5 * m ) & ( zeros > 0 ), linear, estimativa )
+
+
+def _group_codes( df, by ):
+    # código 0..n-1 de cada combinação de `by` (na ordem das chaves) e a primeira linha de cada uma
+    chave = np.zeros( len( df ), dtype= np.int64 )
+    for col in by:
+        codes, valores = pd.factorize( df[col], sort= True )
+        chave = chave * ( len( valores ) + 1 ) + codes
+
+    _, primeira, grupos = np.unique( chave, return_index= True, return_inverse= True )
+    return grupos, primeira
+
+
+class DistinctSketches( NamedTuple ):
+    keys: pd.DataFrame        # SKETCH_KEYS + week_of_year, uma linha por sketch
+    registers: np.ndarray     # sketches x 2^HLL_PRECISION, uint8
+
+
+@instrumented
+def build_sketches( df1, column= 'delivery_person_id', precision= HLL_PRECISION ):
+    """
+    Um sketch HyperLogLog de `column` por order_date x road_traffic_density.
+
+    Input: Dataframe limpo (column como category)
+    Output: DistinctSketches
+    """
+    grupos, primeira = _group_codes( df1, SKETCH_KEYS )
+    keys = df1[SKETCH_KEYS].iloc[primeira].reset_index( drop= True )
+    keys['week_of_year'] = keys['order_date'].dt.strftime( '%U' )
+
+    registers = np.zeros( ( len( keys ), 1 << precision ), dtype= np.uint8 )
+    validos = df1[column].cat.codes.values >= 0
+    hll_update( registers, grupos[validos], value_hashes( df1[column] ), precision )
+
+    return DistinctSketches( keys, registers )
+
+
+@instrumented
+def filter_sketches( sketches, data_limite, traffic_options, data_inicio= None ):
+    # mesmos filtros da sidebar, aplicados às linhas dos sketches
+    linhas = ( ( sketches.keys['order_date'] < data_limite ) &
+               ( sketches.keys['road_traffic_density'].isin( traffic_options ) ) ).values
+    if data_inicio is not None:
+        linhas &= ( sketches.keys['order_date'] >= data_inicio ).values
+
+    return DistinctSketches( sketches.keys.loc[ linhas ].reset_index( drop= True ), sketches.registers[linhas] )
+
+
+def approx_distinct_by( sketches, by ):
+    """
+    Estimativa de valores distintos por grupo, combinando os sketches do grupo.
+
+    Input: DistinctSketches (já filtrados) e lista de colunas de agrupamento
+    Output: Dataframe com as colunas `by` e a coluna distinct
+    """
+    if sketches.keys.empty:
+        return sketches.keys[by].assign( distinct= np.zeros( 0 ) )
+
+    grupos, primeira = _group_codes( sketches.keys, by )
+    df_aux = sketches.keys[by].iloc[primeira].reset_index( drop= True )
+
+    # ordena os sketches por grupo e combina cada bloco com o máximo
+    ordem = np.argsort( grupos, kind= 'stable' )
+    inicio = np.searchsorted( grupos[ordem], np.arange( len( primeira ) ) )
+    combinados = np.maximum.reduceat( sketches.registers[ordem], inicio, axis= 0 )
+
+    df_aux['distinct'] = hll_count( combinados )
+    return df_aux
+
+
+@lru_cache( maxsize= 1 )
+def _load_sketches( path, version ):
+    # version faz parte da chave do cache
+    return build_sketches( load_dataset( path ) )
+
+
+@instrumented
+def load_sketches( path= DATASET_PATH ):
+    """
+    Sketches de entregadores distintos do dataset, construídos uma vez por versão.
+    """
+    with _lock:
+        return _load_sketches( path, source_version( path ) )
@@ -0,0 +1,129 @@
+# LIBRARIES
+import threading
+import time
+
+from collections import OrderedDict
+from typing import NamedTuple
+
+from utils.filters import date_range, normalize_filters
+from utils.instrument import span
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+class FigureCache:
+    """
+    Cache LRU com expiração (TTL) para figuras já montadas.
+
+    Compartilhado por todas as sessões do processo: vários usuários com os
+    mesmos filtros recebem a mesma figura sem que ela seja montada de novo.
+    """
+
+    def __init__( self, maxsize= 256, ttl= 600 ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get( self, key ):
+        with self._lock:
+            item = self._itens.get( key )
+            if item is None:
+                return None
+
+            criado, valor = item
+            if time.monotonic() - criado > self.ttl:
+                del self._itens[key]
+                return None
+
+            self._itens.move_to_end( key )
+            return valor
+
+    def set( self, key, valor ):
+        with self._lock:
+            self._itens[key] = ( time.monotonic(), valor )
+            self._itens.move_to_end( key )
+
+            while len( self._itens ) > self.maxsize:
+                self._itens.popitem( last= False )
+
+    def clear( self ):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__( self ):
+        return len( self._itens )
+
+
+figure_cache = FigureCache()
+
+# figuras por sessão (em st.session_state), reconstruídas dos specs do figure_cache
+SESSION_FIGURES = 32
+
+
+class PlotlySpec( NamedTuple ):
+    # figura Plotly serializada (fig.to_json()): texto imutável, seguro para dividir entre sessões
+    spec: str
+
+
+def filter_key( periodo, traffic_options, cross_filters= None ):
+    # forma normalizada dos filtros: a ordem da seleção no multiselect não importa
+    inicio, fim = date_range( periodo )
+    return ( None if inicio is None else inicio.isoformat(), fim.isoformat(), tuple( sorted( traffic_options ) ),
+             normalize_filters( cross_filters ) )
+
+
+def cached_figure( func, *args, version, filters ):
+    """
+    Retorna func( *args ), montando a figura só quando ela não está no cache.
+
+    Figuras Plotly ficam no cache compartilhado como o JSON serializado. Cada
+    sessão reconstrói a sua figura a partir do JSON uma vez por chave e a
+    guarda no st.session_state: uma sessão que altere a figura não altera a
+    das outras, e as reruns seguintes da sessão não reconstroem nada.
+
+    Input:
+        - func: função que monta a figura (gráfico Plotly ou HTML do mapa)
+        - args: argumentos de func (dados já filtrados)
+        - version: versão do dataset (utils.dataset.source_version)
+        - filters: filtros normalizados (filter_key)
+    Output: a figura montada por func
+    """
+    # as páginas são scripts (__main__): o arquivo identifica a função
+    key = ( func.__code__.co_filename, func.__qualname__, version, filters )
+
+    with span( f'figure.{func.__name__}', cached= True ) as registro:
+        figura = figure_cache.get( key )
+        if figura is None:
+            registro['cached'] = False
+            figura = func( *args )
+
+            # figuras Plotly são objetos mutáveis: o cache guarda só o JSON
+            if hasattr( figura, 'to_plotly_json' ):
+                figura = PlotlySpec( figura.to_json() )
+            figure_cache.set( key, figura )
+
+    if isinstance( figura, PlotlySpec ):
+        return _session_figure( key, figura )
+    return figura
+
+
+def _session_figure( key, figura ):
+    # import local: o serviço HTTP e os scripts usam este módulo sem o Streamlit
+    import plotly.io as pio
+    import streamlit as st
+
+    if '_figures' not in st.session_state:
+        st.session_state['_figures'] = FigureCache( maxsize= SESSION_FIGURES, ttl= float( 'inf' ) )
+    figuras = st.session_state['_figures']
+
+    # a chave inclui o spec: um spec novo (após o TTL do cache compartilhado) reconstrói a figura
+    fig = figuras.get( ( key, figura.spec ) )
+    if fig is None:
+        with span( 'figure.from_json' ):
+            fig = pio.from_json( figura.spec )
+        figuras.set( ( key, figura.spec ), fig )
+
+    return fig
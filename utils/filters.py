@@ -0,0 +1,104 @@
+# LIBRARIES
+import numpy as np
+import pandas as pd
+
+from utils.instrument import instrumented
+
+
+# colunas com filtro cruzado, na ordem em que os filtros são combinados
+# (as mais seletivas por último: os prefixos mais usados ficam no cache)
+FILTER_COLS = ['city', 'weatherconditions', 'type_of_vehicle', 'festival', 'delivery_person_id']
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def date_cutoff( df1, data_limite ):
+    """
+    Posição da primeira linha com order_date >= data_limite.
+
+    O dataset compartilhado está ordenado por order_date, então a posição sai de
+    uma busca binária e as linhas com order_date < data_limite são df1.iloc[:pos].
+    """
+    return int( np.searchsorted( df1['order_date'].values, np.datetime64( data_limite, 'ns' ), side= 'left' ) )
+
+
+def date_range( periodo ):
+    """
+    Normaliza o período da sidebar.
+
+    Input: data limite (só o fim) ou par ( inicio, fim )
+    Output: ( inicio, fim ) como Timestamps - inicio é None quando não há limite
+            inferior. Os pedidos do período têm inicio <= order_date < fim.
+    """
+    if isinstance( periodo, ( tuple, list ) ):
+        inicio, fim = periodo
+        return pd.Timestamp( inicio ), pd.Timestamp( fim )
+
+    return None, pd.Timestamp( periodo )
+
+
+def normalize_filters( filtros ):
+    """
+    Forma normalizada dos filtros cruzados: só colunas de FILTER_COLS com valores
+    selecionados, na ordem de FILTER_COLS, com os valores ordenados.
+
+    Input: dict coluna -> lista de valores (lista vazia ou None: sem filtro),
+           ou filtros já normalizados
+    Output: tupla de ( coluna, tupla de valores ), usada como chave de cache
+    """
+    filtros = dict( filtros or () )
+
+    desconhecidas = set( filtros ) - set( FILTER_COLS )
+    if desconhecidas:
+        raise KeyError( f'filtro desconhecido: {sorted( desconhecidas )}' )
+
+    return tuple( ( col, tuple( sorted( str( v ) for v in filtros[col] ) ) )
+                  for col in FILTER_COLS if filtros.get( col ) )
+
+
+def category_mask( serie, valores ):
+    """
+    Máscara booleana de serie.isin( valores ) usando os códigos da categoria.
+
+    Monta uma tabela de consulta com um booleano por categoria e indexa pelos
+    códigos inteiros, sem comparar strings linha a linha.
+    """
+    categorias = serie.cat.categories
+    tabela = np.zeros( len( categorias ) + 1, dtype= bool )
+    tabela[ categorias.get_indexer( categorias.intersection( valores ) ) ] = True
+
+    # o código -1 (NaN) cai na última posição, que é sempre False
+    return tabela[ serie.cat.codes.values ]
+
+
+@instrumented
+def filter_orders( df1, data_limite, traffic_options, data_inicio= None, rows= None ):
+    """
+    Aplica os filtros da sidebar ao dataset compartilhado.
+
+    Input:
+        - df1: dataset limpo, ordenado por order_date
+        - data_limite: mantém as linhas com order_date < data_limite
+        - traffic_options: valores de road_traffic_density selecionados
+        - data_inicio: mantém as linhas com order_date >= data_inicio (None: sem limite)
+        - rows: posições ordenadas das linhas que passaram pelos filtros
+          cruzados (ver utils.crossfilter); None: todas
+    Output: Dataframe filtrado. Sem filtros cruzados e com todos os tipos de
+            tráfego selecionados o resultado é uma fatia (sem cópia) do dataset.
+    """
+    inicio = 0 if data_inicio is None else date_cutoff( df1, data_inicio )
+    fim = max( inicio, date_cutoff( df1, data_limite ) )
+
+    if rows is None:
+        df1 = df1.iloc[ inicio:fim ]
+    else:
+        # as posições estão ordenadas, como as datas: o período é um trecho delas
+        df1 = df1.iloc[ rows[ np.searchsorted( rows, inicio ):np.searchsorted( rows, fim ) ] ]
+
+    traffic = df1['road_traffic_density']
+    if set( traffic.cat.categories ) <= set( traffic_options ):
+        return df1
+
+    return df1.loc[ category_mask( traffic, traffic_options ), : ]
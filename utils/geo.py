@@ -0,0 +1,144 @@
+# LIBRARIES
+import folium
+import numpy as np
+
+from folium.plugins import FastMarkerCluster, HeatMap
+
+
+# raio médio da Terra, o mesmo usado pelo pacote haversine
+EARTH_RADIUS = { 'km': 6371.0088,
+                 'mi': 6371.0088 / 1.609344 }
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def haversine_np( lat1, lon1, lat2, lon2, unit= 'km', dtype= np.float64 ):
+    """
+    Distância haversine vetorizada entre dois conjuntos de pontos.
+
+    Equivalente a haversine( (lat1, lon1), (lat2, lon2), unit ) aplicado linha a
+    linha, mas calculado de uma só vez sobre os arrays inteiros.
+
+    Input:
+        - lat1, lon1, lat2, lon2: arrays (ou Series) de latitude/longitude em graus
+        - unit: 'km' ou 'mi'
+        - dtype: np.float64 (padrão) ou np.float32 para economizar memória
+    Output: array numpy com as distâncias na unidade pedida
+    """
+    if unit not in EARTH_RADIUS:
+        raise ValueError( f'unidade não suportada: {unit!r} (use km ou mi)' )
+
+    lat1 = np.radians( np.asarray( lat1, dtype= dtype ) )
+    lon1 = np.radians( np.asarray( lon1, dtype= dtype ) )
+    lat2 = np.radians( np.asarray( lat2, dtype= dtype ) )
+    lon2 = np.radians( np.asarray( lon2, dtype= dtype ) )
+
+    d = ( np.sin( ( lat2 - lat1 ) * 0.5 ) ** 2 +
+          np.cos( lat1 ) * np.cos( lat2 ) * np.sin( ( lon2 - lon1 ) * 0.5 ) ** 2 )
+
+    return ( 2 * np.asarray( EARTH_RADIUS[unit], dtype= dtype ) * np.arcsin( np.sqrt( d ) ) ).astype( dtype, copy= False )
+
+
+def grid_aggregate( lat, lon, max_cells, weights= None ):
+    """
+    Agrega pontos em uma grade regular de latitude/longitude.
+
+    O tamanho da célula começa em extensão / sqrt( max_cells ) e dobra até a
+    grade ter no máximo max_cells células ocupadas.
+
+    Input: arrays de latitude e longitude em graus, max_cells e, opcionalmente,
+           o peso (quantidade de pontos) de cada ponto
+    Output: (lat, lon, count) - centro de massa e quantidade de pontos por célula
+    """
+    lat = np.asarray( lat, dtype= np.float64 )
+    lon = np.asarray( lon, dtype= np.float64 )
+
+    extensao = max( np.ptp( lat ), np.ptp( lon ), 1e-6 )
+    celula = extensao / np.sqrt( max_cells )
+
+    while True:
+        linha = np.floor( ( lat - lat.min() ) / celula ).astype( np.int64 )
+        coluna = np.floor( ( lon - lon.min() ) / celula ).astype( np.int64 )
+        ids, grupo = np.unique( linha * ( coluna.max() + 1 ) + coluna, return_inverse= True )
+
+        if len( ids ) <= max_cells:
+            break
+        celula *= 2
+
+    if weights is None:
+        weights = np.ones( len( lat ) )
+
+    count = np.bincount( grupo, weights= weights )
+    return ( np.bincount( grupo, weights= lat * weights ) / count,
+             np.bincount( grupo, weights= lon * weights ) / count,
+             count.astype( np.int64 ) )
+
+
+# monta o marcador de cada ponto no navegador, a partir de [lat, lon, count]
+_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.marker( new L.LatLng( row[0], row[1] ) );
+    marker.bindPopup( Math.round( row[2] ) + ' entrega(s)' );
+    return marker;
+};
+"""
+
+# círculo por célula da grade, a partir de [lat, lon, count, raio]
+_GRID_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker( new L.LatLng( row[0], row[1] ), { radius: row[3], weight: 1 } );
+    marker.bindPopup( Math.round( row[2] ) + ' entrega(s)' );
+    return marker;
+};
+"""
+
+
+def delivery_map( lat, lon, mode= 'cluster', max_points= 5000, count= None ):
+    """
+    Mapa de pontos de entrega que continua leve com centenas de milhares de linhas.
+
+    Os marcadores são montados em bloco a partir dos arrays (sem iterrows). Quando
+    há mais pontos que max_points, eles são agregados em uma grade no servidor
+    (grid_aggregate) e cada célula vira um ponto com peso = quantidade de entregas,
+    então o HTML enviado ao navegador nunca passa de max_points pontos.
+
+    Input:
+        - lat, lon: arrays de latitude e longitude em graus
+        - mode: 'cluster' (MarkerCluster), 'heatmap' (HeatMap) ou 'grid' (círculo proporcional por ponto/célula)
+        - max_points: limite de pontos no HTML
+        - count: quantidade de entregas de cada ponto, quando os pontos já vêm agregados
+    Output: folium.Map
+    """
+    lat = np.asarray( lat, dtype= np.float64 )
+    lon = np.asarray( lon, dtype= np.float64 )
+
+    mapa = folium.Map()
+    if len( lat ) == 0:
+        return mapa
+
+    if len( lat ) > max_points:
+        lat, lon, count = grid_aggregate( lat, lon, max_points, count )
+    elif count is None:
+        count = np.ones( len( lat ), dtype= np.int64 )
+    else:
+        count = np.asarray( count, dtype= np.int64 )
+
+    if mode == 'cluster':
+        FastMarkerCluster( np.column_stack( [lat, lon, count] ).tolist(), callback= _CLUSTER_CALLBACK ).add_to( mapa )
+
+    elif mode == 'heatmap':
+        HeatMap( np.column_stack( [lat, lon, count / count.max()] ).tolist(), radius= 15 ).add_to( mapa )
+
+    elif mode == 'grid':
+        # círculos proporcionais à quantidade, sem agrupar em nenhum zoom
+        raios = 3 + 12 * np.sqrt( count / count.max() )
+        FastMarkerCluster( np.column_stack( [lat, lon, count, raios] ).tolist(), callback= _GRID_CALLBACK,
+                           options= { 'disableClusteringAtZoom': 0 } ).add_to( mapa )
+
+    else:
+        raise ValueError( f'modo de mapa desconhecido: {mode!r}' )
+
+    mapa.fit_bounds( [[lat.min(), lon.min()], [lat.max(), lon.max()]] )
+    return mapa
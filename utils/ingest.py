@@ -0,0 +1,251 @@
+"""
+Gera o store Parquet do dataset limpo e o cubo pré-agregado.
+
+Uso:
+    python -m utils.ingest [dataset/train.csv] [--chunksize 200000] [--append] [--workers 4]
+
+O CSV é lido em pedaços de `chunksize` linhas; cada pedaço é limpo, gravado
+como um row group do Parquet e somado ao cubo. O pico de memória depende do
+tamanho do pedaço, não do tamanho do arquivo.
+
+O store guarda uma marca d'água (offset em bytes do CSV já ingerido). Com
+--append, só as linhas escritas depois da marca d'água são limpas e gravadas
+como uma nova parte do store, e o cubo é atualizado somando o cubo dessas
+linhas. O load_dataset faz o mesmo automaticamente quando percebe que o CSV
+cresceu.
+"""
+# LIBRARIES
+import argparse
+import io
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.cube import build_cube, combine_cubes
+from utils.dataset import DATASET_PATH, clean_code, feature_engineering, optimize_dtypes
+from utils.instrument import instrumented
+from utils.parallel import parallel_clean
+from utils.store import (STORE_FORMAT, ByteRange, csv_status, cube_name, last_line_end, part_name,
+                         read_manifest, store_lock, store_path_for, tail_hash, write_manifest)
+
+
+CHUNKSIZE = 200_000
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def iter_clean_chunks( csv, chunksize= CHUNKSIZE, **read_csv_kwargs ):
+    """
+    Lê o CSV em pedaços e aplica clean_code/feature_engineering em cada um.
+
+    Input: csv - caminho ou arquivo aberto, chunksize - linhas por pedaço
+    Output: gerador de Dataframes limpos, com os tipos de optimize_dtypes
+    """
+    for df1 in pd.read_csv( csv, chunksize= chunksize, **read_csv_kwargs ):
+        df1 = clean_code( df1 )
+
+        df1 = feature_engineering( df1 )
+
+        yield optimize_dtypes( df1 )
+
+
+def part_schema( schema ):
+    # colunas category com índice int32: pedaços com dicionários de tamanhos
+    # diferentes (ex.: delivery_person_id) cabem no mesmo schema
+    campos = [ pa.field( campo.name, pa.dictionary( pa.int32(), campo.type.value_type ), campo.nullable, campo.metadata )
+               if pa.types.is_dictionary( campo.type ) else campo
+               for campo in schema ]
+
+    return pa.schema( campos, metadata= schema.metadata )
+
+
+@instrumented
+def write_part( chunks, part_path, schema= None ):
+    """
+    Grava os pedaços limpos em um arquivo Parquet (um row group por pedaço)
+    e acumula o cubo desses pedaços.
+
+    Input:
+        - chunks: Dataframes limpos, ou pares (Dataframe, cubo) já pré-agregados
+          (ver utils.parallel)
+        - schema: schema das partes já gravadas (None: usa o do primeiro pedaço)
+    Output: (quantidade de linhas, cubo) - (0, None) quando não há linhas válidas
+    """
+    tmp_path = part_path + '.tmp'
+
+    writer = None
+    cube = None
+    linhas = 0
+    try:
+        for df1 in chunks:
+            df1, parcial = df1 if isinstance( df1, tuple ) else ( df1, None )
+            if df1.empty:
+                continue
+
+            table = pa.Table.from_pandas( df1, preserve_index= False )
+            if writer is None:
+                writer = pq.ParquetWriter( tmp_path, schema or part_schema( table.schema ) )
+
+            writer.write_table( table.cast( writer.schema ) )
+
+            # o cubo acumulado é pequeno: soma o cubo do pedaço ao que já existe
+            if parcial is None:
+                parcial = build_cube( df1 )
+            cube = parcial if cube is None else combine_cubes( [cube, parcial] )
+            linhas += len( df1 )
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        os.replace( tmp_path, part_path )
+
+    return linhas, cube
+
+
+def _watermark( path, offset ):
+    # estado do CSV no momento da ingestão
+    stat = os.stat( path )
+    return { 'offset': offset,
+             'csv_size': stat.st_size,
+             'csv_mtime_ns': stat.st_mtime_ns,
+             'tail_hash': tail_hash( path, offset ) }
+
+
+def ingest( path= DATASET_PATH, chunksize= CHUNKSIZE, workers= 1 ):
+    """
+    Ingestão completa: recria o store a partir do CSV inteiro.
+
+    Com workers > 1 o CSV é dividido em partições de ~chunksize linhas, limpas
+    e pré-agregadas em paralelo (utils.parallel); a gravação continua sequencial.
+
+    Output: quantidade de linhas gravadas
+    """
+    store_path = store_path_for( path )
+    tmp_path = store_path + '.tmp'
+
+    with store_lock( store_path ):
+        offset = os.stat( path ).st_size
+        header = list( pd.read_csv( path, nrows= 0 ).columns )
+
+        shutil.rmtree( tmp_path, ignore_errors= True )
+        os.makedirs( tmp_path )
+
+        part_path = os.path.join( tmp_path, part_name( 0 ) )
+        if workers > 1:
+            # partições com ~chunksize linhas, estimadas pelo tamanho médio das primeiras linhas
+            partitions = max( workers, -( -offset // ( chunksize * _bytes_per_line( path ) ) ) )
+            linhas, cube = write_part( parallel_clean( path, workers, partitions, offset ), part_path )
+        else:
+            with io.BufferedReader( ByteRange( path, 0, offset ) ) as csv:
+                linhas, cube = write_part( iter_clean_chunks( csv, chunksize ), part_path )
+
+        if cube is None:
+            shutil.rmtree( tmp_path )
+            raise ValueError( f'nenhuma linha válida em {path}' )
+
+        cube.to_parquet( os.path.join( tmp_path, cube_name( 0 ) ), engine= 'pyarrow', index= False )
+
+        manifest = { 'csv': os.path.abspath( path ),
+                     'format': STORE_FORMAT,
+                     'header': header,
+                     'version': 0,
+                     'parts': [ part_name( 0 ) ],
+                     'cube': cube_name( 0 ),
+                     'rows': linhas,
+                     **_watermark( path, offset ) }
+        write_manifest( tmp_path, manifest )
+
+        # troca o store antigo (diretório, ou arquivo único de versões anteriores) pelo novo
+        if os.path.isdir( store_path ):
+            shutil.rmtree( store_path )
+        elif os.path.exists( store_path ):
+            os.remove( store_path )
+        os.replace( tmp_path, store_path )
+
+    return linhas
+
+
+def append( path= DATASET_PATH, chunksize= CHUNKSIZE ):
+    """
+    Ingestão incremental: limpa só as linhas do CSV depois da marca d'água.
+
+    Não faz nada quando não existe store, quando o CSV não mudou ou quando o CSV
+    foi reescrito (nesse caso é preciso rodar a ingestão completa).
+
+    Output: quantidade de linhas novas gravadas
+    """
+    store_path = store_path_for( path )
+    manifest = read_manifest( store_path )
+    if manifest is None or csv_status( path, manifest ) != 'appended':
+        return 0
+
+    with store_lock( store_path ):
+        # outro processo pode ter feito a ingestão enquanto esperávamos o lock
+        manifest = read_manifest( store_path )
+        if csv_status( path, manifest ) != 'appended':
+            return 0
+
+        inicio = manifest['offset']
+        fim = last_line_end( path, inicio, os.stat( path ).st_size )
+
+        versao = manifest['version'] + 1
+        linhas, cube = 0, None
+        if fim > inicio:
+            # a parte nova segue o schema das anteriores, para o store ser lido como uma tabela só
+            schema = pq.read_schema( os.path.join( store_path, manifest['parts'][0] ) )
+
+            with io.BufferedReader( ByteRange( path, inicio, fim ) ) as csv:
+                linhas, cube = write_part( iter_clean_chunks( csv, chunksize, header= None, names= manifest['header'] ),
+                                           os.path.join( store_path, part_name( versao ) ), schema )
+
+        novo = dict( manifest, version= versao, rows= manifest['rows'] + linhas, **_watermark( path, fim ) )
+        if cube is not None:
+            cube_antigo = pd.read_parquet( os.path.join( store_path, manifest['cube'] ), engine= 'pyarrow' )
+            cube = combine_cubes( [cube_antigo, cube] )
+            cube.to_parquet( os.path.join( store_path, cube_name( versao ) ), engine= 'pyarrow', index= False )
+
+            novo.update( parts= manifest['parts'] + [ part_name( versao ) ], cube= cube_name( versao ) )
+
+        write_manifest( store_path, novo )
+
+        if novo['cube'] != manifest['cube']:
+            os.remove( os.path.join( store_path, manifest['cube'] ) )
+
+    return linhas
+
+
+def _bytes_per_line( path, amostra= 1000 ):
+    # tamanho médio das primeiras linhas do CSV
+    with open( path, 'rb' ) as f:
+        linhas = [ len( linha ) for _, linha in zip( range( amostra ), f ) ]
+    return max( 1, sum( linhas ) // max( 1, len( linhas ) ) )
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= 'Gera o store Parquet e o cubo do dataset limpo.' )
+    parser.add_argument( 'csv', nargs= '?', default= DATASET_PATH )
+    parser.add_argument( '--chunksize', type= int, default= CHUNKSIZE )
+    parser.add_argument( '--append', action= 'store_true',
+                         help= 'ingere só as linhas novas do CSV (depois da marca d\'água)' )
+    parser.add_argument( '--workers', type= int, default= 1,
+                         help= 'processos para limpar o CSV em paralelo (ingestão completa)' )
+    args = parser.parse_args( argv )
+
+    inicio = time.perf_counter()
+    if args.append:
+        linhas = append( args.csv, args.chunksize )
+    else:
+        linhas = ingest( args.csv, args.chunksize, args.workers )
+
+    print( f'{linhas} linhas gravadas em {store_path_for( args.csv )} ({time.perf_counter() - inicio:.2f}s)' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Instrumentação das funções do caminho de uma rerun do dashboard.
+
+Cada página abre uma rerun (begin_rerun) e as funções instrumentadas
+(@instrumented ou `with span( nome )`) registram nela o tempo, a quantidade de
+linhas do resultado e a variação da memória alocada (quando o tracemalloc está
+ligado). No fim da página, end_rerun grava o resumo no log estruturado (uma
+linha JSON por rerun, no logger 'curry_company.instrument') e o
+diagnostics_panel mostra o detalhamento na sidebar quando a URL tem
+?diagnostics=1.
+
+Fora de uma rerun (scripts, benchmarks, processos do pool) as funções
+instrumentadas rodam sem registrar nada.
+
+Variáveis de ambiente:
+    CURRY_INSTRUMENT_LOG - arquivo onde o log estruturado é gravado
+    CURRY_TRACE_MEMORY=1 - liga o tracemalloc em todas as reruns (por padrão,
+                           só nas reruns com o painel de diagnóstico aberto, e
+                           desligado quando a última delas termina)
+"""
+# LIBRARIES
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+
+LOG_PATH = os.environ.get( 'CURRY_INSTRUMENT_LOG' )
+
+TRACE_MEMORY = os.environ.get( 'CURRY_TRACE_MEMORY', '0' ) == '1'
+
+# parâmetro da URL que abre o painel de diagnóstico
+DIAGNOSTICS_PARAM = 'diagnostics'
+
+logger = logging.getLogger( 'curry_company.instrument' )
+
+if LOG_PATH:
+    _handler = logging.FileHandler( LOG_PATH )
+    _handler.setFormatter( logging.Formatter( '%(message)s' ) )
+    logger.addHandler( _handler )
+    logger.setLevel( logging.INFO )
+
+# rerun em andamento na thread (o Streamlit roda cada sessão em uma thread)
+_local = threading.local()
+
+# reruns abertas que pediram o tracemalloc; ele é desligado quando não sobra nenhuma
+_memory_reruns = set()
+_memory_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+class Rerun:
+    """
+    Registros de uma execução da página, na ordem em que as chamadas começaram.
+
+    Cada registro tem name, depth (nível de aninhamento), seconds, rows,
+    alloc_mb (variação da memória alocada, None sem tracemalloc) e cached
+    (True/False quando a chamada pode vir de um cache).
+    """
+
+    def __init__( self, page, memory ):
+        self.page = page
+        self.memory = memory
+        self.records = []
+        self.depth = 0
+        self.seconds = None
+        self._inicio = time.perf_counter()
+        self._thread = threading.current_thread()
+
+    def to_frame( self ):
+        df_aux = pd.DataFrame( self.records, columns= ['name', 'depth', 'seconds', 'rows', 'alloc_mb', 'cached'] )
+        return df_aux.astype( { 'rows': 'Int64' } )
+
+
+def current_rerun():
+    return getattr( _local, 'rerun', None )
+
+
+def _release_memory( rerun= None ):
+    """
+    Tira a rerun da contagem do tracemalloc e o desliga quando não sobra
+    nenhuma rerun que o pediu.
+
+    Reruns de threads que já terminaram também saem da contagem: uma rerun
+    interrompida (exceção na página, ou o Streamlit parando o script para
+    recomeçar) não chega ao end_rerun.
+    """
+    with _memory_lock:
+        _memory_reruns.discard( rerun )
+        for aberta in [ aberta for aberta in _memory_reruns if not aberta._thread.is_alive() ]:
+            _memory_reruns.discard( aberta )
+
+        if not _memory_reruns and not TRACE_MEMORY and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def begin_rerun( page, memory= False ):
+    """
+    Abre a rerun da página na thread atual.
+
+    Input: page - nome da página, memory - liga o tracemalloc nesta rerun
+           (em todas com CURRY_TRACE_MEMORY=1)
+    Output: Rerun
+
+    O tracemalloc é global ao processo e deixa todas as sessões mais lentas
+    enquanto está ligado: ele fica ligado só enquanto houver uma rerun aberta
+    que o pediu. As variações de memória incluem as alocações de sessões
+    simultâneas.
+    """
+    # rerun anterior da thread que não foi fechada, e reruns de threads que já terminaram
+    if _memory_reruns:
+        _release_memory( current_rerun() )
+
+    rerun = Rerun( page, memory or TRACE_MEMORY )
+    if rerun.memory:
+        with _memory_lock:
+            _memory_reruns.add( rerun )
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    _local.rerun = rerun
+    return rerun
+
+
+def end_rerun():
+    """
+    Fecha a rerun da thread atual e grava o resumo no log estruturado.
+
+    Output: Rerun fechada (None se não havia rerun aberta)
+    """
+    rerun = current_rerun()
+    if rerun is None:
+        return None
+
+    _local.rerun = None
+    rerun.seconds = time.perf_counter() - rerun._inicio
+
+    if rerun.memory:
+        _release_memory( rerun )
+
+    if logger.isEnabledFor( logging.INFO ):
+        logger.info( json.dumps( { 'event': 'rerun',
+                                   'page': rerun.page,
+                                   'timestamp': time.time(),
+                                   'seconds': rerun.seconds,
+                                   'records': rerun.records } ) )
+    return rerun
+
+
+def row_count( valor ):
+    # linhas do resultado: Dataframes, Series e arrays; em tuplas, o primeiro elemento
+    if isinstance( valor, tuple ) and valor and not hasattr( valor, '_fields' ):
+        valor = valor[0]
+
+    if isinstance( valor, ( pd.DataFrame, pd.Series ) ) or hasattr( valor, 'shape' ):
+        return len( valor )
+
+    return None
+
+
+@contextmanager
+def span( name, rows= None, cached= None ):
+    """
+    Mede o bloco dentro da rerun da thread atual.
+
+    Input: name, rows e cached iniciais do registro
+    Output: o registro (dict), que o bloco pode completar (ex.: rows, cached);
+            fora de uma rerun, um dict que não é guardado
+    """
+    rerun = current_rerun()
+    if rerun is None:
+        yield {}
+        return
+
+    registro = { 'name': name, 'depth': rerun.depth, 'seconds': None,
+                 'rows': rows, 'alloc_mb': None, 'cached': cached }
+    rerun.records.append( registro )
+    rerun.depth += 1
+
+    memoria = tracemalloc.get_traced_memory()[0] if rerun.memory else None
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['seconds'] = time.perf_counter() - inicio
+        if memoria is not None:
+            registro['alloc_mb'] = ( tracemalloc.get_traced_memory()[0] - memoria ) / 2**20
+        rerun.depth -= 1
+
+
+def instrumented( func ):
+    """
+    Decorator: registra cada chamada de func na rerun atual (ver span), com as
+    linhas do resultado.
+    """
+    @wraps( func )
+    def wrapper( *args, **kwargs ):
+        if current_rerun() is None:
+            return func( *args, **kwargs )
+
+        with span( func.__name__ ) as registro:
+            resultado = func( *args, **kwargs )
+            if registro['rows'] is None:
+                registro['rows'] = row_count( resultado )
+        return resultado
+
+    return wrapper
+
+
+def diagnostics_enabled():
+    # import local: o serviço HTTP e os scripts usam este módulo sem o Streamlit
+    import streamlit as st
+
+    # st.query_params só existe nas versões novas; a 1.11 tem a API experimental (valores em listas)
+    if hasattr( st, 'query_params' ):
+        valor = st.query_params.get( DIAGNOSTICS_PARAM, '0' )
+    else:
+        valor = st.experimental_get_query_params().get( DIAGNOSTICS_PARAM, ['0'] )[0]
+
+    return valor not in ( '', '0', 'false' )
+
+
+def diagnostics_panel( rerun ):
+    """
+    Painel da sidebar com o detalhamento da rerun (só com ?diagnostics=1 na URL).
+
+    Input: Rerun fechada (ver end_rerun)
+    """
+    if rerun is None or not diagnostics_enabled():
+        return
+
+    import streamlit as st
+
+    df_aux = rerun.to_frame()
+    df_aux['name'] = [ '  ' * depth + name for name, depth in zip( df_aux['name'], df_aux['depth'] ) ]
+    df_aux['ms'] = df_aux['seconds'] * 1000
+
+    with st.sidebar.expander( 'Diagnostics', expanded= True ):
+        st.markdown( f'**{rerun.page}**: {rerun.seconds * 1000:.1f} ms' )
+        if not rerun.memory:
+            st.caption( 'tracemalloc desligado: sem variação de memória' )
+        st.dataframe( df_aux[['name', 'ms', 'rows', 'alloc_mb', 'cached']] )
@@ -0,0 +1,124 @@
+# LIBRARIES
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import mean_std_from_sums
+from utils.distinct import exact_distinct
+from utils.instrument import instrumented
+
+
+# colunas que definem o agrupamento único usado por todas as métricas da página
+RESTAURANT_KEYS = ['city', 'road_traffic_density', 'type_of_order', 'festival']
+
+SUM_COLS = ['orders', 'time_sum', 'time_sq_sum', 'distance_sum']
+
+# agrupamentos da distribuição do tempo de preparo e a chave com os minutos de preparo
+PREP_KEYS = ['city', 'road_traffic_density', 'type_of_order']
+
+PREP_COL = 'prep_time(min)'
+
+
+class RestaurantMetrics( NamedTuple ):
+    unique_deliverers: int
+    mean_distance: float
+    festival: pd.DataFrame            # festival -> mean_time, std_time
+    by_city: pd.DataFrame             # city -> mean_time, std_time, distance
+    by_city_traffic: pd.DataFrame     # city, road_traffic_density -> mean_time, std_time
+    by_city_order: pd.DataFrame       # city, type_of_order -> mean_time, std_time
+    prep_histogram: pd.DataFrame      # PREP_KEYS, prep_time(min) -> orders
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def _rollup( base, by ):
+    # combina as somas do agrupamento base nas colunas `by` e calcula média/desvio
+    df_aux = ( base.groupby( by, observed= True )[SUM_COLS]
+                   .sum().sort_index().reset_index() )
+
+    df_aux['mean_time'], df_aux['std_time'] = mean_std_from_sums(
+        df_aux['orders'], df_aux['time_sum'], df_aux['time_sq_sum'] )
+    df_aux['distance'] = df_aux['distance_sum'] / df_aux['orders']
+
+    return df_aux[ by + ['mean_time', 'std_time', 'distance'] ]
+
+
+def prep_time_histogram( histogram, by ):
+    """
+    Quantidade de pedidos por minutos de preparo em cada grupo.
+
+    Input: RestaurantMetrics.prep_histogram, by - coluna de PREP_KEYS
+    Output: Dataframe by, prep_time(min), orders
+    """
+    return ( histogram.groupby( [by, PREP_COL], observed= True )['orders']
+                      .sum().sort_index().reset_index() )
+
+
+def prep_time_distribution( histogram, by ):
+    """
+    Resumo da distribuição do tempo de preparo em cada grupo, a partir do histograma.
+
+    Input: RestaurantMetrics.prep_histogram, by - coluna de PREP_KEYS
+    Output: Dataframe by, orders, mean_prep, std_prep, p50_prep, p90_prep
+    """
+    df_aux = prep_time_histogram( histogram, by )
+    minutos = df_aux[PREP_COL].astype( 'float64' )
+    df_aux['prep_sum'] = df_aux['orders'] * minutos
+    df_aux['prep_sq_sum'] = df_aux['orders'] * minutos ** 2
+
+    # percentis: primeiro valor em que a fração acumulada de pedidos do grupo chega ao percentil
+    grupos = df_aux.groupby( by, observed= True )
+    fracao = grupos['orders'].cumsum() / grupos['orders'].transform( 'sum' )
+
+    resumo = grupos[['orders', 'prep_sum', 'prep_sq_sum']].sum()
+    resumo['mean_prep'], resumo['std_prep'] = mean_std_from_sums(
+        resumo['orders'], resumo['prep_sum'], resumo['prep_sq_sum'] )
+    for p in [50, 90]:
+        resumo[f'p{p}_prep'] = df_aux.loc[ fracao >= p / 100 ].groupby( by, observed= True )[PREP_COL].first()
+
+    return resumo.sort_index().reset_index()[[ by, 'orders', 'mean_prep', 'std_prep', 'p50_prep', 'p90_prep' ]]
+
+
+@instrumented
+def restaurant_metrics( df1 ):
+    """
+    Calcula todas as métricas da Visão Restaurantes de uma vez.
+
+    O dataset filtrado é agrupado uma única vez por city x road_traffic_density x
+    type_of_order x festival x minutos de preparo, guardando quantidade, soma e
+    soma dos quadrados do tempo e soma da distância. Festival, cidade, cidade x
+    tráfego, cidade x tipo de pedido e o histograma do tempo de preparo saem
+    dessas poucas linhas.
+
+    Input: Dataframe limpo e filtrado
+    Output: RestaurantMetrics, lido diretamente pelo layout da página
+    """
+    time_taken = df1['time_taken(min)'].astype( 'float64' )
+
+    df_aux = pd.DataFrame( { 'orders': 1,
+                             'time_sum': time_taken,
+                             'time_sq_sum': time_taken ** 2,
+                             'distance_sum': df1['distance'].astype( 'float64' ) } )
+    df_aux[RESTAURANT_KEYS] = df1[RESTAURANT_KEYS]
+
+    # minutos de preparo como chave (-1 quando falta o horário do pedido)
+    df_aux[PREP_COL] = np.nan_to_num( df1[PREP_COL].values.round(), nan= -1 ).astype( 'int16' )
+
+    base = df_aux.groupby( RESTAURANT_KEYS + [PREP_COL], observed= True ).sum().reset_index()
+
+    total_orders = base['orders'].sum()
+    mean_distance = base['distance_sum'].sum() / total_orders if total_orders else float( 'nan' )
+
+    return RestaurantMetrics(
+        unique_deliverers= exact_distinct( df1['delivery_person_id'] ),
+        mean_distance= round( float( mean_distance ), 2 ),
+        festival= _rollup( base, ['festival'] )[['festival', 'mean_time', 'std_time']],
+        by_city= _rollup( base, ['city'] ),
+        by_city_traffic= _rollup( base, ['city', 'road_traffic_density'] )[['city', 'road_traffic_density', 'mean_time', 'std_time']],
+        by_city_order= _rollup( base, ['city', 'type_of_order'] )[['city', 'type_of_order', 'mean_time', 'std_time']],
+        prep_histogram= ( base.loc[ base[PREP_COL] >= 0 ]
+                              .groupby( PREP_KEYS + [PREP_COL], observed= True )['orders']
+                              .sum().sort_index().reset_index() ) )
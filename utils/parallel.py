@@ -0,0 +1,99 @@
+# LIBRARIES
+import io
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.cube import build_cube, combine_cubes
+from utils.dataset import (DATASET_PATH, WORKERS, clean_code, concat_orders, feature_engineering,
+                           optimize_dtypes, sort_by_date)
+from utils.store import ByteRange, last_line_end
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def split_csv( path, partitions, fim= None ):
+    """
+    Divide o CSV (até o byte fim; padrão: o arquivo todo) em intervalos de
+    bytes terminados em fim de linha.
+
+    O dataset não tem quebras de linha dentro de campos, então cada intervalo
+    pode ser lido sozinho, com os nomes das colunas do cabeçalho.
+
+    Output: (nomes das colunas, lista de (inicio, fim) em bytes)
+    """
+    names = list( pd.read_csv( path, nrows= 0 ).columns )
+
+    with open( path, 'rb' ) as f:
+        f.readline()
+        inicio = f.tell()
+
+    tamanho = os.stat( path ).st_size if fim is None else fim
+    limites = [ inicio ]
+    for i in range( 1, partitions ):
+        limite = last_line_end( path, inicio, inicio + ( tamanho - inicio ) * i // partitions )
+        if limite > limites[-1]:
+            limites.append( limite )
+    limites.append( tamanho )
+
+    return names, [ ( a, b ) for a, b in zip( limites[:-1], limites[1:] ) if b > a ]
+
+
+def clean_partition( path, inicio, fim, names ):
+    """
+    Limpa um intervalo do CSV e pré-agrega o cubo dele (roda em um processo do pool).
+
+    Output: (Dataframe limpo com os tipos de optimize_dtypes, cubo do intervalo)
+    """
+    with io.BufferedReader( ByteRange( path, inicio, fim ) ) as csv:
+        df1 = pd.read_csv( csv, header= None, names= names )
+
+    df1 = clean_code( df1 )
+
+    df1 = feature_engineering( df1 )
+
+    df1 = optimize_dtypes( df1 )
+
+    return df1, build_cube( df1 )
+
+
+def parallel_clean( path= DATASET_PATH, workers= WORKERS, partitions= None, fim= None ):
+    """
+    Limpa e pré-agrega as partições do CSV em um pool de processos.
+
+    Input: path, workers - processos do pool, partitions - quantidade de
+           partições (padrão: uma por processo), fim - último byte do CSV a ler
+    Output: gerador de (Dataframe limpo, cubo), na ordem do arquivo; cada
+            partição sai assim que ela e as anteriores ficam prontas
+    """
+    names, intervalos = split_csv( path, partitions or workers, fim )
+
+    args = [ ( path, inicio, final, names ) for inicio, final in intervalos ]
+    if workers <= 1:
+        yield from ( clean_partition( *arg ) for arg in args )
+        return
+
+    with ProcessPoolExecutor( max_workers= workers ) as pool:
+        yield from pool.map( clean_partition, *zip( *args ) )
+
+
+def parallel_build( path= DATASET_PATH, workers= WORKERS, partitions= None ):
+    """
+    build_dataset em paralelo, com o cubo das partições combinado de forma exata.
+
+    Os pedaços limpos são concatenados na ordem do arquivo e ordenados por data
+    com ordenação estável, então o resultado é igual ao do build_dataset. As
+    somas do cubo (quantidade, soma e soma dos quadrados) são somadas entre as
+    partições, o que dá exatamente o cubo do dataset inteiro.
+
+    Output: (Dataframe limpo, cubo)
+    """
+    partes = list( parallel_clean( path, workers, partitions ) )
+
+    df1 = sort_by_date( concat_orders( [ df for df, _ in partes ] ) )
+    cube = combine_cubes( [ cube for _, cube in partes if len( cube ) ] )
+    return df1, cube
@@ -0,0 +1,632 @@
+"""
+Serviço de consultas dos KPIs do dashboard, separado da interface.
+
+Uso:
+    python -m utils.service [dataset/train.csv] [--host 127.0.0.1] [--port 8502]
+
+O QueryService responde às consultas (pedidos por dia, tempo médio por cidade e
+tráfego, avaliações por clima...) a partir dos dados compartilhados do processo
+(dataset, cubo e sketches, carregados uma vez por versão) e guarda os
+resultados por versão + filtros. As páginas só montam os gráficos.
+
+Rodando este módulo, o mesmo serviço atende por HTTP:
+    GET /health
+    GET /version
+    GET /queries
+    GET /query/<nome>?data_limite=2022-03-01[&data_inicio=2022-02-11]&traffic=Low&traffic=Jam[&parametro=valor]
+        sem traffic: todas as condições de trânsito; traffic= (vazio): nenhuma
+        filtros cruzados (ver utils.crossfilter): filter_<coluna>=valor, ex.: filter_city=Urban&filter_festival=Yes
+
+As respostas de /query são Dataframes em JSON (orient='table'). Com a variável
+de ambiente CURRY_QUERY_URL (ex.: http://127.0.0.1:8502) as páginas passam a
+consultar esse processo, e um único processo aquecido atende todos os usuários
+do dashboard e os scripts.
+"""
+# LIBRARIES
+import argparse
+import io
+import json
+import os
+import threading
+import urllib.parse
+import urllib.request
+
+from functools import cached_property
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from utils.crossfilter import load_bitmap_index
+from utils.cube import build_cube, filter_cube, load_cube, summarize_cube
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.deliverers import (HISTORY_COLS, PROFILE_KEYS, load_deliverer_index, profile_summary, ratings_trend,
+                              time_by)
+from utils.distinct import approx_distinct_by, build_sketches, exact_distinct_by, filter_sketches, load_sketches
+from utils.figure_cache import FigureCache, filter_key
+from utils.filters import FILTER_COLS, date_range, filter_orders, normalize_filters
+from utils.geo import grid_aggregate
+from utils.instrument import begin_rerun, end_rerun, span
+from utils.metrics import PREP_KEYS, prep_time_distribution, prep_time_histogram, restaurant_metrics
+from utils.spatial import load_spatial_indexes
+from utils.timeseries import build_timeseries, load_timeseries, range_totals, rolling_window, weekly_growth
+from utils.topk import top_k_means
+
+
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+
+QUERIES = {}
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def query( func ):
+    # registra a função como consulta do serviço, pelo nome
+    QUERIES[func.__name__] = func
+    return func
+
+
+class QueryContext:
+    """
+    Dados de uma combinação de versão + filtros, calculados só quando uma
+    consulta pede e reaproveitados pelas outras consultas com os mesmos filtros.
+
+    As estruturas pré-agregadas (cubo, sketches, série diária) não têm as
+    colunas dos filtros cruzados: com filtros cruzados elas são montadas a
+    partir dos pedidos filtrados, que já são poucos.
+    """
+
+    def __init__( self, path, data_limite, traffic_options, data_inicio= None, cross_filters= () ):
+        self.path = path
+        self.data_limite = data_limite
+        self.traffic_options = traffic_options
+        self.data_inicio = data_inicio
+        self.cross_filters = cross_filters
+        self._rankings = {}
+
+    @cached_property
+    def bitmaps( self ):
+        return load_bitmap_index( self.path )
+
+    @cached_property
+    def orders( self ):
+        rows = self.bitmaps.rows( self.cross_filters ) if self.cross_filters else None
+        return filter_orders( load_dataset( self.path ), self.data_limite, self.traffic_options, self.data_inicio, rows )
+
+    @cached_property
+    def cube( self ):
+        if self.cross_filters:
+            return build_cube( self.orders )
+        return filter_cube( load_cube( self.path ), self.data_limite, self.traffic_options, self.data_inicio )
+
+    @cached_property
+    def sketches( self ):
+        if self.cross_filters:
+            return build_sketches( self.orders )
+        return filter_sketches( load_sketches( self.path ), self.data_limite, self.traffic_options, self.data_inicio )
+
+    @cached_property
+    def totals( self ):
+        # totais por cidade x tráfego do período, das somas acumuladas por dia
+        return range_totals( self.timeseries, self.data_limite, self.traffic_options, self.data_inicio )
+
+    @cached_property
+    def metrics( self ):
+        return restaurant_metrics( self.orders )
+
+    @cached_property
+    def spatial( self ):
+        return load_spatial_indexes( self.path )
+
+    @cached_property
+    def deliverers( self ):
+        return load_deliverer_index( self.path )
+
+    def deliverer_orders( self, deliverer ):
+        # pedidos do entregador no período e tráfegos selecionados: só o bloco dele é lido
+        return filter_orders( load_dataset( self.path ), self.data_limite, self.traffic_options, self.data_inicio,
+                              self.deliverers.rows( deliverer ) )
+
+    def deliverer_ranking( self, k ):
+        # os k mais rápidos e os k mais lentos saem da mesma passada (top_k_means):
+        # fastest_deliverers e slowest_deliverers dividem o resultado
+        if k not in self._rankings:
+            self._rankings[k] = top_k_means( self.orders, 'city', 'delivery_person_id', 'time_taken(min)', k )
+        return self._rankings[k]
+
+    @cached_property
+    def timeseries( self ):
+        if self.cross_filters:
+            return build_timeseries( self.orders )
+        return load_timeseries( self.path )
+
+
+class QueryService:
+    """
+    Consultas em processo, com cache dos resultados compartilhado pelas sessões.
+
+    Input: caminho do CSV, cache dos resultados
+    """
+
+    def __init__( self, path= DATASET_PATH, cache= None ):
+        self.path = path
+        self.cache = cache or FigureCache( maxsize= 512 )
+        self._contexts = FigureCache( maxsize= 8 )
+
+    def version( self ):
+        # carregar o dataset incorpora linhas novas do CSV antes de ler a versão
+        load_dataset( self.path )
+        return source_version( self.path )
+
+    def query( self, name, periodo, traffic_options, cross_filters= None, **params ):
+        """
+        Executa uma consulta de QUERIES com os filtros da sidebar.
+
+        Input:
+            - name: nome da consulta (ver QUERIES)
+            - periodo: data limite (mantém os pedidos com order_date < data) ou
+              par ( inicio, fim ) (mantém inicio <= order_date < fim)
+            - traffic_options: valores de road_traffic_density selecionados
+            - cross_filters: dict coluna de FILTER_COLS -> valores selecionados
+            - params: parâmetros próprios da consulta (ex.: k, radius)
+        Output: Dataframe
+        """
+        if name not in QUERIES:
+            raise KeyError( f'consulta desconhecida: {name!r}' )
+
+        version = self.version()
+        filtros = filter_key( periodo, traffic_options, cross_filters )
+
+        key = ( name, version, filtros, tuple( sorted( params.items() ) ) )
+        with span( f'query.{name}', cached= True ) as registro:
+            df_aux = self.cache.get( key )
+            if df_aux is None:
+                registro['cached'] = False
+                df_aux = QUERIES[name]( self._context( version, filtros, periodo, traffic_options ), **params )
+                self.cache.set( key, df_aux )
+
+            registro['rows'] = len( df_aux )
+
+        return df_aux
+
+    def _context( self, version, filtros, periodo, traffic_options ):
+        contexto = self._contexts.get( ( version, filtros ) )
+        if contexto is None:
+            data_inicio, data_limite = date_range( periodo )
+            contexto = QueryContext( self.path, data_limite, list( traffic_options ), data_inicio, filtros[-1] )
+            self._contexts.set( ( version, filtros ), contexto )
+
+        return contexto
+
+
+def frame_to_json( df_aux ):
+    """
+    Dataframe em JSON orient='table', com os tipos numéricos exatos.
+
+    O Table Schema só distingue integer/number/boolean: sem a chave 'dtypes',
+    float32 e int8 voltariam como float64 e int64.
+    """
+    dtypes = { col: str( dtype ) for col, dtype in df_aux.dtypes.items() if dtype.kind in 'iufb' }
+    texto = df_aux.to_json( orient= 'table', index= False, date_format= 'iso', double_precision= 15 )
+
+    # a chave extra vai no mesmo objeto JSON; o read_json ignora chaves que não conhece
+    return texto[:-1] + ', "dtypes": ' + json.dumps( dtypes ) + '}'
+
+
+def frame_from_json( texto ):
+    """
+    Dataframe de frame_to_json, com os mesmos tipos do Dataframe original.
+    """
+    # sem a conversão de datas pelo nome da coluna (ex.: std_time viraria data): o schema já traz os tipos
+    df_aux = pd.read_json( io.StringIO( texto ), orient= 'table', convert_dates= False, keep_default_dates= False )
+
+    dtypes = json.loads( texto ).get( 'dtypes', {} )
+    # sem linhas o read_json devolve um índice object no lugar do RangeIndex
+    df_aux = df_aux.astype( { col: dtype for col, dtype in dtypes.items() if col in df_aux } )
+    return df_aux.reset_index( drop= True )
+
+
+class QueryClient:
+    """
+    Mesma interface do QueryService, consultando um serviço HTTP (python -m utils.service).
+    """
+
+    def __init__( self, url, timeout= 30 ):
+        self.url = url.rstrip( '/' )
+        self.timeout = timeout
+
+    def _get( self, caminho, params= () ):
+        url = self.url + caminho
+        if params:
+            url += '?' + urllib.parse.urlencode( params )
+
+        with urllib.request.urlopen( url, timeout= self.timeout ) as resposta:
+            return resposta.read().decode( 'utf-8' )
+
+    def version( self ):
+        return tuple( json.loads( self._get( '/version' ) ) )
+
+    def query( self, name, periodo, traffic_options, cross_filters= None, **params ):
+        data_inicio, data_limite = date_range( periodo )
+        params = ( [ ( 'data_limite', data_limite.isoformat() ) ] +
+                   ( [ ( 'data_inicio', data_inicio.isoformat() ) ] if data_inicio is not None else [] ) +
+                   # seleção vazia vai explícita (traffic=): sem o parâmetro o servidor usa todas
+                   ( [ ( 'traffic', traffic ) for traffic in traffic_options ] or [ ( 'traffic', '' ) ] ) +
+                   [ ( f'filter_{col}', valor ) for col, valores in normalize_filters( cross_filters ) for valor in valores ] +
+                   sorted( params.items() ) )
+
+        with span( f'query.{name}' ) as registro:
+            df_aux = frame_from_json( self._get( f'/query/{name}', params ) )
+            registro['rows'] = len( df_aux )
+
+        return df_aux
+
+
+def connect( path= DATASET_PATH ):
+    """
+    Serviço usado pelas páginas: o processo HTTP de CURRY_QUERY_URL, quando
+    definido, ou o serviço em processo.
+    """
+    url = os.environ.get( 'CURRY_QUERY_URL' )
+    if url:
+        return QueryClient( url )
+
+    return _local_service( path )
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def _local_service( path ):
+    # um QueryService por CSV, compartilhado por todas as sessões do processo
+    with _services_lock:
+        if path not in _services:
+            _services[path] = QueryService( path )
+        return _services[path]
+
+
+#----------------------------------
+# QUERIES
+#----------------------------------
+
+# Filtros
+
+@query
+def filter_values( ctx ):
+    # valores de cada coluna de filtro cruzado, com a quantidade de pedidos (dataset inteiro)
+    return pd.DataFrame( [ { 'column': col, 'value': valor, 'orders': orders }
+                           for col in FILTER_COLS
+                           for valor, orders in ctx.bitmaps.counts( col ).items() ] )
+
+
+# Visão Empresa
+
+@query
+def orders_by_day( ctx ):
+    return ctx.cube[['orders', 'order_date']].groupby( 'order_date' ).sum().reset_index()
+
+
+@query
+def orders_by_week( ctx ):
+    return ctx.cube[['orders', 'week_of_year']].groupby( 'week_of_year' ).sum().reset_index()
+
+
+@query
+def orders_by_traffic( ctx ):
+    df_aux = ( ctx.totals[['orders', 'road_traffic_density']]
+                  .groupby( 'road_traffic_density', observed= True ).sum().sort_index().reset_index() )
+    df_aux['percent'] = df_aux['orders'] / df_aux['orders'].sum()
+    return df_aux
+
+
+@query
+def orders_by_city_traffic( ctx ):
+    return ( ctx.totals[['orders', 'road_traffic_density', 'city']]
+                .groupby( ['city', 'road_traffic_density'], observed= True ).sum().sort_index().reset_index() )
+
+
+@query
+def orders_per_deliverer_by_week( ctx, approx= 0 ):
+    # pedidos por semana (cubo) / entregadores distintos por semana: contagem exata
+    # pelos códigos dos pedidos, ou estimada pelos sketches (approx=1, para datasets grandes)
+    df_aux = ctx.cube[['orders', 'week_of_year']].groupby( 'week_of_year' ).sum().reset_index()
+
+    if int( approx ):
+        distintos = approx_distinct_by( ctx.sketches, ['week_of_year'] )
+    else:
+        semanas = ctx.orders['week_of_year'].cat.remove_unused_categories()
+        distintos = pd.DataFrame( { 'week_of_year': semanas.cat.categories.astype( str ),
+                                    'distinct': exact_distinct_by( semanas.cat.codes.values, ctx.orders['delivery_person_id'] ) } )
+
+    df_aux = pd.merge( df_aux, distintos, how= 'inner' )
+    df_aux['order_by_delivery'] = df_aux['orders'] / df_aux['distinct']
+    return df_aux
+
+
+@query
+def rolling_by_city( ctx, window= 7 ):
+    # janela móvel de `window` dias por cidade: pedidos, tempo médio e avaliação média
+    return rolling_window( ctx.timeseries, int( window ), ctx.data_limite, ctx.traffic_options, ctx.data_inicio )
+
+
+@query
+def growth_by_week( ctx ):
+    # totais semanais por cidade e crescimento em relação à semana anterior
+    return weekly_growth( ctx.timeseries, ctx.data_limite, ctx.traffic_options, ctx.data_inicio )
+
+
+@query
+def city_traffic_centers( ctx ):
+    # localização central (mediana) das entregas de cada cidade por tipo de tráfego
+    return ( ctx.orders.loc[:, ['city', 'road_traffic_density', 'delivery_location_latitude',
+                                'delivery_location_longitude']]
+                .groupby( ['city', 'road_traffic_density'], observed= True ).median().sort_index().reset_index() )
+
+
+@query
+def delivery_points( ctx, max_points= 5000 ):
+    # pontos de entrega, agregados em grade quando passam de max_points
+    lat = ctx.orders['delivery_location_latitude'].values
+    lon = ctx.orders['delivery_location_longitude'].values
+
+    if len( lat ) > int( max_points ):
+        lat, lon, count = grid_aggregate( lat, lon, int( max_points ) )
+    else:
+        count = 1
+
+    return pd.DataFrame( { 'lat': lat, 'lon': lon, 'count': count } )
+
+
+# Visão Entregadores
+
+@query
+def deliverer_overview( ctx ):
+    df1 = ctx.orders
+    return pd.DataFrame( { 'max_age': [ df1['delivery_person_age'].max() ],
+                           'min_age': [ df1['delivery_person_age'].min() ],
+                           'best_condition': [ df1['vehicle_condition'].max() ],
+                           'worst_condition': [ df1['vehicle_condition'].min() ] } )
+
+
+@query
+def ratings_by_deliverer( ctx ):
+    return ( ctx.orders[['delivery_person_id', 'delivery_person_ratings']]
+                .groupby( 'delivery_person_id', observed= True ).mean()
+                .sort_values( 'delivery_person_id', ascending= False ).reset_index() )
+
+
+def _ratings_by( somas, column ):
+    # média e desvio padrão das avaliações a partir das somas do cubo (ou dos totais do período)
+    df_aux = summarize_cube( somas, [column] )
+    return df_aux[[ column, 'mean_rating', 'std_rating' ]].rename(
+        columns= { 'mean_rating': 'delivery_mean', 'std_rating': 'delivery_std' } )
+
+
+@query
+def ratings_by_traffic( ctx ):
+    return _ratings_by( ctx.totals, 'road_traffic_density' )
+
+
+@query
+def ratings_by_weather( ctx ):
+    return _ratings_by( ctx.cube, 'weatherconditions' )
+
+
+@query
+def fastest_deliverers( ctx, k= 10 ):
+    return ctx.deliverer_ranking( int( k ) )[0]
+
+
+@query
+def slowest_deliverers( ctx, k= 10 ):
+    return ctx.deliverer_ranking( int( k ) )[1]
+
+
+# Perfil do Entregador
+
+@query
+def deliverer_list( ctx ):
+    # entregadores e a quantidade total de pedidos de cada um (para a busca)
+    return pd.DataFrame( { 'delivery_person_id': ctx.deliverers.ids, 'orders': ctx.deliverers.counts() } )
+
+
+@query
+def deliverer_summary( ctx, deliverer ):
+    return profile_summary( ctx.deliverer_orders( deliverer ) )
+
+
+@query
+def deliverer_history( ctx, deliverer ):
+    return ctx.deliverer_orders( deliverer )[HISTORY_COLS].reset_index( drop= True )
+
+
+@query
+def deliverer_ratings_trend( ctx, deliverer ):
+    return ratings_trend( ctx.deliverer_orders( deliverer ) )
+
+
+@query
+def deliverer_time_by( ctx, deliverer, by= 'road_traffic_density' ):
+    # tempo médio e desvio padrão de entrega do entregador por tráfego ou clima
+    if by not in PROFILE_KEYS:
+        raise ValueError( f'agrupamento inválido: {by!r} (use {", ".join( PROFILE_KEYS )})' )
+
+    return time_by( ctx.deliverer_orders( deliverer ), by )
+
+
+# Visão Restaurantes
+
+@query
+def restaurant_overview( ctx ):
+    return pd.DataFrame( { 'unique_deliverers': [ ctx.metrics.unique_deliverers ],
+                           'mean_distance': [ ctx.metrics.mean_distance ] } )
+
+
+@query
+def time_by_festival( ctx ):
+    return ctx.metrics.festival
+
+
+@query
+def time_by_city( ctx ):
+    return ctx.metrics.by_city
+
+
+@query
+def time_by_city_traffic( ctx ):
+    return ctx.metrics.by_city_traffic
+
+
+@query
+def time_by_city_order( ctx ):
+    return ctx.metrics.by_city_order
+
+
+def _prep_key( by ):
+    if by not in PREP_KEYS:
+        raise ValueError( f'agrupamento inválido: {by!r} (use {", ".join( PREP_KEYS )})' )
+    return by
+
+
+@query
+def prep_time_summary( ctx, by= 'city' ):
+    # quantidade, média, desvio padrão e percentis 50/90 do tempo de preparo por grupo
+    return prep_time_distribution( ctx.metrics.prep_histogram, _prep_key( by ) )
+
+
+@query
+def prep_time_counts( ctx, by= 'city' ):
+    # histograma do tempo de preparo (pedidos por minutos de preparo) por grupo
+    return prep_time_histogram( ctx.metrics.prep_histogram, _prep_key( by ) )
+
+
+@query
+def restaurants( ctx ):
+    # restaurants do índice espacial: a posição na lista é o id usado pelas outras consultas
+    return ctx.spatial.restaurants
+
+
+@query
+def deliveries_near( ctx, restaurant, radius ):
+    # entregas filtradas a até radius km do restaurante
+    lat, lon = ctx.spatial.restaurants.loc[ int( restaurant ), ['restaurant_latitude', 'restaurant_longitude'] ]
+    pos, dist = ctx.spatial.delivery_index.query_radius( lat, lon, float( radius ) )
+
+    # o índice do dataset filtrado é a posição da linha no dataset completo
+    linhas = ctx.orders.index.get_indexer( pos )
+    manter = linhas >= 0
+
+    df_aux = ctx.orders.iloc[ linhas[manter] ][[ 'delivery_location_latitude', 'delivery_location_longitude',
+                                                 'time_taken(min)' ]]
+    return df_aux.assign( distance= dist[manter] ).reset_index( drop= True )
+
+
+@query
+def nearest_restaurants( ctx, restaurant, k= 5 ):
+    # os k restaurantes mais próximos (o próprio restaurante é o vizinho a distância zero)
+    restaurant, k = int( restaurant ), int( k )
+    lat, lon = ctx.spatial.restaurants.loc[ restaurant, ['restaurant_latitude', 'restaurant_longitude'] ]
+    vizinhos, dist = ctx.spatial.restaurant_index.query_knn( lat, lon, k + 1 )
+
+    outros = vizinhos != restaurant
+    return ( ctx.spatial.restaurants.iloc[ vizinhos[outros][:k] ]
+                .assign( distance= dist[outros][:k] ).reset_index( drop= True ) )
+
+
+#----------------------------------
+# HTTP
+#----------------------------------
+
+class QueryHandler( BaseHTTPRequestHandler ):
+    service = None
+
+    def _send( self, status, corpo ):
+        dados = corpo.encode( 'utf-8' )
+        self.send_response( status )
+        self.send_header( 'Content-Type', 'application/json' )
+        self.send_header( 'Content-Length', str( len( dados ) ) )
+        self.end_headers()
+        self.wfile.write( dados )
+
+    def _erro( self, status, mensagem ):
+        self._send( status, json.dumps( { 'error': mensagem } ) )
+
+    def do_GET( self ):
+        url = urllib.parse.urlparse( self.path )
+        params = urllib.parse.parse_qs( url.query, keep_blank_values= True )
+
+        if url.path == '/health':
+            return self._send( 200, json.dumps( { 'status': 'ok' } ) )
+
+        if url.path == '/version':
+            return self._send( 200, json.dumps( list( self.service.version() ) ) )
+
+        if url.path == '/queries':
+            return self._send( 200, json.dumps( sorted( QUERIES ) ) )
+
+        if not url.path.startswith( '/query/' ):
+            return self._erro( 404, f'caminho desconhecido: {url.path}' )
+
+        name = url.path[ len( '/query/' ): ]
+        if name not in QUERIES:
+            return self._erro( 404, f'consulta desconhecida: {name!r}' )
+
+        if 'data_limite' not in params:
+            return self._erro( 400, 'parâmetro obrigatório: data_limite' )
+
+        data_limite = params.pop( 'data_limite' )[0]
+        data_inicio = params.pop( 'data_inicio', [None] )[0]
+        # traffic ausente: todas as condições; traffic= (vazio): nenhuma
+        traffic_options = [ traffic for traffic in params.pop( 'traffic', TRAFFIC_OPTIONS ) if traffic ]
+        cross_filters = { chave[ len( 'filter_' ): ]: [ valor for valor in params.pop( chave ) if valor ]
+                          for chave in list( params ) if chave.startswith( 'filter_' ) }
+        extras = { chave: valores[0] for chave, valores in params.items() if valores[0] }
+
+        # cada pedido entra no log estruturado como uma rerun (ver utils.instrument)
+        begin_rerun( url.path )
+        try:
+            # datas inválidas também respondem 400
+            periodo = pd.Timestamp( data_limite )
+            if data_inicio is not None:
+                periodo = ( pd.Timestamp( data_inicio ), periodo )
+
+            df_aux = self.service.query( name, periodo, traffic_options, cross_filters, **extras )
+        except ( TypeError, ValueError, KeyError ) as erro:
+            return self._erro( 400, str( erro ) )
+        finally:
+            end_rerun()
+
+        self._send( 200, frame_to_json( df_aux ) )
+
+
+def serve( path= DATASET_PATH, host= '127.0.0.1', port= 8502 ):
+    """
+    Carrega os dados compartilhados e atende as consultas por HTTP até ser interrompido.
+    """
+    service = _local_service( path )
+
+    # aquece o processo antes do primeiro pedido
+    load_dataset( path )
+    load_cube( path )
+    load_sketches( path )
+
+    handler = type( 'Handler', ( QueryHandler, ), { 'service': service } )
+    with ThreadingHTTPServer( ( host, port ), handler ) as server:
+        print( f'servindo {len( QUERIES )} consultas de {path} em http://{host}:{port}' )
+        server.serve_forever()
+
+
+def main( argv= None ):
+    parser = argparse.ArgumentParser( description= 'Serviço HTTP de consultas do dashboard.' )
+    parser.add_argument( 'csv', nargs= '?', default= DATASET_PATH )
+    parser.add_argument( '--host', default= '127.0.0.1' )
+    parser.add_argument( '--port', type= int, default= 8502 )
+    args = parser.parse_args( argv )
+
+    serve( args.csv, args.host, args.port )
+
+
+if __name__ == '__main__':
+    main()
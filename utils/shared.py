@@ -0,0 +1,205 @@
+# LIBRARIES
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from utils.instrument import instrumented
+from utils.store import STORE_FORMAT, store_lock
+
+
+# O snapshot é um diretório ao lado do CSV (dataset/train.shared/<versão>/) com
+# uma coluna do dataset limpo por arquivo .npy e um _columns.json com os nomes,
+# os tipos e as categorias. As colunas category são gravadas só com os códigos
+# inteiros (int8/int16/int32); as colunas texto (ex.: id, único por linha), como
+# bytes de tamanho fixo (UTF-8), fora do JSON. Os arquivos são lidos com memory
+# map, então os processos do Streamlit e o serviço de consultas usam as mesmas
+# páginas de memória (o page cache do sistema) em vez de uma cópia do dataset cada um.
+COLUMNS_FILE = '_columns.json'
+
+# liga/desliga o snapshot compartilhado (CURRY_SHARED=0 mantém o dataset só na memória do processo)
+SHARED = os.environ.get( 'CURRY_SHARED', '1' ) == '1'
+
+# versões mantidas no diretório: a atual e a anterior, que processos ainda
+# montando o dataset da versão anterior podem estar lendo
+SNAPSHOTS_KEPT = 2
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def shared_path_for( path ):
+    # dataset/train.csv -> dataset/train.shared
+    return os.path.splitext( path )[0] + '.shared'
+
+
+def snapshot_name( version ):
+    # nome do diretório de uma versão (ver utils.dataset.source_version); o formato
+    # entra no nome porque os tipos das colunas seguem os das partes do store
+    return hashlib.sha1( repr( ( STORE_FORMAT, tuple( version ) ) ).encode( 'utf-8' ) ).hexdigest()[:16]
+
+
+@instrumented
+def write_snapshot( df1, snapshot_path ):
+    """
+    Grava o dataset limpo como um snapshot de colunas .npy.
+
+    Input: Dataframe com os tipos de optimize_dtypes (colunas object só com str)
+    Output: snapshot_path
+
+    O snapshot é montado em um diretório temporário e renomeado no fim, então
+    outro processo nunca lê um snapshot pela metade. Se outro processo gravar a
+    mesma versão antes, o dele é mantido.
+    """
+    tmp = f'{snapshot_path}.tmp-{os.getpid()}'
+    shutil.rmtree( tmp, ignore_errors= True )
+    os.makedirs( tmp )
+
+    colunas = []
+    for i, col in enumerate( df1.columns ):
+        serie = df1[col]
+        arquivo = f'{i:02d}.npy'
+
+        if isinstance( serie.dtype, pd.CategoricalDtype ):
+            np.save( os.path.join( tmp, arquivo ), serie.cat.codes.values )
+            colunas.append( { 'name': col, 'file': arquivo, 'categories': serie.cat.categories.tolist() } )
+        elif serie.dtype == object:
+            if not all( isinstance( x, str ) for x in serie.values ):
+                raise TypeError( f'coluna {col!r} do tipo object com valores que não são texto' )
+
+            # np.char.encode de um array vazio devolve float64: o dtype bytes vem explícito
+            texto = np.char.encode( serie.values.astype( str ), 'utf-8' ) if len( serie ) else np.empty( 0, dtype= 'S1' )
+            np.save( os.path.join( tmp, arquivo ), texto )
+            colunas.append( { 'name': col, 'file': arquivo, 'encoding': 'utf-8' } )
+        else:
+            np.save( os.path.join( tmp, arquivo ), serie.values )
+            colunas.append( { 'name': col, 'file': arquivo } )
+
+    with open( os.path.join( tmp, COLUMNS_FILE ), 'w' ) as f:
+        json.dump( { 'rows': len( df1 ), 'columns': colunas }, f )
+
+    try:
+        os.rename( tmp, snapshot_path )
+    except OSError:
+        shutil.rmtree( tmp, ignore_errors= True )
+
+    return snapshot_path
+
+
+@instrumented
+def read_snapshot( snapshot_path ):
+    """
+    Lê o snapshot com memory map, sem copiar as colunas.
+
+    Output: Dataframe limpo com índice 0..n-1. Os arrays são copy-on-write
+            (mmap_mode='c'): alterações ficam no processo e não vão para o arquivo.
+            As colunas texto são decodificadas do arquivo mapeado e são as
+            únicas copiadas para a memória do processo.
+    """
+    with open( os.path.join( snapshot_path, COLUMNS_FILE ) ) as f:
+        meta = json.load( f )
+
+    colunas = {}
+    for coluna in meta['columns']:
+        valores = np.load( os.path.join( snapshot_path, coluna['file'] ), mmap_mode= 'c' )
+
+        if 'categories' in coluna:
+            valores = pd.Categorical.from_codes( valores, categories= pd.Index( coluna['categories'], dtype= object ) )
+        elif 'encoding' in coluna:
+            valores = np.char.decode( valores, coluna['encoding'] ).astype( object ) if len( valores ) else np.empty( 0, dtype= object )
+
+        colunas[coluna['name']] = valores
+
+    # copy=False: cada coluna fica no próprio bloco, apontando para o arquivo
+    return pd.DataFrame( colunas, index= pd.RangeIndex( meta['rows'] ), copy= False )
+
+
+def _pid_alive( pid ):
+    # sinal 0 só verifica se o processo existe
+    try:
+        os.kill( pid, 0 )
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_mtime( snapshot_path ):
+    # instante em que a versão ficou pronta (0 para um diretório incompleto)
+    try:
+        return os.path.getmtime( os.path.join( snapshot_path, COLUMNS_FILE ) )
+    except OSError:
+        return 0
+
+
+def remove_old_snapshots( base, atual ):
+    """
+    Remove do diretório base as versões além das SNAPSHOTS_KEPT mais recentes
+    (a atual sempre fica) e os diretórios temporários de processos que morreram
+    no meio da gravação. Chamado com o store_lock do diretório.
+    """
+    versoes = []
+    for nome in os.listdir( base ):
+        caminho = os.path.join( base, nome )
+
+        if '.tmp-' in nome:
+            pid = nome.rsplit( '.tmp-', 1 )[1]
+            if pid.isdigit() and not _pid_alive( int( pid ) ):
+                shutil.rmtree( caminho, ignore_errors= True )
+        elif nome != atual:
+            versoes.append( ( _snapshot_mtime( caminho ), caminho ) )
+
+    # os processos que já mapearam uma versão removida continuam com os arquivos abertos
+    for _, caminho in sorted( versoes, reverse= True )[ SNAPSHOTS_KEPT - 1: ]:
+        shutil.rmtree( caminho, ignore_errors= True )
+
+
+def _read_if_present( snapshot_path ):
+    # outro processo pode remover a versão durante a leitura: nesse caso, None
+    try:
+        return read_snapshot( snapshot_path )
+    except FileNotFoundError:
+        return None
+
+
+def share_dataset( path, version, df1 ):
+    """
+    Troca o dataset carregado pelo snapshot compartilhado da versão.
+
+    Input: path - caminho do CSV, version - versão da origem, df1 - dataset
+           limpo, ou None para só ler um snapshot já existente
+    Output: Dataframe do snapshot; df1 quando o snapshot está desligado ou não
+            pode ser gravado (ex.: diretório sem permissão de escrita) ou lido;
+            None quando df1 é None e não há snapshot da versão
+    """
+    if not SHARED:
+        return df1
+
+    base = shared_path_for( path )
+    snapshot_path = os.path.join( base, snapshot_name( version ) )
+
+    if os.path.isfile( os.path.join( snapshot_path, COLUMNS_FILE ) ):
+        snapshot = _read_if_present( snapshot_path )
+        if snapshot is not None:
+            return snapshot
+
+    if df1 is None:
+        return None
+
+    try:
+        os.makedirs( base, exist_ok= True )
+        with store_lock( base ):
+            if not os.path.isfile( os.path.join( snapshot_path, COLUMNS_FILE ) ):
+                write_snapshot( df1, snapshot_path )
+
+            remove_old_snapshots( base, os.path.basename( snapshot_path ) )
+    except OSError:
+        return df1
+
+    snapshot = _read_if_present( snapshot_path )
+    return df1 if snapshot is None else snapshot
@@ -0,0 +1,159 @@
+# LIBRARIES
+import threading
+
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.dataset import DATASET_PATH, load_dataset, source_version
+from utils.geo import EARTH_RADIUS, haversine_np
+from utils.instrument import instrumented
+
+
+# tamanho padrão da célula (graus): ~5,5 km de lado no equador
+CELL_DEG = 0.05
+
+# km por grau de latitude
+KM_PER_DEG = np.pi * EARTH_RADIUS['km'] / 180
+
+_lock = threading.Lock()
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+class GridIndex:
+    """
+    Índice espacial em grade de latitude/longitude (estilo geohash).
+
+    Os pontos são ordenados pela célula em que caem; cada célula vira um intervalo
+    contínuo desse array, achado por busca binária. Uma consulta só olha as células
+    que tocam o círculo pedido e filtra os candidatos pela distância haversine exata.
+
+    Input: arrays de latitude e longitude em graus, tamanho da célula em graus
+    """
+
+    def __init__( self, lat, lon, cell_deg= CELL_DEG ):
+        self.lat = np.asarray( lat, dtype= np.float64 )
+        self.lon = np.asarray( lon, dtype= np.float64 )
+        self.cell_deg = cell_deg
+
+        chaves = self._chave( self._linha( self.lat ), self._coluna( self.lon ) )
+        self._ordem = np.argsort( chaves, kind= 'stable' )
+        self._chaves = chaves[ self._ordem ]
+
+    def __len__( self ):
+        return len( self.lat )
+
+    def _linha( self, lat ):
+        return np.floor( ( np.asarray( lat ) + 90 ) / self.cell_deg ).astype( np.int64 )
+
+    def _coluna( self, lon ):
+        return np.floor( ( np.asarray( lon ) + 180 ) / self.cell_deg ).astype( np.int64 )
+
+    def _chave( self, linha, coluna ):
+        # linha e coluna cabem em 32 bits para qualquer cell_deg razoável
+        return ( linha << 32 ) + coluna
+
+    def _candidatos( self, lat, lon, raio_km ):
+        # posições dos pontos nas células que tocam o quadrado ao redor do círculo
+        dlat = raio_km / KM_PER_DEG
+        dlon = raio_km / ( KM_PER_DEG * max( np.cos( np.radians( min( abs( lat ) + dlat, 89.9 ) ) ), 1e-6 ) )
+
+        linhas = np.arange( self._linha( lat - dlat ), self._linha( lat + dlat ) + 1 )
+        col_ini, col_fim = self._coluna( lon - dlon ), self._coluna( lon + dlon )
+
+        # cada linha da grade é um intervalo contínuo de chaves
+        inicio = np.searchsorted( self._chaves, self._chave( linhas, col_ini ), side= 'left' )
+        fim = np.searchsorted( self._chaves, self._chave( linhas, col_fim ), side= 'right' )
+
+        if not len( inicio ) or ( fim - inicio ).sum() == 0:
+            return np.empty( 0, dtype= np.int64 )
+
+        return np.concatenate( [ self._ordem[i:f] for i, f in zip( inicio, fim ) if f > i ] )
+
+    def query_radius( self, lat, lon, raio_km ):
+        """
+        Pontos a até raio_km do ponto (lat, lon).
+
+        Output: (posições, distâncias em km), ordenados pela distância
+        """
+        pos = self._candidatos( lat, lon, raio_km )
+        dist = haversine_np( np.full( len( pos ), lat ), np.full( len( pos ), lon ), self.lat[pos], self.lon[pos] )
+
+        dentro = dist <= raio_km
+        pos, dist = pos[dentro], dist[dentro]
+
+        ordem = np.argsort( dist, kind= 'stable' )
+        return pos[ordem], dist[ordem]
+
+    def query_knn( self, lat, lon, k ):
+        """
+        Os k pontos mais próximos de (lat, lon).
+
+        A busca começa com o raio de uma célula e dobra o raio (um anel de células a
+        mais) até o círculo ter pelo menos k pontos. Como o query_radius devolve
+        todos os pontos do círculo, qualquer ponto de fora está mais longe que o
+        k-ésimo. Se nem o maior raio junta k pontos, cai para a busca completa.
+
+        Output: (posições, distâncias em km), ordenados pela distância
+        """
+        k = min( k, len( self ) )
+        if k == 0:
+            return np.empty( 0, dtype= np.int64 ), np.empty( 0 )
+
+        raio = self.cell_deg * KM_PER_DEG
+        while True:
+            pos, dist = self.query_radius( lat, lon, raio )
+            if len( pos ) >= k or raio > np.pi * EARTH_RADIUS['km']:
+                break
+            raio *= 2
+
+        if len( pos ) < k:
+            # o ponto está longe de tudo: cai para a busca completa
+            dist = haversine_np( np.full( len( self ), lat ), np.full( len( self ), lon ), self.lat, self.lon )
+            pos = np.argsort( dist, kind= 'stable' )
+            dist = dist[pos]
+
+        return pos[:k], dist[:k]
+
+
+class SpatialIndexes( NamedTuple ):
+    restaurants: pd.DataFrame      # restaurant_latitude, restaurant_longitude, orders
+    restaurant_index: GridIndex    # sobre as linhas de restaurants
+    delivery_index: GridIndex      # sobre as linhas do dataset limpo
+
+
+@instrumented
+def build_spatial_indexes( df1, cell_deg= CELL_DEG ):
+    """
+    Monta os índices espaciais de restaurantes e de locais de entrega.
+
+    Os restaurantes são identificados pelas coordenadas (não há coluna de id).
+    As posições devolvidas pelo delivery_index são posições de linha em df1.
+    """
+    restaurants = ( df1.groupby( ['restaurant_latitude', 'restaurant_longitude'] ).size()
+                       .rename( 'orders' ).reset_index() )
+
+    return SpatialIndexes(
+        restaurants= restaurants,
+        restaurant_index= GridIndex( restaurants['restaurant_latitude'], restaurants['restaurant_longitude'], cell_deg ),
+        delivery_index= GridIndex( df1['delivery_location_latitude'], df1['delivery_location_longitude'], cell_deg ) )
+
+
+@lru_cache( maxsize= 1 )
+def _load_spatial_indexes( path, version ):
+    # version faz parte da chave do cache
+    return build_spatial_indexes( load_dataset( path ) )
+
+
+@instrumented
+def load_spatial_indexes( path= DATASET_PATH ):
+    """
+    Índices espaciais do dataset compartilhado, montados uma vez por versão.
+    """
+    with _lock:
+        return _load_spatial_indexes( path, source_version( path ) )
@@ -0,0 +1,155 @@
+# LIBRARIES
+import fcntl
+import hashlib
+import io
+import json
+import os
+
+from contextlib import contextmanager
+
+
+# O store é um diretório ao lado do CSV (dataset/train.parquet/) com:
+#   - part-00000.parquet, part-00001.parquet...: linhas limpas, uma parte por ingestão
+#   - _cube-NNNNN.parquet: cubo pré-agregado da versão atual
+#   - _manifest.json: marca d'água (offset em bytes do CSV já ingerido) e lista de partes
+# Arquivos começando com '_' são ignorados pelo pyarrow ao ler o diretório.
+MANIFEST = '_manifest.json'
+
+# versão do formato das partes; muda quando o dataset limpo ganha ou perde colunas
+# ou quando uma coluna muda de tipo (as partes ou o cubo)
+STORE_FORMAT = 4
+
+# bytes antes da marca d'água usados para detectar se o CSV foi reescrito
+TAIL_BYTES = 4096
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def store_path_for( path ):
+    # dataset/train.csv -> dataset/train.parquet
+    return os.path.splitext( path )[0] + '.parquet'
+
+
+def part_name( numero ):
+    return f'part-{numero:05d}.parquet'
+
+
+def cube_name( versao ):
+    return f'_cube-{versao:05d}.parquet'
+
+
+def read_manifest( store_path ):
+    # None quando o store não existe (ou é de um formato antigo: o dataset volta a vir do CSV)
+    manifest_path = os.path.join( store_path, MANIFEST )
+    if not os.path.isfile( manifest_path ):
+        return None
+
+    with open( manifest_path ) as f:
+        manifest = json.load( f )
+
+    return manifest if manifest.get( 'format' ) == STORE_FORMAT else None
+
+
+def write_manifest( store_path, manifest ):
+    # escrita atômica: as páginas nunca leem um manifest pela metade
+    manifest_path = os.path.join( store_path, MANIFEST )
+    with open( manifest_path + '.tmp', 'w' ) as f:
+        json.dump( manifest, f, indent= 2 )
+
+    os.replace( manifest_path + '.tmp', manifest_path )
+
+
+def store_version( store_path ):
+    # a versão do store muda sempre que o manifest é regravado
+    stat = os.stat( os.path.join( store_path, MANIFEST ) )
+    return ( os.path.abspath( store_path ), stat.st_mtime_ns, stat.st_size )
+
+
+@contextmanager
+def store_lock( store_path ):
+    # lock entre processos (vários workers do Streamlit) para escrever no store
+    with open( store_path + '.lock', 'w' ) as f:
+        fcntl.flock( f, fcntl.LOCK_EX )
+        try:
+            yield
+        finally:
+            fcntl.flock( f, fcntl.LOCK_UN )
+
+
+def tail_hash( path, offset ):
+    # hash dos últimos TAIL_BYTES antes da marca d'água
+    with open( path, 'rb' ) as f:
+        inicio = max( 0, offset - TAIL_BYTES )
+        f.seek( inicio )
+        return hashlib.sha1( f.read( offset - inicio ) ).hexdigest()
+
+
+def csv_status( path, manifest ):
+    """
+    Compara o CSV com a marca d'água do store.
+
+    Output:
+        - 'fresh': nada mudou desde a última ingestão
+        - 'appended': o CSV só cresceu; as linhas novas começam em manifest['offset']
+        - 'changed': o CSV foi reescrito e o store não serve mais
+    """
+    if not os.path.exists( path ):
+        return 'fresh'
+
+    stat = os.stat( path )
+    if stat.st_size == manifest['csv_size'] and stat.st_mtime_ns == manifest['csv_mtime_ns']:
+        return 'fresh'
+
+    if stat.st_size >= manifest['offset'] and tail_hash( path, manifest['offset'] ) == manifest['tail_hash']:
+        return 'appended'
+
+    return 'changed'
+
+
+def last_line_end( path, inicio, fim ):
+    """
+    Posição logo depois do último '\\n' em [inicio, fim). Linhas ainda sendo
+    escritas (sem '\\n' no final) ficam para a próxima ingestão.
+    """
+    bloco = 1 << 16
+    with open( path, 'rb' ) as f:
+        pos = fim
+        while pos > inicio:
+            ler = min( bloco, pos - inicio )
+            f.seek( pos - ler )
+            quebra = f.read( ler ).rfind( b'\n' )
+            if quebra >= 0:
+                return pos - ler + quebra + 1
+            pos -= ler
+
+    return inicio
+
+
+class ByteRange( io.RawIOBase ):
+    """
+    Arquivo somente leitura restrito ao intervalo [inicio, fim) de outro arquivo,
+    para o pd.read_csv ler só o trecho novo do CSV.
+    """
+
+    def __init__( self, path, inicio, fim ):
+        self._f = open( path, 'rb' )
+        self._f.seek( inicio )
+        self._restante = fim - inicio
+
+    def readable( self ):
+        return True
+
+    def readinto( self, buffer ):
+        n = min( len( buffer ), self._restante )
+        if n <= 0:
+            return 0
+
+        lido = self._f.readinto( memoryview( buffer )[:n] )
+        self._restante -= lido
+        return lido
+
+    def close( self ):
+        self._f.close()
+        super().close()
@@ -0,0 +1,303 @@
+# LIBRARIES
+import threading
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cube import CUBE_SUMS, mean_std_from_sums
+from utils.dataset import DATASET_PATH, load_dataset, read_store, source_version
+from utils.instrument import instrumented
+from utils.store import read_manifest
+
+
+_lock = threading.Lock()
+
+# série carregada: versão, partes do store já incorporadas e a série
+_cache = { 'key': None, 'parts': (), 'series': None }
+
+
+class TimeSeries( NamedTuple ):
+    first_day: int              # chave do primeiro dia (dias desde 1970-01-01)
+    cities: list                # categorias de city (eixo 1)
+    traffic: list               # categorias de road_traffic_density (eixo 2)
+    sums: np.ndarray            # ( dias, cidades, tráfegos, CUBE_SUMS ), um dia por linha, sem buracos
+    prefix: np.ndarray          # somas acumuladas: prefix[i] = soma dos dias 0..i-1 (prefix[0] = 0)
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def day_key( datas ):
+    # dias desde 1970-01-01 (inteiro), no lugar das datas
+    return np.asarray( datas, dtype= 'datetime64[D]' ).astype( 'int64' )
+
+
+def week_key( dias ):
+    # semanas começando no domingo, como o '%U' do strftime (1970-01-04 foi um domingo)
+    return ( np.asarray( dias ) + 4 ) // 7
+
+
+def day_date( dias ):
+    return np.asarray( dias, dtype= 'int64' ).astype( 'datetime64[D]' ).astype( 'datetime64[ns]' )
+
+
+def week_start( semanas ):
+    # domingo que abre a semana
+    return day_date( np.asarray( semanas ) * 7 - 4 )
+
+
+def _row_sums( df1 ):
+    # somas de cada linha, na ordem de CUBE_SUMS; avaliação faltante soma 0 e não
+    # conta em rating_count (um NaN no np.bincount contaminaria todas as somas acumuladas)
+    time_taken = df1['time_taken(min)'].values.astype( 'float64' )
+    rating = df1['delivery_person_ratings'].values.astype( 'float64' )
+    avaliado = ~np.isnan( rating )
+    rating = np.nan_to_num( rating )
+    return [ np.ones( len( df1 ) ), time_taken, time_taken ** 2, rating, rating ** 2, avaliado ]
+
+
+def _day_sums( df1, first_day, n_days, cities, traffic ):
+    """
+    Soma as linhas de df1 nas células dia x cidade x tráfego com np.bincount.
+
+    Output: array ( n_days, len( cities ), len( traffic ), len( CUBE_SUMS ) )
+    """
+    dia = day_key( df1['order_date'].values ) - first_day
+    cidade = df1['city'].cat.set_categories( cities ).cat.codes.values.astype( 'int64' )
+    trafego = df1['road_traffic_density'].cat.set_categories( traffic ).cat.codes.values.astype( 'int64' )
+
+    validas = ( cidade >= 0 ) & ( trafego >= 0 )
+    celula = ( ( dia * len( cities ) + cidade ) * len( traffic ) + trafego )[validas]
+
+    tamanho = n_days * len( cities ) * len( traffic )
+    sums = np.stack( [ np.bincount( celula, weights= valores[validas], minlength= tamanho )
+                       for valores in _row_sums( df1 ) ], axis= -1 )
+    return sums.reshape( n_days, len( cities ), len( traffic ), len( CUBE_SUMS ) )
+
+
+def _prefix( sums, anterior= None, inicio= 0 ):
+    # somas acumuladas por dia; com `anterior`, reaproveita as linhas até `inicio`
+    prefix = np.zeros( ( len( sums ) + 1, ) + sums.shape[1:] )
+    if anterior is not None:
+        prefix[ :inicio + 1 ] = anterior[ :inicio + 1 ]
+
+    prefix[ inicio + 1: ] = prefix[inicio] + np.cumsum( sums[inicio:], axis= 0 )
+    return prefix
+
+
+@instrumented
+def build_timeseries( df1 ):
+    """
+    Somas diárias por cidade e tráfego (quantidade, tempo e avaliação) e as
+    somas acumuladas, base das janelas móveis e dos totais semanais.
+
+    Input: Dataframe limpo
+    Output: TimeSeries
+    """
+    cities = sorted( df1['city'].dropna().unique() )
+    traffic = sorted( df1['road_traffic_density'].dropna().unique() )
+
+    if len( df1 ) == 0:
+        return TimeSeries( 0, cities, traffic, np.zeros( ( 0, len( cities ), len( traffic ), len( CUBE_SUMS ) ) ),
+                           np.zeros( ( 1, len( cities ), len( traffic ), len( CUBE_SUMS ) ) ) )
+
+    dias = day_key( df1['order_date'].values )
+    first_day = int( dias.min() )
+    n_days = int( dias.max() ) - first_day + 1
+
+    sums = _day_sums( df1, first_day, n_days, cities, traffic )
+    return TimeSeries( first_day, cities, traffic, sums, _prefix( sums ) )
+
+
+@instrumented
+def update_timeseries( series, df_new ):
+    """
+    Incorpora linhas novas à série sem reprocessar o histórico.
+
+    Só as linhas novas são somadas; as somas acumuladas são refeitas a partir
+    do primeiro dia que as linhas novas tocam (em geral, só os últimos dias).
+    Cidades, tipos de tráfego ou dias novos ampliam os eixos.
+
+    Input: TimeSeries, Dataframe limpo só com as linhas novas
+    Output: nova TimeSeries (a série recebida não é alterada)
+    """
+    if len( df_new ) == 0:
+        return series
+    if len( series.sums ) == 0:
+        return build_timeseries( df_new )
+
+    cities = sorted( set( series.cities ) | set( df_new['city'].dropna().unique() ) )
+    traffic = sorted( set( series.traffic ) | set( df_new['road_traffic_density'].dropna().unique() ) )
+
+    dias = day_key( df_new['order_date'].values )
+    first_day = min( series.first_day, int( dias.min() ) )
+    ultimo = max( series.first_day + len( series.sums ) - 1, int( dias.max() ) )
+    n_days = ultimo - first_day + 1
+
+    # eixos ampliados: as somas antigas vão para as posições das suas categorias e dias
+    sums = np.zeros( ( n_days, len( cities ), len( traffic ), len( CUBE_SUMS ) ) )
+    deslocamento = series.first_day - first_day
+    sums[ np.ix_( np.arange( len( series.sums ) ) + deslocamento,
+                  np.searchsorted( cities, series.cities ),
+                  np.searchsorted( traffic, series.traffic ) ) ] = series.sums
+
+    sums += _day_sums( df_new, first_day, n_days, cities, traffic )
+
+    # as somas acumuladas antigas continuam valendo até o primeiro dia alterado
+    if deslocamento == 0 and cities == list( series.cities ) and traffic == list( series.traffic ):
+        inicio = min( int( dias.min() ) - first_day, len( series.sums ) )
+        return TimeSeries( first_day, cities, traffic, sums, _prefix( sums, series.prefix, inicio ) )
+
+    return TimeSeries( first_day, cities, traffic, sums, _prefix( sums ) )
+
+
+def _day_index( series, data ):
+    # linha das somas acumuladas com os dias antes de `data` (limitada à série)
+    return int( np.clip( day_key( np.datetime64( data, 'D' ) ) - series.first_day, 0, len( series.sums ) ) )
+
+
+def _period( series, data_limite, data_inicio ):
+    # dias do período: linhas primeiro..n_days-1 da série
+    n_days = _day_index( series, data_limite )
+    primeiro = 0 if data_inicio is None else min( _day_index( series, data_inicio ), n_days )
+    return primeiro, n_days
+
+
+def _traffic_prefix( series, data_limite, traffic_options, data_inicio= None ):
+    """
+    Somas acumuladas só dos tráfegos selecionados, até o dia antes de data_limite.
+
+    Output: ( prefix, primeiro, n_days ) - os dias do período são as linhas
+            primeiro..n_days-1 da série (a soma deles é prefix[n_days] - prefix[primeiro])
+    """
+    selecionados = [ i for i, t in enumerate( series.traffic ) if t in traffic_options ]
+    primeiro, n_days = _period( series, data_limite, data_inicio )
+
+    return series.prefix[ :n_days + 1, :, selecionados ].sum( axis= 2 ), primeiro, n_days
+
+
+def range_totals( series, data_limite, traffic_options, data_inicio= None ):
+    """
+    Totais do período por cidade e tráfego, com as mesmas somas do cubo.
+
+    Cada célula é a diferença de duas linhas das somas acumuladas: o custo não
+    depende da quantidade de pedidos nem do tamanho do período.
+
+    Input: TimeSeries, filtros da sidebar
+    Output: Dataframe city, road_traffic_density e as colunas de CUBE_SUMS
+    """
+    primeiro, n_days = _period( series, data_limite, data_inicio )
+
+    somas = series.prefix[n_days] - series.prefix[primeiro]
+    n_cities, n_traffic = somas.shape[:2]
+
+    df_aux = pd.DataFrame( somas.reshape( -1, len( CUBE_SUMS ) ), columns= CUBE_SUMS )
+    df_aux['orders'] = df_aux['orders'].round().astype( 'int64' )
+    df_aux.insert( 0, 'city', pd.Categorical( np.repeat( np.asarray( series.cities, dtype= object ), n_traffic ),
+                                               categories= series.cities ) )
+    df_aux.insert( 1, 'road_traffic_density', pd.Categorical( np.tile( np.asarray( series.traffic, dtype= object ), n_cities ),
+                                                               categories= series.traffic ) )
+
+    linhas = ( df_aux['orders'] > 0 ) & df_aux['road_traffic_density'].isin( traffic_options )
+    return df_aux.loc[ linhas ].reset_index( drop= True )
+
+
+def _window_frame( series, dias, somas ):
+    # Dataframe longo ( data, cidade ) com quantidade, tempo médio e avaliação média
+    n_days, n_cities = somas.shape[:2]
+    orders = somas[..., 0]
+
+    # a avaliação média só considera os pedidos avaliados (rating_count)
+    with np.errstate( invalid= 'ignore', divide= 'ignore' ):
+        mean_time = somas[..., 1] / orders
+        mean_rating = somas[..., 3] / somas[..., 5]
+
+    return pd.DataFrame( { 'order_date': np.repeat( dias, n_cities ),
+                           'city': np.tile( np.asarray( series.cities, dtype= object ), n_days ),
+                           'orders': orders.ravel().round().astype( 'int64' ),
+                           'mean_time': mean_time.ravel(),
+                           'mean_rating': mean_rating.ravel() } )
+
+
+def rolling_window( series, window, data_limite, traffic_options, data_inicio= None ):
+    """
+    Janela móvel de `window` dias terminando em cada dia do período, por cidade.
+
+    Cada janela é a diferença de duas linhas das somas acumuladas, então o custo
+    não depende do tamanho da janela nem da quantidade de pedidos. As janelas do
+    começo do período só somam os dias a partir de data_inicio.
+
+    Input: TimeSeries, window em dias, filtros da sidebar
+    Output: Dataframe order_date, city, orders, mean_time, mean_rating
+    """
+    prefix, primeiro, n_days = _traffic_prefix( series, data_limite, traffic_options, data_inicio )
+
+    fim = np.arange( primeiro + 1, n_days + 1 )
+    somas = prefix[fim] - prefix[ np.maximum( fim - window, primeiro ) ]
+
+    return _window_frame( series, day_date( series.first_day + fim - 1 ), somas )
+
+
+def weekly_growth( series, data_limite, traffic_options, data_inicio= None ):
+    """
+    Totais semanais por cidade (semanas de domingo a sábado, chaves inteiras) e
+    o crescimento em relação à semana anterior.
+
+    Input: TimeSeries, filtros da sidebar
+    Output: Dataframe week_start, city, orders, mean_time, std_time, mean_rating, growth
+    """
+    prefix, primeiro, n_days = _traffic_prefix( series, data_limite, traffic_options, data_inicio )
+
+    # primeiro dia de cada semana do período, mais o fim do período
+    dias = series.first_day + np.arange( primeiro, n_days )
+    semanas = np.unique( week_key( dias ) )
+    limites = np.clip( semanas * 7 - 4 - series.first_day, primeiro, n_days )
+    limites = np.append( limites, n_days )
+
+    somas = prefix[ limites[1:] ] - prefix[ limites[:-1] ]
+    df_aux = _window_frame( series, week_start( semanas ), somas ).rename( columns= { 'order_date': 'week_start' } )
+
+    _, df_aux['std_time'] = mean_std_from_sums( somas[..., 0].ravel(), somas[..., 1].ravel(), somas[..., 2].ravel() )
+
+    anterior = df_aux.groupby( 'city' )['orders'].shift()
+    df_aux['growth'] = ( df_aux['orders'] / anterior.where( anterior > 0 ) - 1 ).astype( 'float64' )
+
+    return df_aux[[ 'week_start', 'city', 'orders', 'mean_time', 'std_time', 'mean_rating', 'growth' ]]
+
+
+def _load_timeseries( path, version ):
+    # versão nova do store com partes a mais: só as partes novas são somadas
+    if _cache['key'] == version:
+        return _cache['series']
+
+    parts = ()
+    if version[0].endswith( '.parquet' ):
+        manifest = read_manifest( version[0] )
+        parts = tuple( manifest['parts'] ) if manifest else ()
+
+    anteriores = _cache['parts']
+    mesmo_store = _cache['series'] is not None and parts and _cache['key'][0] == version[0]
+    if mesmo_store and parts == anteriores:
+        # manifesto regravado sem partes novas (ex.: só a marca d'água avançou)
+        series = _cache['series']
+    elif mesmo_store and parts[ :len( anteriores ) ] == anteriores:
+        series = update_timeseries( _cache['series'], read_store( version[0], parts[ len( anteriores ): ] ) )
+    else:
+        series = build_timeseries( load_dataset( path ) )
+
+    _cache.update( key= version, parts= parts, series= series )
+    return series
+
+
+@instrumented
+def load_timeseries( path= DATASET_PATH ):
+    """
+    Série diária do dataset, construída uma vez e atualizada de forma
+    incremental quando a ingestão anexa partes novas ao store.
+    """
+    with _lock:
+        load_dataset( path )
+        return _load_timeseries( path, source_version( path ) )
@@ -0,0 +1,114 @@
+# LIBRARIES
+import numpy as np
+import pandas as pd
+
+from utils.instrument import instrumented
+
+
+#----------------------------------
+# FUNCTIONS
+#----------------------------------
+
+def top_k_per_group( grupos, valores, k ):
+    """
+    Os k menores e os k maiores valores de cada grupo, sem ordenar tudo.
+
+    As posições são separadas por grupo com uma ordenação estável dos códigos
+    (radix sort para inteiros pequenos) e, dentro de cada grupo, uma única
+    seleção parcial (np.argpartition) separa as duas pontas. Só os 2k
+    escolhidos de cada grupo (mais os empatados com o k-ésimo) são ordenados;
+    nos empates vence a menor posição, como no nsmallest/nlargest do pandas.
+
+    Input:
+        - grupos: códigos inteiros do grupo de cada valor
+        - valores: array numérico
+        - k: quantidade de valores em cada ponta
+    Output: (menores, maiores) - posições em `valores`, por grupo (na ordem dos
+            códigos) e dentro do grupo em ordem crescente (menores) ou
+            decrescente (maiores)
+    """
+    grupos = np.asarray( grupos )
+    valores = np.asarray( valores )
+
+    ordem = np.argsort( grupos, kind= 'stable' )
+    limites = np.flatnonzero( np.diff( grupos[ordem] ) ) + 1
+    inicios = np.r_[ 0, limites ]
+    fins = np.r_[ limites, len( ordem ) ]
+
+    menores, maiores = [], []
+    for inicio, fim in zip( inicios, fins ):
+        if fim == inicio:
+            continue
+
+        pos = ordem[inicio:fim]
+        n = len( pos )
+        if n > 2 * k:
+            # uma partição com dois pivôs acha o k-ésimo menor e o k-ésimo maior valor;
+            # os empatados com eles entram todos, para o corte abaixo escolher entre
+            # os empates pela posição e não pela ordem em que a partição os deixou
+            parte = valores[pos]
+            pivos = parte[ np.argpartition( parte, [k - 1, n - k] )[[k - 1, n - k]] ]
+            baixo, alto = pos[ parte <= pivos[0] ], pos[ parte >= pivos[1] ]
+        else:
+            baixo = alto = pos
+
+        # ordena só as pontas pelo valor e, nos empates, pela posição
+        menores.append( baixo[ np.lexsort( ( baixo, valores[baixo] ) ) ][:k] )
+        maiores.append( alto[ np.lexsort( ( alto, -valores[alto] ) ) ][:k] )
+
+    if not menores:
+        vazio = np.empty( 0, dtype= np.int64 )
+        return vazio, vazio
+
+    return np.concatenate( menores ), np.concatenate( maiores )
+
+
+def group_means( df1, by, column ):
+    """
+    Média de `column` por combinação das colunas category `by`, via bincount
+    sobre os códigos das categorias (sem groupby).
+
+    Output: Dataframe com as colunas `by` (category) e `column`, uma linha por
+            combinação presente, na ordem das categorias
+    """
+    chave = np.zeros( len( df1 ), dtype= np.int64 )
+    validos = np.ones( len( df1 ), dtype= bool )
+    tamanhos = []
+    for col in by:
+        codes = df1[col].cat.codes.values
+        tamanhos.append( len( df1[col].cat.categories ) )
+        chave = chave * tamanhos[-1] + codes
+        validos &= codes >= 0
+
+    # linhas com NaN em alguma das chaves ficam de fora, como no groupby
+    total = int( np.prod( tamanhos ) )
+    count = np.bincount( chave[validos], minlength= total )
+    soma = np.bincount( chave[validos], weights= df1[column].values[validos], minlength= total )
+
+    presentes = np.flatnonzero( count )
+    codes = np.unravel_index( presentes, tamanhos )
+
+    df_aux = pd.DataFrame( { col: pd.Categorical.from_codes( codes[i], dtype= df1[col].dtype )
+                             for i, col in enumerate( by ) } )
+    df_aux[column] = soma[presentes] / count[presentes]
+    return df_aux
+
+
+@instrumented
+def top_k_means( df1, group, item, column, k ):
+    """
+    Os k itens com menor e com maior média de `column` em cada grupo, em uma passada.
+
+    Input:
+        - df1: Dataframe com `group` e `item` como category
+        - group: coluna dos grupos (ex.: city)
+        - item: coluna dos itens ranqueados (ex.: delivery_person_id)
+        - column: coluna numérica cuja média é comparada
+        - k: itens por grupo em cada ponta
+    Output: (menores, maiores) - Dataframes com group, item e column
+    """
+    df_aux = group_means( df1, [group, item], column )
+    menores, maiores = top_k_per_group( df_aux[group].cat.codes.values, df_aux[column].values, k )
+
+    return ( df_aux.iloc[menores].reset_index( drop= True ),
+             df_aux.iloc[maiores].reset_index( drop= True ) )